@@ -0,0 +1,82 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Micro benchmark of the NSX-MH synchronization cache
+
+Compares the regular cache with the compact cache mode, by processing the
+same set of NSX resources twice (initial fill and a pass with no changes),
+as done by the synchronization task.
+
+Usage: python -m tools.benchmarks.sync_cache [count [count ...]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from oslo_utils import uuidutils
+
+from vmware_nsx.common import sync
+
+DEFAULT_COUNTS = [10000, 100000]
+
+
+def _get_lswitchport(index):
+    uuid = uuidutils.generate_uuid()
+    return {'uuid': uuid,
+            'display_name': 'port-%s' % index,
+            '_href': '/ws.v1/lswitch/fake/lport/%s' % uuid,
+            '_schema': '/ws.v1/schema/LogicalSwitchPortConfig',
+            'admin_status_enabled': True,
+            'tags': [{'scope': 'q_port_id',
+                      'tag': uuidutils.generate_uuid()},
+                     {'scope': 'os_tid', 'tag': uuidutils.generate_uuid()},
+                     {'scope': 'vm_id', 'tag': uuidutils.generate_uuid()}],
+            '_relations': {
+                'LogicalPortStatus': {
+                    'fabric_status_up': True,
+                    'link_status_up': True,
+                    '_href': '/ws.v1/lswitch/fake/lport/%s/status' % uuid,
+                    '_schema': '/ws.v1/schema/LogicalSwitchPortStatus'}}}
+
+
+def _run(lswitchports, compact):
+    nsx_cache = sync.NsxCache(compact=compact)
+    timings = []
+    for i in range(2):
+        start = time.time()
+        nsx_cache.process_updates([], [], lswitchports)
+        nsx_cache.process_deletes()
+        timings.append(time.time() - start)
+    return timings
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or DEFAULT_COUNTS
+    for count in counts:
+        lswitchports = [_get_lswitchport(i) for i in range(count)]
+        for compact in (False, True):
+            initial, no_change = _run(lswitchports, compact)
+            print("%(count)7d ports, %(mode)-7s cache: initial fill "
+                  "%(initial).3fs, unchanged pass %(no_change).3fs" %
+                  {'count': count,
+                   'mode': 'compact' if compact else 'full',
+                   'initial': initial,
+                   'no_change': no_change})
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,146 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Micro benchmark of the NSX-V xml serializer
+
+Compares the xml serializer of the NSX-V API client with the previous
+implementation, based on string concatenation, on edge firewall, NAT and
+DHCP bindings payloads. The output of both implementations is checked to be
+identical.
+
+Usage: python -m tools.benchmarks.xml_serializer [count [count ...]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import six
+
+from vmware_nsx.plugins.nsx_v.vshield.common import VcnsApiClient
+
+DEFAULT_COUNTS = [1000, 5000]
+REPEAT = 5
+
+
+def _legacy_xmldump(obj):
+    config = ""
+    attr = ""
+    if isinstance(obj, dict):
+        for key, value in six.iteritems(obj):
+            if key.startswith('__'):
+                a, x = _legacy_xmldump(value)
+                config += x
+            elif key.startswith('_'):
+                attr += ' %s="%s"' % (key[1:], value)
+            else:
+                a, x = _legacy_xmldump(value)
+                if key.startswith('@'):
+                    cfg = "%s" % (x)
+                else:
+                    cfg = "<%s%s>%s</%s>" % (key, a, x, key)
+
+                config += cfg
+    elif isinstance(obj, list):
+        for value in obj:
+            a, x = _legacy_xmldump(value)
+            attr += a
+            config += x
+    else:
+        config = obj
+
+    return attr, config
+
+
+def _get_firewall_config(count):
+    rules = [{'firewallRule': {
+        '_id': str(i),
+        'name': 'rule-%s' % i,
+        'action': 'accept',
+        'enabled': 'true',
+        'loggingEnabled': 'false',
+        'source': {'ipAddress': ['10.%d.%d.0/24' % (i // 256, i % 256)]},
+        'destination': {'groupingObjectId': ['securitygroup-%s' % i]},
+        'application': {'service': [{'protocol': 'tcp',
+                                     'port': str(1024 + i % 1000),
+                                     'sourcePort': 'any'}]}}}
+        for i in range(count)]
+    return {'firewall': {'enabled': 'true',
+                         'defaultPolicy': {'action': 'deny'},
+                         'firewallRules': rules}}
+
+
+def _get_nat_config(count):
+    rules = [{'natRule': {'action': 'dnat',
+                          'vnic': '0',
+                          'originalAddress': '172.24.%d.%d' % (
+                              i // 256, i % 256),
+                          'translatedAddress': '10.0.%d.%d' % (
+                              i // 256, i % 256),
+                          'enabled': 'true',
+                          'loggingEnabled': 'false'}}
+             for i in range(count)]
+    return {'nat': {'natRules': rules}}
+
+
+def _get_dhcp_bindings(count):
+    bindings = [{'staticBinding': {
+        'macAddress': 'fa:16:3e:%02x:%02x:%02x' % (
+            i // 65536, i // 256 % 256, i % 256),
+        'hostname': 'host-%s' % i,
+        'ipAddress': '10.1.%d.%d' % (i // 256, i % 256),
+        'defaultGateway': '10.1.0.1',
+        'subnetMask': '255.255.0.0',
+        'leaseTime': '86400'}} for i in range(count)]
+    return {'staticBindings': bindings}
+
+
+def _measure(func, obj):
+    # Keep the best run, to filter out noise
+    timings = []
+    for i in range(REPEAT):
+        start = time.time()
+        result = func(obj)
+        timings.append(time.time() - start)
+    return result, min(timings)
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or DEFAULT_COUNTS
+    payloads = (('firewall', _get_firewall_config),
+                ('nat', _get_nat_config),
+                ('dhcp', _get_dhcp_bindings))
+    for count in counts:
+        for name, get_payload in payloads:
+            payload = get_payload(count)
+            legacy, legacy_time = _measure(_legacy_xmldump, payload)
+            current, current_time = _measure(VcnsApiClient._xmldump,
+                                             payload)
+            if legacy != current:
+                print("%s payload with %d entries: serializers output "
+                      "differs" % (name, count))
+                return 1
+            print("%(count)5d %(name)-8s entries (%(size)8d bytes): legacy "
+                  "%(legacy).3fs, current %(current).3fs" %
+                  {'count': count, 'name': name,
+                   'size': len(current[1]),
+                   'legacy': legacy_time,
+                   'current': current_time})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
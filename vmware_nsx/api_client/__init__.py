@@ -29,3 +29,17 @@ def ctrl_conn_to_str(conn):
     else:
         raise TypeError(_('Invalid connection type: %s') % type(conn))
     return "%s%s:%s" % (proto, conn.host, conn.port)
+
+
+def get_response_header(response, name, default=None):
+    """Returns a header of a response read by an API request.
+
+    The headers of the response are replaced by a list of (name, value)
+    tuples when it is read, which HTTPResponse.getheader does not support
+    in python 3.
+    """
+    name = name.lower()
+    for header_name, value in response.headers:
+        if header_name.lower() == name:
+            return value
+    return default
@@ -17,7 +17,6 @@
 import abc
 import time
 
-from oslo_config import cfg
 from oslo_log import log as logging
 import six
 from six.moves import http_client as httplib
@@ -28,6 +27,7 @@ LOG = logging.getLogger(__name__)
 
 GENERATION_ID_TIMEOUT = -1
 DEFAULT_CONCURRENT_CONNECTIONS = 3
+DEFAULT_MIN_CONNECTIONS = 1
 DEFAULT_CONNECT_TIMEOUT = 5
 
 
@@ -102,24 +102,9 @@ class ApiClientBase(object):
         if not self._api_providers:
             LOG.warning("[%d] no API providers currently available.", rid)
             return None
-        if self._conn_pool.empty():
-            LOG.debug("[%d] Waiting to acquire API client connection.", rid)
-        priority, conn = self._conn_pool.get()
-        now = time.time()
-        if getattr(conn, 'last_used', now) < now - cfg.CONF.conn_idle_timeout:
-            LOG.info("[%(rid)d] Connection %(conn)s idle for %(sec)0.2f "
-                     "seconds; reconnecting.",
-                     {'rid': rid, 'conn': api_client.ctrl_conn_to_str(conn),
-                      'sec': now - conn.last_used})
-            conn = self._create_connection(*self._conn_params(conn))
-
-        conn.last_used = now
-        conn.priority = priority  # stash current priority for release
-        qsize = self._conn_pool.qsize()
-        LOG.debug("[%(rid)d] Acquired connection %(conn)s. %(qsize)d "
-                  "connection(s) available.",
-                  {'rid': rid, 'conn': api_client.ctrl_conn_to_str(conn),
-                   'qsize': qsize})
+        conn = self._conn_pool.acquire(rid=rid)
+        LOG.debug("[%(rid)d] Acquired connection %(conn)s.",
+                  {'rid': rid, 'conn': api_client.ctrl_conn_to_str(conn)})
         if auto_login and self.auth_cookie(conn) is None:
             self._wait_for_login(conn, headers)
         return conn
@@ -135,8 +120,8 @@ class ApiClientBase(object):
         :service_unavail: True if http_conn returned 503 response.
         :param rid: request id passed in from request eventlet.
         '''
-        conn_params = self._conn_params(http_conn)
-        if self._conn_params(http_conn) not in self._api_providers:
+        conn_params = self._normalize_conn_params(http_conn)
+        if conn_params not in self._conn_pool:
             LOG.debug("[%(rid)d] Released connection %(conn)s is not an "
                       "API provider for the cluster",
                       {'rid': rid,
@@ -145,35 +130,26 @@ class ApiClientBase(object):
         elif hasattr(http_conn, "no_release"):
             return
 
-        priority = http_conn.priority
         if bad_state:
-            # Reconnect to provider.
+            # The pool reconnects to the provider
             LOG.warning("[%(rid)d] Connection returned in bad state, "
                         "reconnecting to %(conn)s",
                         {'rid': rid,
                          'conn': api_client.ctrl_conn_to_str(http_conn)})
-            http_conn = self._create_connection(*self._conn_params(http_conn))
-        elif service_unavail:
-            # http_conn returned a service unavailable response, put other
-            # connections to the same controller at end of priority queue,
-            conns = []
-            while not self._conn_pool.empty():
-                priority, conn = self._conn_pool.get()
-                if self._conn_params(conn) == conn_params:
-                    priority = self._next_conn_priority
-                    self._next_conn_priority += 1
-                conns.append((priority, conn))
-            for priority, conn in conns:
-                self._conn_pool.put((priority, conn))
-            # put http_conn at end of queue also
-            priority = self._next_conn_priority
-            self._next_conn_priority += 1
-
-        self._conn_pool.put((priority, http_conn))
-        LOG.debug("[%(rid)d] Released connection %(conn)s. %(qsize)d "
-                  "connection(s) available.",
-                  {'rid': rid, 'conn': api_client.ctrl_conn_to_str(http_conn),
-                   'qsize': self._conn_pool.qsize()})
+        # The health of the provider is updated, so that the next requests
+        # are routed to the other providers if it failed
+        self._conn_pool.release(conn_params, http_conn, bad_state,
+                                service_unavail)
+        LOG.debug("[%(rid)d] Released connection %(conn)s.",
+                  {'rid': rid, 'conn': api_client.ctrl_conn_to_str(http_conn)})
+
+    def get_pool_stats(self):
+        """Return the connection pool statistics of each API provider"""
+        return self._conn_pool.stats()
+
+    def _login_if_needed(self, conn):
+        if self.auth_cookie(conn) is None:
+            self._wait_for_login(conn)
 
     def _wait_for_login(self, conn, headers=None):
         '''Block until a login has occurred for the current API provider.'''
@@ -36,7 +36,8 @@ class NsxApiClient(eventlet_client.EventletApiClient):
                  gen_timeout=base.GENERATION_ID_TIMEOUT,
                  use_https=True,
                  connect_timeout=base.DEFAULT_CONNECT_TIMEOUT,
-                 http_timeout=75, retries=2, redirects=2):
+                 http_timeout=75, retries=2, redirects=2,
+                 min_connections=base.DEFAULT_MIN_CONNECTIONS):
         '''Constructor. Adds the following:
 
         :param http_timeout: how long to wait before aborting an
@@ -49,7 +50,8 @@ class NsxApiClient(eventlet_client.EventletApiClient):
             api_providers, user, password,
             concurrent_connections=concurrent_connections,
             gen_timeout=gen_timeout, use_https=use_https,
-            connect_timeout=connect_timeout)
+            connect_timeout=connect_timeout,
+            min_connections=min_connections)
 
         self._request_timeout = http_timeout * retries
         self._http_timeout = http_timeout
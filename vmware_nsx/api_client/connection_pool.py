@@ -0,0 +1,312 @@
+# Copyright 2018 VMware, Inc.
+#
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+
+import collections
+import time
+import weakref
+
+import eventlet
+from eventlet import event
+from oslo_config import cfg
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Weight of the last request in the moving averages of the latency and the
+# error rate of a controller
+EWMA_WEIGHT = 0.2
+# A controller failing all its requests is ranked like a controller this
+# many times slower
+ERROR_PENALTY = 10
+# Latency assumed for the controllers, in seconds, so that controllers with
+# no requests yet are ranked by their load
+MIN_LATENCY = 0.001
+# Controllers with a higher error rate are used only if all the controllers
+# are failing
+MAX_ERROR_RATE = 0.5
+# Error rate below which the errors of a controller are forgotten
+MIN_ERROR_RATE = 0.01
+# Interval of the background maintenance of the pool, in seconds
+MAINTENANCE_INTERVAL = 10
+# Connections above the minimum size of a controller pool are closed after
+# being idle for this number of seconds
+SHRINK_IDLE_TIME = 60
+
+
+def conn_params_to_str(conn_params):
+    host, port, is_ssl = conn_params
+    return "%s://%s:%s" % ('https' if is_ssl else 'http', host, port)
+
+
+def _maintenance_loop(pool_ref):
+    """Maintain a connection pool until it is garbage collected
+
+    Only a weak reference to the pool is kept while sleeping, so that the
+    loop does not keep the pool and its client alive.
+    """
+    while True:
+        pool = pool_ref()
+        if pool is None:
+            return
+        try:
+            pool._maintain()
+        except Exception:
+            LOG.exception("Failed to maintain the API client connections")
+        del pool
+        eventlet.sleep(MAINTENANCE_INTERVAL)
+
+
+class ControllerPool(object):
+    """The connections to a single controller, and its health
+
+    The latency and the error rate of the controller are exponentially
+    weighted moving averages over its requests.
+    """
+
+    def __init__(self, conn_params, preferred=False):
+        self.conn_params = conn_params
+        self.preferred = preferred
+        # The idle connections, the most recently used last
+        self.idle = collections.deque()
+        self.size = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self._requests_since_maintenance = 0
+
+    @property
+    def in_use(self):
+        return self.size - len(self.idle)
+
+    def cost(self):
+        """The expected cost of one more request to this controller"""
+        return ((self.latency + MIN_LATENCY) * (self.in_use + 1) *
+                (1 + ERROR_PENALTY * self.error_rate))
+
+    def record(self, latency, error):
+        if self.requests:
+            self.latency += EWMA_WEIGHT * (latency - self.latency)
+        else:
+            self.latency = latency
+        self.error_rate += EWMA_WEIGHT * (float(error) - self.error_rate)
+        self.requests += 1
+        self._requests_since_maintenance += 1
+        if error:
+            self.errors += 1
+
+    def decay(self):
+        """Forgive the errors of a controller which is not used anymore
+
+        A controller with a high error rate gets no requests, so its error
+        rate decays over time instead, until it is tried again.
+        """
+        if not self._requests_since_maintenance:
+            self.error_rate *= 1 - EWMA_WEIGHT
+            if self.error_rate < MIN_ERROR_RATE:
+                self.error_rate = 0.0
+        self._requests_since_maintenance = 0
+
+    def stats(self):
+        return {'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.in_use,
+                'requests': self.requests,
+                'errors': self.errors,
+                'latency': self.latency,
+                'error_rate': self.error_rate}
+
+
+class ConnectionPool(object):
+    """Connections to the API providers, in a pool per controller
+
+    Each request is routed to the healthiest controller with an available
+    connection, according to the latency, error rate and load of the
+    controllers. The failing controllers are avoided until their errors are
+    forgotten. The pool of a controller grows on demand up to max_size
+    connections, and callers wait when all the controllers are at their
+    maximum. In the background, from the addition of the first controller
+    and every MAINTENANCE_INTERVAL seconds, the pools are kept at min_size
+    connected and logged in connections, the connections idle for
+    conn_idle_timeout are reconnected, and the extra connections idle for
+    SHRINK_IDLE_TIME are closed.
+
+    create_func creates a connection from its conn_params. login_func logs
+    in to the controller of a connection, if it has no session.
+    """
+
+    def __init__(self, create_func, login_func, min_size, max_size):
+        self._create_func = create_func
+        self._login_func = login_func
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self._controllers = collections.OrderedDict()
+        self._waiters = collections.deque()
+        self._maintenance = None
+
+    def __contains__(self, conn_params):
+        return conn_params in self._controllers
+
+    def add_controller(self, conn_params, preferred=False):
+        """Add a controller, with min_size connections not yet connected
+
+        Requests are routed to the preferred controllers first.
+        """
+        if conn_params in self._controllers:
+            return
+        controller = ControllerPool(conn_params, preferred=preferred)
+        for __ in range(self.min_size):
+            controller.idle.append(self._create(controller))
+        self._controllers[conn_params] = controller
+        if self._maintenance is None:
+            # Connect and log in the connections before the first request
+            self._maintenance = eventlet.spawn(_maintenance_loop,
+                                               weakref.ref(self))
+
+    def _create(self, controller):
+        conn = self._create_func(*controller.conn_params)
+        conn.last_used = time.time()
+        controller.size += 1
+        return conn
+
+    def _select(self, conn_params=None):
+        if conn_params is not None:
+            candidates = [self._controllers[conn_params]]
+        else:
+            # Wait for a healthy controller rather than use a failing one
+            candidates = [controller
+                          for controller in self._controllers.values()
+                          if controller.error_rate < MAX_ERROR_RATE]
+            if not candidates:
+                candidates = self._controllers.values()
+        candidates = [controller for controller in candidates
+                      if controller.idle or controller.size < self.max_size]
+        if candidates:
+            return min(candidates, key=lambda controller: (
+                not controller.preferred, controller.cost()))
+
+    def acquire(self, conn_params=None, wait=True, rid=-1):
+        """Check out a connection
+
+        :param conn_params: the controller of the connection, or None for
+            the healthiest controller.
+        :param wait: wait for an available connection, instead of returning
+            None.
+        """
+        while True:
+            controller = self._select(conn_params)
+            if controller is not None:
+                break
+            if not wait:
+                return None
+            LOG.debug("[%d] Waiting to acquire API client connection.", rid)
+            waiter = event.Event()
+            self._waiters.append(waiter)
+            waiter.wait()
+        if controller.idle:
+            conn = controller.idle.pop()
+        else:
+            conn = self._create(controller)
+        now = time.time()
+        if conn.last_used < now - cfg.CONF.conn_idle_timeout:
+            # Missed by the background maintenance
+            LOG.info("[%(rid)d] Connection %(conn)s idle for %(sec)0.2f "
+                     "seconds; reconnecting.",
+                     {'rid': rid,
+                      'conn': conn_params_to_str(controller.conn_params),
+                      'sec': now - conn.last_used})
+            conn.close()
+            conn = self._create_func(*controller.conn_params)
+        conn.last_used = now
+        conn.acquired_at = now
+        return conn
+
+    def release(self, conn_params, conn, bad_state=False,
+                service_unavail=False):
+        """Return a connection to the pool of its controller
+
+        The duration of the check out, and whether the request failed, are
+        recorded in the health of the controller.
+        """
+        controller = self._controllers.get(conn_params)
+        if controller is None:
+            return
+        now = time.time()
+        controller.record(now - getattr(conn, 'acquired_at', now),
+                          bad_state or service_unavail)
+        if bad_state:
+            conn.close()
+            conn = self._create_func(*conn_params)
+        conn.last_used = now
+        controller.idle.append(conn)
+        if self._waiters:
+            self._waiters.popleft().send()
+
+    def _maintain(self):
+        for controller in list(self._controllers.values()):
+            controller.decay()
+            self._shrink(controller)
+            self._warm(controller)
+
+    def _shrink(self, controller):
+        now = time.time()
+        # The oldest idle connections are first
+        while (controller.size > self.min_size and controller.idle and
+               controller.idle[0].last_used < now - SHRINK_IDLE_TIME):
+            controller.idle.popleft().close()
+            controller.size -= 1
+
+    def _warm(self, controller):
+        while controller.size < self.min_size:
+            controller.idle.appendleft(self._create(controller))
+        now = time.time()
+        # Reconnect the connections which would be idle for too long before
+        # the next maintenance
+        stale_time = now + MAINTENANCE_INTERVAL - cfg.CONF.conn_idle_timeout
+        # Check out the idle connections, so that they are not used while
+        # connecting or logging in
+        conns = list(controller.idle)
+        controller.idle.clear()
+        warmed = collections.deque()
+        try:
+            for conn in conns:
+                if conn.last_used < stale_time:
+                    conn.close()
+                    conn = self._create_func(*controller.conn_params)
+                    conn.last_used = now
+                if conn.sock is None:
+                    conn.connect()
+                # Log in again if the session of the controller was lost
+                self._login_func(conn)
+                warmed.append(conn)
+        except Exception as e:
+            LOG.debug("Failed to warm up connections to %(conn)s: %(e)s",
+                      {'conn': conn_params_to_str(controller.conn_params),
+                       'e': e})
+            warmed.append(conn)
+            warmed.extend(conns[len(warmed):])
+        finally:
+            # Keep the connections used in the meantime as the most recent
+            warmed.extend(controller.idle)
+            controller.idle = warmed
+            for __ in range(min(len(self._waiters), len(warmed))):
+                self._waiters.popleft().send()
+
+    def stats(self):
+        """Return the statistics of the pool of each controller"""
+        return dict((conn_params_to_str(conn_params), controller.stats())
+                    for conn_params, controller in self._controllers.items())
@@ -19,7 +19,9 @@ import time
 
 from oslo_log import log as logging
 
+from vmware_nsx import api_client
 from vmware_nsx.api_client import base
+from vmware_nsx.api_client import connection_pool
 from vmware_nsx.api_client import eventlet_request
 
 import eventlet
@@ -35,18 +37,22 @@ class EventletApiClient(base.ApiClientBase):
                  concurrent_connections=base.DEFAULT_CONCURRENT_CONNECTIONS,
                  gen_timeout=base.GENERATION_ID_TIMEOUT,
                  use_https=True,
-                 connect_timeout=base.DEFAULT_CONNECT_TIMEOUT):
+                 connect_timeout=base.DEFAULT_CONNECT_TIMEOUT,
+                 min_connections=base.DEFAULT_MIN_CONNECTIONS):
         '''Constructor
 
         :param api_providers: a list of tuples of the form: (host, port,
             is_ssl).
         :param user: login username.
         :param password: login password.
-        :param concurrent_connections: total number of concurrent connections.
+        :param concurrent_connections: maximum number of concurrent
+            connections to each provider.
         :param use_https: whether or not to use https for requests.
         :param connect_timeout: connection timeout in seconds.
         :param gen_timeout controls how long the generation id is kept
             if set to -1 the generation id is never timed out
+        :param min_connections: number of connections kept open to each
+            provider.
         '''
         if not api_providers:
             api_providers = []
@@ -63,14 +69,13 @@ class EventletApiClient(base.ApiClientBase):
         self._config_gen_ts = None
         self._gen_timeout = gen_timeout
 
-        # Connection pool is a list of queues.
-        self._conn_pool = eventlet.queue.PriorityQueue()
-        self._next_conn_priority = 1
-        for __ in range(concurrent_connections):
-            for host, port, is_ssl in api_providers:
-                conn = self._create_connection(host, port, is_ssl)
-                self._conn_pool.put((self._next_conn_priority, conn))
-                self._next_conn_priority += 1
+        # Connection pool with a sub-pool per provider
+        self._conn_pool = connection_pool.ConnectionPool(
+            self._create_connection, self._login_if_needed,
+            min_connections, concurrent_connections)
+        for p in api_providers:
+            self._conn_pool.add_controller(self._normalize_conn_params(
+                tuple(p)))
 
     def acquire_redirect_connection(self, conn_params, auto_login=True,
                                     headers=None):
@@ -84,54 +89,29 @@ class EventletApiClient(base.ApiClientBase):
 
         Returns: An available HTTPConnection instance corresponding to the
                  specified conn_params. If a connection did not previously
-                 exist, new connections are created with the highest priority
-                 in the connection pool and one of these new connections
-                 returned.
+                 exist, the provider is added to the connection pool with
+                 the highest priority and a new connection returned.
         """
-        result_conn = None
         data = self._get_provider_data(conn_params)
-        if data:
-            # redirect target already exists in provider data and connections
-            # to the provider have been added to the connection pool. Try to
-            # obtain a connection from the pool, note that it's possible that
-            # all connection to the provider are currently in use.
-            conns = []
-            while not self._conn_pool.empty():
-                priority, conn = self._conn_pool.get_nowait()
-                if not result_conn and self._conn_params(conn) == conn_params:
-                    conn.priority = priority
-                    result_conn = conn
-                else:
-                    conns.append((priority, conn))
-            for priority, conn in conns:
-                self._conn_pool.put((priority, conn))
-            # hack: if no free connections available, create new connection
-            # and stash "no_release" attribute (so that we only exceed
-            # self._concurrent_connections temporarily)
-            if not result_conn:
-                conn = self._create_connection(*conn_params)
-                conn.priority = 0  # redirect connections have highest priority
-                conn.no_release = True
-                result_conn = conn
-        else:
+        if not data:
             #redirect target not already known, setup provider lists
             self._api_providers.update([conn_params])
             self._set_provider_data(conn_params,
                                     (eventlet.semaphore.Semaphore(1), None))
-            # redirects occur during cluster upgrades, i.e. results to old
-            # redirects to new, so give redirect targets highest priority
-            priority = 0
-            for i in range(self._concurrent_connections):
-                conn = self._create_connection(*conn_params)
-                conn.priority = priority
-                if i == self._concurrent_connections - 1:
-                    break
-                self._conn_pool.put((priority, conn))
-            result_conn = conn
-        if result_conn:
+        # redirects occur during cluster upgrades, i.e. results to old
+        # redirects to new, so give redirect targets highest priority
+        conn_params = self._normalize_conn_params(conn_params)
+        self._conn_pool.add_controller(conn_params, preferred=True)
+        result_conn = self._conn_pool.acquire(conn_params, wait=False)
+        # hack: if no free connections available, create new connection
+        # and stash "no_release" attribute (so that we only exceed
+        # self._concurrent_connections temporarily)
+        if not result_conn:
+            result_conn = self._create_connection(*conn_params)
+            result_conn.no_release = True
             result_conn.last_used = time.time()
-            if auto_login and self.auth_cookie(conn) is None:
-                self._wait_for_login(result_conn, headers)
+        if auto_login and self.auth_cookie(result_conn) is None:
+            self._wait_for_login(result_conn, headers)
         return result_conn
 
     def _login(self, conn=None, headers=None):
@@ -146,7 +126,7 @@ class EventletApiClient(base.ApiClientBase):
                 LOG.error('Login error "%s"', ret)
                 raise ret
 
-            cookie = ret.getheader("Set-Cookie")
+            cookie = api_client.get_response_header(ret, "Set-Cookie")
             if cookie:
                 LOG.debug("Saving new authentication cookie '%s'", cookie)
 
@@ -166,9 +166,9 @@ class LoginRequestEventlet(EventletApiRequest):
 
     def __init__(self, client_obj, user, password, client_conn=None,
                  headers=None):
-        if headers is None:
-            headers = {}
-        headers.update({"Content-Type": "application/x-www-form-urlencoded"})
+        # The headers of the request being authenticated are not modified
+        headers = dict(headers or {})
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
         body = urllib.parse.urlencode({"username": user, "password": password})
         super(LoginRequestEventlet, self).__init__(
             client_obj, "/ws.v1/login", "POST", body, headers,
@@ -79,8 +79,7 @@ class ApiRequest(object):
     def _issue_request(self):
         '''Issue a request to a provider.'''
         conn = (self._client_conn or
-                self._api_client.acquire_connection(True,
-                                                    copy.copy(self._headers),
+                self._api_client.acquire_connection(True, self._headers,
                                                     rid=self._rid()))
         if conn is None:
             error = Exception(_("No API connections available"))
@@ -137,7 +136,8 @@ class ApiRequest(object):
                            'status': response.status,
                            'elapsed': elapsed_time})
 
-                new_gen = response.getheader('X-Nvp-Config-Generation', None)
+                new_gen = api_client.get_response_header(
+                    response, 'X-Nvp-Config-Generation')
                 if new_gen:
                     LOG.debug("Reading X-Nvp-config-Generation response "
                               "header: '%s'", new_gen)
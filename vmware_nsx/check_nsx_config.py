@@ -108,7 +108,8 @@ def main():
     cluster = nsx_utils.create_nsx_cluster(
         cfg.CONF,
         cfg.CONF.NSX.concurrent_connections,
-        cfg.CONF.NSX.nsx_gen_timeout)
+        cfg.CONF.NSX.nsx_gen_timeout,
+        min_connections=cfg.CONF.NSX.min_connections)
     nsx_controllers = get_nsx_controllers(cluster)
     num_controllers = len(nsx_controllers)
     print("Number of controllers found: %s" % num_controllers)
@@ -61,6 +61,9 @@ base_opts = [
                deprecated_group='NVP',
                help=_("Maximum concurrent connections to each NSX "
                       "controller.")),
+    cfg.IntOpt('min_connections', default=1,
+               help=_("Number of connections to each NSX controller kept "
+                      "open and logged in, in the background.")),
     cfg.IntOpt('nsx_gen_timeout', default=-1,
                deprecated_name='nvp_gen_timeout',
                deprecated_group='NVP',
@@ -168,7 +171,21 @@ sync_opts = [
                        "synchronization on show operations. In this way, show "
                        "operations will always fetch the operational status "
                        "of the resource from the NSX backend, and this might "
-                       "have a considerable impact on overall performance."))
+                       "have a considerable impact on overall performance.")),
+    cfg.BoolOpt('compact_cache', default=False,
+                help=_("Enable this option to store only the attributes "
+                       "relevant to the status synchronization (tags, admin "
+                       "state and status) of the NSX resources in the "
+                       "synchronization cache, and to detect changes using "
+                       "those attributes only. This considerably reduces the "
+                       "memory and CPU consumption of the synchronization "
+                       "task with a large number of resources.")),
+    cfg.IntOpt('max_concurrent_fetches', default=3, min=1,
+               help=_("Maximum number of concurrent requests issued to the "
+                      "NSX backend when fetching a chunk of data for the "
+                      "synchronization task. Logical switches, routers and "
+                      "ports are retrieved in parallel up to this limit. Set "
+                      "to 1 for fetching them one after the other."))
 ]
 
 connection_opts = [
@@ -241,6 +258,13 @@ nsx_common_opts = [
                       "parameter to tooz coordinator. By default, value is "
                       "None and oslo_concurrency is used for single-node "
                       "lock management.")),
+    cfg.IntOpt('lock_stats_dump_interval',
+               default=0, min=0,
+               help=_("(Optional) Interval in seconds between dumps to the "
+                      "log of the lock contention statistics of each "
+                      "process: the wait and hold times of each lock name, "
+                      "and its current holder. 0 disables the collection "
+                      "of the statistics.")),
     cfg.BoolOpt('api_replay_mode',
                 default=False,
                 help=_("If true, the server then allows the caller to "
@@ -479,6 +503,24 @@ nsx_v3_opts = nsx_v3_and_p + [
     cfg.BoolOpt('housekeeping_readonly',
                 default=True,
                 help=_("Housekeeping will only warn about breakage.")),
+    cfg.IntOpt('ipam_prefetch_size',
+               default=0, min=0,
+               help=_("Number of addresses the IPAM driver allocates ahead "
+                      "of time from each NSX IP pool, so that allocations "
+                      "of any address are served locally. Unused addresses "
+                      "are released back to the pool after a minute "
+                      "without allocations. 0 disables the prefetch.")),
+    cfg.IntOpt('ipam_pool_cache_ttl',
+               default=0, min=0,
+               help=_("Time in seconds during which the details of an NSX "
+                      "IP pool are reused by the IPAM driver when "
+                      "allocating and releasing addresses. 0 disables the "
+                      "cache.")),
+    cfg.IntOpt('vpn_status_cache_ttl',
+               default=10, min=0,
+               help=_("Time in seconds during which the status of an NSX "
+                      "IPsec session is reused when reporting the status of "
+                      "the VPN connections. 0 disables the cache.")),
 
 ]
 
@@ -576,6 +618,11 @@ nsxv_opts = [
                default=DEFAULT_STATUS_CHECK_INTERVAL,
                help=_("(Optional) Asynchronous task status check interval. "
                       "Default is 2000 (millisecond)")),
+    cfg.IntOpt('task_manager_shards',
+               default=4, min=1,
+               help=_("(Optional) Number of workers running the "
+                      "asynchronous tasks. The tasks of a resource are "
+                      "always run by the same worker, in order.")),
     cfg.StrOpt('vdn_scope_id',
                help=_('(Optional) Network scope ID for VXLAN virtual wires')),
     cfg.StrOpt('dvs_id',
@@ -773,6 +820,25 @@ nsxv_opts = [
     cfg.IntOpt('nsx_transaction_timeout',
                default=240,
                help=_("Timeout interval for NSX backend transactions.")),
+    cfg.IntOpt('edge_inventory_cache_ttl',
+               default=0, min=0,
+               help=_("Time in seconds during which the list of the NSX "
+                      "edges fetched from the backend is reused, for "
+                      "checking the status of backup edges before "
+                      "allocating them, and by the admin utility. 0 "
+                      "disables the cache.")),
+    cfg.IntOpt('ipam_prefetch_size',
+               default=0, min=0,
+               help=_("Number of addresses the IPAM driver allocates ahead "
+                      "of time from each NSX IP pool, so that allocations "
+                      "of any address are served locally. Unused addresses "
+                      "are released back to the pool after a minute "
+                      "without allocations. 0 disables the prefetch.")),
+    cfg.IntOpt('api_log_max_body_length',
+               default=0, min=0,
+               help=_("Maximum number of characters of the NSX API request "
+                      "and response bodies included in the debug logs. "
+                      "Longer bodies are truncated. 0 means no limit.")),
     cfg.BoolOpt('share_edges_between_tenants',
                 default=True,
                 help=_("If False, different tenants will not use the same "
@@ -796,6 +862,20 @@ nsxv_opts = [
                 default=False,
                 help=_("Use subnet's exclusive router as a platform for "
                        "LBaaS")),
+    cfg.IntOpt('sg_rule_update_coalesce_window',
+               default=0,
+               help=_("(Optional) Time (in milliseconds) to wait for "
+                      "concurrent security group rule changes before "
+                      "updating the backend section, so that they are "
+                      "applied together. Requests already waiting for the "
+                      "section are always applied together.")),
+    cfg.IntOpt('config_validation_cache_ttl',
+               default=300,
+               help=_("(Optional) Time (in seconds) during which a "
+                      "successful validation of the configuration against "
+                      "the backend is reused by the other workers of the "
+                      "host, through a file under the lock path. 0 to "
+                      "validate the configuration in each worker.")),
 ]
 
 # define the configuration of each NSX-V availability zone.
@@ -951,6 +1031,15 @@ nsx_tvd_opts = [
                 help=_("The default availability zones that will be used for "
                        "NSX-V3 networks and routers creation under the TVD "
                        "plugin.")),
+    cfg.IntOpt('plugin_mapping_cache_ttl',
+               default=300,
+               help=_("Time (in seconds) to keep the project to plugin and "
+                      "network to project mappings in the local cache. Use "
+                      "0 to disable the cache.")),
+    cfg.IntOpt('plugin_mapping_cache_size',
+               default=10000,
+               help=_("Maximal number of entries in each of the project to "
+                      "plugin and network to project local caches.")),
 ]
 
 # Register the configuration options
@@ -155,3 +155,13 @@ class ExtensionDriver(object):
         and/or returned as the result of a port operation.
         """
         pass
+
+    def prepare_ports_dicts(self, context, ports):
+        """Prepare the extension of a list of port dictionaries.
+        :param context: plugin request context
+        :param ports: list of port dictionaries
+        Called before extend_port_dict is called for each of the ports
+        of a listing, so that the driver can fetch the data it needs for
+        all the ports at once.
+        """
+        pass
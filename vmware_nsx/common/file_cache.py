@@ -0,0 +1,74 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import time
+
+from oslo_concurrency import lockutils
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+LOG = logging.getLogger(__name__)
+
+
+class FileCache(object):
+    """A short-lived value shared by the processes of a host
+
+    The value is stored in a file under the lock path, with a key, such as a
+    fingerprint of the configuration it depends on, and the time it was
+    stored. It is used only with the same key, for ttl seconds. Without a
+    lock path, or with a ttl of 0, nothing is cached.
+    """
+
+    def __init__(self, name, ttl):
+        lock_path = lockutils.get_lock_path(cfg.CONF)
+        self._path = os.path.join(lock_path, name) if lock_path else None
+        self._ttl = ttl
+
+    @property
+    def enabled(self):
+        return bool(self._path and self._ttl > 0)
+
+    def get(self, key):
+        """Return the cached value for this key, or None"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path) as f:
+                entry = jsonutils.loads(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return None
+        age = time.time() - entry.get('time', 0)
+        if not 0 <= age < self._ttl:
+            return None
+        return entry.get('value')
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        # Replace the file at once, so that readers never see a partial file
+        tmp_path = '%s.%d.tmp' % (self._path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(jsonutils.dumps({'key': key,
+                                         'time': time.time(),
+                                         'value': value}))
+            os.rename(tmp_path, self._path)
+        except (IOError, OSError) as e:
+            LOG.warning("Failed to write cache file %(path)s: %(e)s",
+                        {'path': self._path, 'e': e})
@@ -13,21 +13,131 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import logging
 import os
+import threading
+import time
 import traceback
 
 from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log
+from oslo_service import loopingcall
 from tooz import coordination
 
 LOG = log.getLogger(__name__)
 
+# Upper bounds in seconds of the buckets of the wait and hold times
+# histograms. The last bucket counts the longer times.
+HISTOGRAM_BOUNDS = (0.001, 0.01, 0.1, 1, 10)
+# Maximal number of lock names with statistics, the least recently taken
+# locks are dropped first
+MAX_LOCK_STATS = 1000
+
+_lock_stats = collections.OrderedDict()
+_lock_stats_lock = threading.Lock()
+
+
+def _get_histogram_bucket(seconds):
+    for index, bound in enumerate(HISTOGRAM_BOUNDS):
+        if seconds < bound:
+            return index
+    return len(HISTOGRAM_BOUNDS)
+
+
+class LockStats(object):
+    """Contention statistics of a lock name"""
+
+    def __init__(self, name):
+        self.name = name
+        self.acquired = 0
+        self.waiting = 0
+        self.holder = None
+        self.total_wait_time = 0
+        self.max_wait_time = 0
+        self.total_hold_time = 0
+        self.max_hold_time = 0
+        self.wait_histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.hold_histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add_wait(self, seconds, holder):
+        self.acquired += 1
+        self.holder = holder
+        self.total_wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+        self.wait_histogram[_get_histogram_bucket(seconds)] += 1
+
+    def add_hold(self, seconds):
+        self.holder = None
+        self.total_hold_time += seconds
+        self.max_hold_time = max(self.max_hold_time, seconds)
+        self.hold_histogram[_get_histogram_bucket(seconds)] += 1
+
+    def to_dict(self):
+        return {'acquired': self.acquired,
+                'waiting': self.waiting,
+                'holder': self.holder,
+                'total_wait_time': self.total_wait_time,
+                'max_wait_time': self.max_wait_time,
+                'total_hold_time': self.total_hold_time,
+                'max_hold_time': self.max_hold_time,
+                'wait_histogram': list(self.wait_histogram),
+                'hold_histogram': list(self.hold_histogram)}
+
+
+def _get_lock_stats(name):
+    # Must be called with _lock_stats_lock held
+    stats = _lock_stats.pop(name, None)
+    if stats is None:
+        stats = LockStats(name)
+        while len(_lock_stats) >= MAX_LOCK_STATS:
+            _lock_stats.popitem(last=False)
+    _lock_stats[name] = stats
+    return stats
+
+
+class _InstrumentedLock(object):
+    """Wraps a lock context manager to collect its contention statistics"""
+
+    def __init__(self, name, lock):
+        self._name = name
+        self._lock = lock
+        self._stats = None
+        self._acquired_at = None
+
+    def __enter__(self):
+        with _lock_stats_lock:
+            self._stats = _get_lock_stats(self._name)
+            self._stats.waiting += 1
+        start = time.time()
+        try:
+            result = self._lock.__enter__()
+        except Exception:
+            with _lock_stats_lock:
+                self._stats.waiting -= 1
+            raise
+        self._acquired_at = time.time()
+        holder = '%s:%s' % (os.getpid(), threading.current_thread().name)
+        with _lock_stats_lock:
+            self._stats.waiting -= 1
+            self._stats.add_wait(self._acquired_at - start, holder)
+        return result
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        try:
+            return self._lock.__exit__(exc_type, exc_value, exc_tb)
+        finally:
+            with _lock_stats_lock:
+                self._stats.add_hold(time.time() - self._acquired_at)
+
 
 class LockManager(object):
     _coordinator = None
     _coordinator_pid = None
     _connect_string = cfg.CONF.locking_coordinator_url
+    _stats_dump = None
+    _stats_dump_pid = None
 
     def __init__(self):
         LOG.debug('LockManager initialized!')
@@ -36,16 +146,19 @@ class LockManager(object):
     def get_lock(name, **kwargs):
         if cfg.CONF.locking_coordinator_url:
             lck = LockManager._get_lock_distributed(name)
-            LOG.debug('Lock %s taken with stack trace %s', name,
-                      traceback.extract_stack())
-            return lck
         else:
             # Ensure that external=True
             kwargs['external'] = True
             lck = LockManager._get_lock_local(name, **kwargs)
+        # Extracting the stack is expensive, so do it only if it is going
+        # to be logged
+        if LOG.isEnabledFor(logging.DEBUG):
             LOG.debug('Lock %s taken with stack trace %s', name,
                       traceback.extract_stack())
-            return lck
+        if cfg.CONF.lock_stats_dump_interval:
+            LockManager._start_stats_dump()
+            lck = _InstrumentedLock(name, lck)
+        return lck
 
     @staticmethod
     def _get_lock_local(name, **kwargs):
@@ -67,3 +180,52 @@ class LockManager(object):
 
         LOG.debug('Retrieved lock for %s', name)
         return LockManager._coordinator.get_lock(name)
+
+    @staticmethod
+    def _start_stats_dump():
+        # Like the coordinator, the statistics are dumped by each process
+        if LockManager._stats_dump_pid == os.getpid():
+            return
+        LockManager._stats_dump_pid = os.getpid()
+        interval = cfg.CONF.lock_stats_dump_interval
+        LockManager._stats_dump = loopingcall.FixedIntervalLoopingCall(
+            LockManager.dump_lock_stats)
+        LockManager._stats_dump.start(interval, initial_delay=interval)
+
+    @staticmethod
+    def get_lock_stats():
+        """Return the contention statistics of the locks by lock name"""
+        with _lock_stats_lock:
+            return dict((name, stats.to_dict())
+                        for name, stats in _lock_stats.items())
+
+    @staticmethod
+    def reset_lock_stats():
+        with _lock_stats_lock:
+            _lock_stats.clear()
+
+    @staticmethod
+    def dump_lock_stats():
+        """Log the contention statistics of the locks
+
+        The locks are logged from the longest total wait time, with the
+        histograms of their wait and hold times.
+        """
+        lock_stats = LockManager.get_lock_stats()
+        if not lock_stats:
+            return
+        buckets = ['<%ss' % bound for bound in HISTOGRAM_BOUNDS]
+        buckets.append('>=%ss' % HISTOGRAM_BOUNDS[-1])
+        LOG.info("Lock statistics of process %(pid)s, histogram buckets "
+                 "%(buckets)s", {'pid': os.getpid(),
+                                 'buckets': ' '.join(buckets)})
+        for name, stats in sorted(lock_stats.items(),
+                                  key=lambda item: -item[1][
+                                      'total_wait_time']):
+            LOG.info("Lock %(name)s: acquired %(acquired)d times, "
+                     "%(waiting)d waiting, held by %(holder)s, wait time "
+                     "total %(total_wait_time).3fs max %(max_wait_time).3fs "
+                     "histogram %(wait_histogram)s, hold time total "
+                     "%(total_hold_time).3fs max %(max_hold_time).3fs "
+                     "histogram %(hold_histogram)s",
+                     dict(stats, name=name))
@@ -133,3 +133,10 @@ class ExtensionManager(stevedore.named.NamedExtensionManager):
         """Notify all extension drivers to extend port dictionary."""
         self._call_on_dict_driver("extend_port_dict", session, base_model,
                                   result)
+
+    def prepare_ports_dicts(self, context, ports):
+        """Notify all extension drivers before extending a ports listing."""
+        for driver in self.ordered_ext_drivers:
+            prepare = getattr(driver.obj, 'prepare_ports_dicts', None)
+            if prepare:
+                prepare(context, ports)
@@ -205,7 +205,8 @@ def get_nsx_router_id(session, cluster, neutron_router_id):
     return nsx_router_id
 
 
-def create_nsx_cluster(cluster_opts, concurrent_connections, gen_timeout):
+def create_nsx_cluster(cluster_opts, concurrent_connections, gen_timeout,
+                       min_connections=1):
     cluster = nsx_cluster.NSXCluster(**cluster_opts)
 
     def _ctrl_split(x, y):
@@ -219,7 +220,8 @@ def create_nsx_cluster(cluster_opts, concurrent_connections, gen_timeout):
         retries=cluster.retries,
         redirects=cluster.redirects,
         concurrent_connections=concurrent_connections,
-        gen_timeout=gen_timeout)
+        gen_timeout=gen_timeout,
+        min_connections=min_connections)
     return cluster
 
 
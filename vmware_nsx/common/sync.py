@@ -16,6 +16,7 @@
 import copy
 import random
 
+import eventlet
 from neutron_lib import constants
 from neutron_lib import context as n_context
 from neutron_lib.db import api as db_api
@@ -44,6 +45,11 @@ from vmware_nsx.nsxlib.mh import switch as switchlib
 # NOTE(salv-orlando): This might become a version-dependent map should the
 # limit be raised in future versions
 MAX_PAGE_SIZE = 5000
+# Resource attributes and status relations used by the synchronization task
+SYNC_ATTRIBUTES = ('admin_status_enabled',)
+SYNC_STATUS_RELATIONS = ('LogicalSwitchStatus', 'LogicalRouterStatus',
+                         'LogicalPortStatus')
+SYNC_STATUS_ATTRIBUTES = ('fabric_status', 'fabric_status_up')
 
 LOG = log.getLogger(__name__)
 
@@ -60,9 +66,15 @@ class NsxCache(object):
       left unchanged)
     - data: current resource data
     - data_bk: backup of resource data prior to its removal
+
+    In compact mode only the attributes used by the synchronization task
+    (uuid, tags, admin state and status) are stored as the resource data,
+    and the resource hash is computed from those attributes only, instead
+    of from the JSON serialization of the whole resource.
     """
 
-    def __init__(self):
+    def __init__(self, compact=False):
+        self._compact = compact
         # Maps an uuid to the dict containing it
         self._uuid_dict_mappings = {}
         # Dicts for NSX cached resources
@@ -90,18 +102,47 @@ class NsxCache(object):
                 del self._uuid_dict_mappings[uuid]
                 LOG.debug("Removed item %s from NSX object cache", uuid)
 
+    @staticmethod
+    def _get_sync_data(item):
+        """Return the sync relevant data of a resource, and its hash
+
+        The hash is computed from a tuple of the relevant values, which is
+        much cheaper than hashing the JSON serialization of the resource.
+        """
+        tags = item.get('tags', [])
+        data = {'uuid': item['uuid'], 'tags': tags}
+        fingerprint = [tuple((tag.get('scope'), tag.get('tag'))
+                             for tag in tags)]
+        for attr in SYNC_ATTRIBUTES:
+            if attr in item:
+                data[attr] = item[attr]
+                fingerprint.append((attr, item[attr]))
+        relations = item.get('_relations')
+        if relations:
+            data['_relations'] = {}
+            for name in SYNC_STATUS_RELATIONS:
+                status = relations.get(name)
+                if status is None:
+                    continue
+                data['_relations'][name] = {}
+                for attr in SYNC_STATUS_ATTRIBUTES:
+                    if attr in status:
+                        data['_relations'][name][attr] = status[attr]
+                        fingerprint.append((name, attr, status[attr]))
+        return data, hash(tuple(fingerprint))
+
     def _update_resources(self, resources, new_resources, clear_changed=True):
         if clear_changed:
             self._clear_changed_flag_and_remove_from_cache(resources)
 
-        def do_hash(item):
-            return hash(jsonutils.dumps(item))
-
         # Parse new data and identify new, deleted, and updated resources
         for item in new_resources:
             item_id = item['uuid']
+            if self._compact:
+                item, new_hash = self._get_sync_data(item)
+            else:
+                new_hash = hash(jsonutils.dumps(item))
             if resources.get(item_id):
-                new_hash = do_hash(item)
                 if new_hash != resources[item_id]['hash']:
                     resources[item_id]['hash'] = new_hash
                     resources[item_id]['changed'] = True
@@ -112,7 +153,7 @@ class NsxCache(object):
                 resources[item_id]['hit'] = True
                 LOG.debug("Updating item %s in NSX object cache", item_id)
             else:
-                resources[item_id] = {'hash': do_hash(item)}
+                resources[item_id] = {'hash': new_hash}
                 resources[item_id]['hit'] = True
                 resources[item_id]['changed'] = True
                 resources[item_id]['data'] = item
@@ -183,6 +224,10 @@ class SyncParameters(object):
     Page cursors: markers for the next resource to fetch.
                  'start' means page cursor unset for fetching 1st page
     init_sync_performed: True if the initial synchronization concluded
+    resource_totals: number of switches, routers and ports found at the
+                     beginning of the last synchronization cycle
+    resource_pending: estimated number of switches, routers and ports
+                      still to fetch in the current synchronization cycle
     """
 
     def __init__(self, min_chunk_size):
@@ -194,6 +239,8 @@ class SyncParameters(object):
         self.lp_cursor = 'start'
         self.init_sync_performed = False
         self.total_size = 0
+        self.resource_totals = None
+        self.resource_pending = None
 
 
 def _start_loopingcall(min_chunk_size, state_sync_interval, func,
@@ -229,9 +276,10 @@ class NsxSynchronizer(object):
 
     def __init__(self, plugin, cluster, state_sync_interval,
                  req_delay, min_chunk_size, max_rand_delay=0,
-                 initial_delay=5):
+                 initial_delay=5, compact_cache=False,
+                 max_concurrent_fetches=1):
         random.seed()
-        self._nsx_cache = NsxCache()
+        self._nsx_cache = NsxCache(compact=compact_cache)
         # Store parameters as instance members
         # NOTE(salv-orlando): apologies if it looks java-ish
         self._plugin = plugin
@@ -239,6 +287,7 @@ class NsxSynchronizer(object):
         self._req_delay = req_delay
         self._sync_interval = state_sync_interval
         self._max_rand_delay = max_rand_delay
+        self._max_concurrent_fetches = max(max_concurrent_fetches, 1)
         # Validate parameters
         if self._sync_interval < self._req_delay:
             err_msg = (_("Minimum request delay:%(req_delay)s must not "
@@ -577,11 +626,7 @@ class NsxSynchronizer(object):
             return results, cursor if page_size else 'start', total_size
         return [], cursor, None
 
-    def _fetch_nsx_data_chunk(self, sp):
-        base_chunk_size = sp.chunk_size
-        chunk_size = base_chunk_size + sp.extra_chunk_size
-        LOG.info("Fetching up to %s resources "
-                 "from NSX backend", chunk_size)
+    def _fetch_nsx_data_sequentially(self, sp, chunk_size):
         fetched = ls_count = lr_count = lp_count = 0
         lswitches = lrouters = lswitchports = []
         if sp.ls_cursor or sp.ls_cursor == 'start':
@@ -595,11 +640,83 @@ class NsxSynchronizer(object):
         if fetched < chunk_size and sp.lp_cursor or sp.lp_cursor == 'start':
             (lswitchports, sp.lp_cursor, lp_count) = self._fetch_data(
                 self.LP_URI, sp.lp_cursor, max(chunk_size - fetched, 0))
-        fetched += len(lswitchports)
+        return ((lswitches, lrouters, lswitchports),
+                (ls_count or 0, lr_count or 0, lp_count or 0))
+
+    def _fetch_nsx_data_concurrently(self, sp, chunk_size):
+        # The page size for each resource type depends on how many resources
+        # of the previous types fit in the chunk. Use the number of resources
+        # still to fetch, as estimated from the counts returned by NSX, for
+        # splitting the chunk upfront like the sequential fetch would do, and
+        # then retrieve all the resource types in parallel. Inaccurate
+        # estimates only shift the boundary between chunks, as the cursors
+        # always point to the first resource not yet fetched.
+        if sp.current_chunk == 0:
+            estimates = sp.resource_totals
+        else:
+            estimates = sp.resource_pending
+        cursors = (sp.ls_cursor, sp.lr_cursor, sp.lp_cursor)
+        pool = eventlet.GreenPool(self._max_concurrent_fetches)
+        threads = []
+        budget = chunk_size
+        for uri, cursor, estimate in zip(
+                (self.LS_URI, self.LR_URI, self.LP_URI), cursors, estimates):
+            # On the first chunk the query must be performed anyway in
+            # order to retrieve the total number of resources
+            if cursor and (budget > 0 or sp.current_chunk == 0):
+                threads.append(pool.spawn(self._fetch_data,
+                                          uri, cursor, budget))
+                budget = max(budget - estimate, 0)
+            else:
+                threads.append(None)
+        results = []
+        for thread, cursor in zip(threads, cursors):
+            results.append(thread.wait() if thread is not None
+                           else ([], cursor, None))
+        (lswitches, sp.ls_cursor, ls_count) = results[0]
+        (lrouters, sp.lr_cursor, lr_count) = results[1]
+        (lswitchports, sp.lp_cursor, lp_count) = results[2]
+        return ((lswitches, lrouters, lswitchports),
+                (ls_count or 0, lr_count or 0, lp_count or 0))
+
+    @staticmethod
+    def _get_pending_estimate(pending, fetched, cursor):
+        if not cursor:
+            # All the resources of this type were fetched
+            return 0
+        if cursor == 'start':
+            # Only the number of resources was queried
+            return pending
+        # Resources are left even if the estimate was exceeded, for
+        # instance because they were created during the cycle
+        return max(pending - fetched, 1)
+
+    def _fetch_nsx_data_chunk(self, sp):
+        base_chunk_size = sp.chunk_size
+        chunk_size = base_chunk_size + sp.extra_chunk_size
+        LOG.info("Fetching up to %s resources "
+                 "from NSX backend", chunk_size)
+        # Resources can be fetched in parallel only once the number of
+        # resources of each type is known from a previous cycle
+        if self._max_concurrent_fetches > 1 and sp.resource_totals:
+            resources, counts = self._fetch_nsx_data_concurrently(
+                sp, chunk_size)
+        else:
+            resources, counts = self._fetch_nsx_data_sequentially(
+                sp, chunk_size)
+        (lswitches, lrouters, lswitchports) = resources
         if sp.current_chunk == 0:
             # No cursors were provided. Then it must be possible to
             # calculate the total amount of data to fetch
-            sp.total_size = ls_count + lr_count + lp_count
+            sp.total_size = sum(counts)
+            sp.resource_totals = counts
+            sp.resource_pending = counts
+        # Refresh the estimates with the actual size of the results
+        sp.resource_pending = tuple(
+            self._get_pending_estimate(pending, len(fetched), cursor)
+            for pending, fetched, cursor in zip(
+                sp.resource_pending, resources,
+                (sp.ls_cursor, sp.lr_cursor, sp.lp_cursor)))
         LOG.debug("Total data size: %d", sp.total_size)
         sp.chunk_size = self._get_chunk_size(sp)
         # Calculate chunk size adjustment
@@ -50,6 +50,14 @@ def get_network_bindings(session, network_id):
             all())
 
 
+def get_network_bindings_by_ids(session, network_ids):
+    session = session or db_api.get_reader_session()
+    query = session.query(nsx_models.TzNetworkBinding)
+    return _apply_filters_to_query(
+        query, nsx_models.TzNetworkBinding,
+        {'network_id': network_ids}).all()
+
+
 def get_network_bindings_by_phy_uuid(session, phy_uuid):
     session = session or db_api.get_reader_session()
     return (session.query(nsx_models.TzNetworkBinding).
@@ -232,6 +240,19 @@ def get_nsx_switch_ids(session, neutron_id):
                 neutron_id=neutron_id)]
 
 
+def get_nsx_switch_ids_by_net_ids(session, neutron_ids):
+    """Return a dictionary of neutron network id to its NSX switch ids"""
+    query = session.query(nsx_models.NeutronNsxNetworkMapping)
+    mappings = _apply_filters_to_query(
+        query, nsx_models.NeutronNsxNetworkMapping,
+        {'neutron_id': neutron_ids}).all()
+    switch_ids = {}
+    for mapping in mappings:
+        switch_ids.setdefault(mapping['neutron_id'], []).append(
+            mapping['nsx_id'])
+    return switch_ids
+
+
 def get_nsx_network_mappings(session, neutron_id):
     # This function returns a list of NSX switch identifiers because of
     # the possibility of chained logical switches
@@ -277,6 +298,17 @@ def get_nsx_switch_and_port_id(session, neutron_id):
         return None, None
 
 
+def get_nsx_switch_and_port_ids(session, neutron_ids):
+    """Return a dictionary of neutron port id to its NSX switch & port ids"""
+    query = session.query(nsx_models.NeutronNsxPortMapping)
+    mappings = _apply_filters_to_query(
+        query, nsx_models.NeutronNsxPortMapping,
+        {'neutron_id': neutron_ids}).all()
+    return dict((mapping['neutron_id'],
+                 (mapping['nsx_switch_id'], mapping['nsx_port_id']))
+                for mapping in mappings)
+
+
 def get_nsx_router_id(session, neutron_id):
     try:
         mapping = (session.query(nsx_models.NeutronNsxRouterMapping).
@@ -371,6 +403,14 @@ def is_multiprovider_network(session, network_id):
                 network_id=network_id).first())
 
 
+def get_multiprovider_network_ids(session, network_ids):
+    """Return the set of the multiprovider networks among network_ids"""
+    query = session.query(nsx_models.MultiProviderNetworks.network_id)
+    return set(row.network_id for row in _apply_filters_to_query(
+        query, nsx_models.MultiProviderNetworks,
+        {'network_id': network_ids}).all())
+
+
 # NSXv3 L2 Gateway DB methods.
 def add_l2gw_connection_mapping(session, connection_id, bridge_endpoint_id,
                                 port_id):
@@ -768,6 +808,13 @@ def get_nsx_vpn_connection_mapping(session, neutron_id):
         return
 
 
+def get_nsx_vpn_connection_mappings(session, neutron_ids):
+    query = session.query(nsx_models.NsxVpnConnectionMapping)
+    return _apply_filters_to_query(
+        query, nsx_models.NsxVpnConnectionMapping,
+        {'neutron_id': neutron_ids}).all()
+
+
 def delete_nsx_vpn_connection_mapping(session, neutron_id):
     return (session.query(nsx_models.NsxVpnConnectionMapping).
             filter_by(neutron_id=neutron_id).delete())
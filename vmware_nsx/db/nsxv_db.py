@@ -100,6 +100,22 @@ def get_nsxv_router_bindings_by_edge(session, edge_id):
         edge_id=edge_id).all()
 
 
+@warn_on_binding_status_error
+def get_nsxv_router_bindings_by_ids(session, router_ids):
+    query = session.query(nsxv_models.NsxvRouterBinding)
+    return nsx_db._apply_filters_to_query(
+        query, nsxv_models.NsxvRouterBinding,
+        {'router_id': router_ids}).all()
+
+
+@warn_on_binding_status_error
+def get_nsxv_router_bindings_by_edges(session, edge_ids):
+    query = session.query(nsxv_models.NsxvRouterBinding)
+    return nsx_db._apply_filters_to_query(
+        query, nsxv_models.NsxvRouterBinding,
+        {'edge_id': edge_ids}).all()
+
+
 @warn_on_binding_status_error
 def get_nsxv_router_bindings(session, filters=None,
                              like_filters=None):
@@ -167,6 +183,13 @@ def get_edge_vnic_bindings_by_int_lswitch(session, lswitch_id):
         network_id=lswitch_id).all()
 
 
+def get_edge_vnic_bindings_by_int_lswitches(session, lswitch_ids):
+    query = session.query(nsxv_models.NsxvEdgeVnicBinding)
+    return nsx_db._apply_filters_to_query(
+        query, nsxv_models.NsxvEdgeVnicBinding,
+        {'network_id': lswitch_ids}).all()
+
+
 def create_edge_vnic_binding(session, edge_id, vnic_index,
                              network_id, tunnel_index=-1):
     with session.begin(subtransactions=True):
@@ -362,6 +385,21 @@ def clean_edge_dhcp_static_bindings_by_edge(session, edge_id):
             edge_id=edge_id).delete()
 
 
+def replace_edge_dhcp_static_bindings(session, edge_id, bindings):
+    """Replace the DHCP static bindings of an edge
+
+    bindings maps the MAC addresses to the binding ids.
+    """
+    with session.begin(subtransactions=True):
+        clean_edge_dhcp_static_bindings_by_edge(session, edge_id)
+        session.bulk_insert_mappings(
+            nsxv_models.NsxvEdgeDhcpStaticBinding,
+            [{'edge_id': edge_id,
+              'mac_address': mac_address,
+              'binding_id': binding_id}
+             for mac_address, binding_id in bindings.items()])
+
+
 def create_nsxv_internal_network(session, network_purpose,
                                  availability_zone, network_id):
     with session.begin(subtransactions=True):
@@ -540,6 +578,14 @@ def get_network_bindings(session, network_id):
             all())
 
 
+def get_network_bindings_by_network_ids(session, network_ids):
+    session = session or db_api.get_reader_session()
+    query = session.query(nsxv_models.NsxvTzNetworkBinding)
+    return nsx_db._apply_filters_to_query(
+        query, nsxv_models.NsxvTzNetworkBinding,
+        {'network_id': network_ids}).all()
+
+
 def get_network_bindings_by_vlanid_and_physical_net(session, vlan_id,
                                                     phy_uuid):
     session = session or db_api.get_reader_session()
@@ -887,6 +933,13 @@ def get_nsxv_subnet_ext_attributes(session, subnet_id):
         return
 
 
+def get_nsxv_subnets_ext_attributes(session, subnet_ids):
+    query = session.query(nsxv_models.NsxvSubnetExtAttributes)
+    return nsx_db._apply_filters_to_query(
+        query, nsxv_models.NsxvSubnetExtAttributes,
+        {'subnet_id': subnet_ids}).all()
+
+
 def update_nsxv_subnet_ext_attributes(session, subnet_id,
                                       dns_search_domain=None,
                                       dhcp_mtu=None):
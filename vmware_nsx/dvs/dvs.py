@@ -15,8 +15,10 @@
 from neutron_lib import exceptions
 from oslo_log import log as logging
 from oslo_utils import excutils
+from oslo_vmware import exceptions as vmware_exc
 from oslo_vmware import vim_util
 
+from vmware_nsx.common import cache
 from vmware_nsx.common import exceptions as nsx_exc
 from vmware_nsx.dvs import dvs_utils
 
@@ -95,6 +97,11 @@ class DvsManager(VCManagerBase):
     The dvs-id is not a class member, since multiple dvs-es can be supported.
     """
 
+    def __init__(self):
+        super(DvsManager, self).__init__()
+        # Port group morefs of each dvs, by port group name and moref id
+        self._port_group_index = {}
+
     def _get_dvs_moref_by_id(self, dvs_id):
         return vim_util.get_moref(dvs_id, 'VmwareDistributedVirtualSwitch')
 
@@ -148,7 +155,8 @@ class DvsManager(VCManagerBase):
                                         dvs_moref,
                                         spec=pg_spec)
         try:
-            # NOTE(garyk): cache the returned moref
+            # NOTE: the task does not return the moref of the new port group.
+            # It will be added to the index on its first lookup.
             self._session.wait_for_task(task)
         except Exception:
             # NOTE(garyk): handle more specific exceptions
@@ -161,29 +169,74 @@ class DvsManager(VCManagerBase):
                   'vlan_tag': vlan_tag,
                   'dvs': dvs_moref.value})
 
-    def _net_id_to_moref(self, dvs_moref, net_id):
-        """Gets the moref for the specific neutron network."""
-        # NOTE(garyk): return this from a cache if not found then invoke
-        # code below.
+    def _get_port_group_morefs(self, dvs_moref):
         port_groups = self._session.invoke_api(vim_util,
                                                'get_object_properties',
                                                self._session.vim,
                                                dvs_moref,
                                                ['portgroup'])
+        morefs = []
         if len(port_groups) and hasattr(port_groups[0], 'propSet'):
             for prop in port_groups[0].propSet:
-                for val in prop.val[0]:
-                    props = self._session.invoke_api(vim_util,
-                                                     'get_object_properties',
-                                                     self._session.vim,
-                                                     val, ['name'])
-                    if len(props) and hasattr(props[0], 'propSet'):
-                        for prop in props[0].propSet:
-                            # match name or mor id
-                            if net_id == prop.val or net_id == val.value:
-                                # NOTE(garyk): update cache
-                                return val
-        raise exceptions.NetworkNotFound(net_id=net_id)
+                morefs.extend(prop.val[0])
+        return morefs
+
+    def _refresh_port_group_index(self, dvs_moref, full=False):
+        """Update the port groups index of a dvs.
+
+        The names of all the port groups are retrieved with a single
+        property collector query. Unless full is set, only the names of the
+        port groups missing from the index are retrieved, and the port
+        groups which do not exist anymore are removed from it.
+        """
+        morefs = self._get_port_group_morefs(dvs_moref)
+        index = {} if full else dict(
+            self._port_group_index.get(dvs_moref.value, {}))
+        existing = set(moref.value for moref in morefs)
+        for key, moref in list(index.items()):
+            if moref.value not in existing:
+                del index[key]
+        new_morefs = [moref for moref in morefs if moref.value not in index]
+        if new_morefs:
+            results = self._session.invoke_api(
+                vim_util, 'get_properties_for_a_collection_of_objects',
+                self._session.vim, 'DistributedVirtualPortgroup',
+                new_morefs, ['name'])
+            while results:
+                for pg in results.objects:
+                    index[pg.obj.value] = pg.obj
+                    for prop in getattr(pg, 'propSet', []):
+                        # Keep the first port group if names are duplicated
+                        index.setdefault(prop.val, pg.obj)
+                results = self._session.invoke_api(vim_util,
+                                                   'continue_retrieval',
+                                                   self._session.vim,
+                                                   results)
+        self._port_group_index[dvs_moref.value] = index
+        return index
+
+    def _net_id_to_moref(self, dvs_moref, net_id):
+        """Gets the moref for the specific neutron network."""
+        # match name or mor id
+        moref = self._port_group_index.get(dvs_moref.value, {}).get(net_id)
+        if moref is not None:
+            return moref
+        # The port group may have been created or renamed since the index
+        # was updated
+        moref = self._refresh_port_group_index(dvs_moref).get(net_id)
+        if moref is None:
+            moref = self._refresh_port_group_index(
+                dvs_moref, full=True).get(net_id)
+        if moref is None:
+            raise exceptions.NetworkNotFound(net_id=net_id)
+        return moref
+
+    def _remove_port_group_from_index(self, pg_moref):
+        """Remove the name and moref id keys of a port group."""
+        for index in self._port_group_index.values():
+            for key, moref in list(index.items()):
+                if moref.value == pg_moref.value:
+                    del index[key]
 
     def _is_vlan_network_by_moref(self, moref):
         """
@@ -298,7 +351,8 @@ class DvsManager(VCManagerBase):
             raise nsx_exc.DvsNotFound(dvs=pg_moref)
 
         # Convert the extracted config to DVPortgroupConfigSpec
-        new_spec = self._copy_port_group_spec(pg_spec[0].propSet[0].val)
+        orig_spec = pg_spec[0].propSet[0].val
+        new_spec = self._copy_port_group_spec(orig_spec)
 
         # Update the configuration using the callback & data
         spec_update_calback(new_spec, spec_update_data)
@@ -312,6 +366,10 @@ class DvsManager(VCManagerBase):
         except Exception:
             LOG.error('Failed to reconfigure DVPortGroup %s', pg_moref)
             raise nsx_exc.DvsNotFound(dvs=pg_moref)
+        if new_spec.name != orig_spec['name']:
+            # The port group was renamed. It will be indexed again under its
+            # new name on its next lookup.
+            self._remove_port_group_from_index(pg_moref)
 
     # Update the dvs port groups config for a vxlan/vlan network
     # update the spec using a callback and user data
@@ -390,6 +448,7 @@ class DvsManager(VCManagerBase):
             with excutils.save_and_reraise_exception():
                 LOG.exception('Failed to delete port group for %s.',
                               net_id)
+        self._remove_port_group_from_index(moref)
         LOG.info("%(net_id)s delete from %(dvs)s.",
                  {'net_id': net_id,
                   'dvs': dvs_moref.value})
@@ -484,6 +543,13 @@ class DvsManager(VCManagerBase):
 class VMManager(VCManagerBase):
     """Management class for VMs related VC tasks."""
 
+    def __init__(self):
+        super(VMManager, self).__init__()
+        # The VM of an instance does not change during its life
+        self._vm_moref_cache = cache.ExpiringLRUCache(
+            dvs_utils.CONF.dvs.vm_moref_cache_size,
+            dvs_utils.CONF.dvs.vm_moref_cache_ttl)
+
     def get_vm_moref_obj(self, instance_uuid):
         """Get reference to the VM.
         The method will make use of FindAllByUuid to get the VM reference.
@@ -491,6 +557,9 @@ class VMManager(VCManagerBase):
         instance_uuid, more specifically all VM's on the backend that have
         'config_spec.instanceUuid' set to 'instance_uuid'.
         """
+        vm_ref = self._vm_moref_cache.get(instance_uuid)
+        if vm_ref is not None:
+            return vm_ref
         vm_refs = self._session.invoke_api(
             self._session.vim,
             API_FIND_ALL_BY_UUID,
@@ -499,8 +568,52 @@ class VMManager(VCManagerBase):
             vmSearch=True,
             instanceUuid=True)
         if vm_refs:
+            self._vm_moref_cache.set(instance_uuid, vm_refs[0])
             return vm_refs[0]
 
+    def get_vm_moref_objs(self, instance_uuids):
+        """Get the references to the VMs of many instances.
+
+        The VMs which are not cached are found with a single pass of the
+        property collector over all the VMs, rather than a FindAllByUuid
+        call per instance.
+        Return a dictionary of the references by instance UUID. Instances
+        with no VM are not included.
+        """
+        vm_refs = {}
+        missing = set()
+        for instance_uuid in instance_uuids:
+            vm_ref = self._vm_moref_cache.get(instance_uuid)
+            if vm_ref is not None:
+                vm_refs[instance_uuid] = vm_ref
+            else:
+                missing.add(instance_uuid)
+        if len(missing) == 1:
+            instance_uuid = missing.pop()
+            vm_ref = self.get_vm_moref_obj(instance_uuid)
+            if vm_ref is not None:
+                vm_refs[instance_uuid] = vm_ref
+        if not missing:
+            return vm_refs
+        results = self._session.invoke_api(
+            vim_util, 'get_objects', self._session.vim, 'VirtualMachine',
+            100, ['config.instanceUuid'])
+        while results:
+            for vm in results.objects:
+                for prop in getattr(vm, 'propSet', []):
+                    if prop.val in missing:
+                        missing.discard(prop.val)
+                        vm_refs[prop.val] = vm.obj
+                        self._vm_moref_cache.set(prop.val, vm.obj)
+            if not missing:
+                vim_util.cancel_retrieval(self._session.vim, results)
+                break
+            results = vim_util.continue_retrieval(self._session.vim, results)
+        return vm_refs
+
+    def invalidate_vm_moref(self, instance_uuid):
+        self._vm_moref_cache.invalidate(instance_uuid)
+
     def get_vm_moref(self, instance_uuid):
         """Get reference to the VM.
         """
@@ -626,7 +739,13 @@ class VMManager(VCManagerBase):
 
     def _get_device_port(self, device_id, mac_address):
         vm_moref = self.get_vm_moref_obj(device_id)
-        hardware_devices = self.get_vm_interfaces_info(vm_moref)
+        try:
+            hardware_devices = self.get_vm_interfaces_info(vm_moref)
+        except vmware_exc.ManagedObjectNotFoundException:
+            # The cached VM reference is obsolete
+            self.invalidate_vm_moref(device_id)
+            vm_moref = self.get_vm_moref_obj(device_id)
+            hardware_devices = self.get_vm_interfaces_info(vm_moref)
         if not hardware_devices:
             return
         if hardware_devices.__class__.__name__ == "ArrayOfVirtualDevice":
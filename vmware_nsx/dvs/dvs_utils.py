@@ -47,6 +47,14 @@ dvs_opts = [
                     'socket error, etc.'),
     cfg.StrOpt('dvs_name',
                help='The name of the preconfigured DVS.'),
+    cfg.IntOpt('vm_moref_cache_size',
+               default=10000,
+               help=_("Maximum number of VM references cached by instance "
+                      "UUID. 0 disables the cache.")),
+    cfg.IntOpt('vm_moref_cache_ttl',
+               default=3600,
+               help=_("Time in seconds after which a cached VM reference is "
+                      "looked up again in vCenter. 0 disables the cache.")),
     cfg.StrOpt('metadata_mode',
                help=_("This value should not be set. It is just required for "
                       "ensuring that the DVS plugin works with the generic "
@@ -28,11 +28,16 @@ from oslo_log import log as logging
 
 from neutron.services.externaldns import driver
 
+from vmware_nsx.common import cache
 from vmware_nsx.common import driver_api
 from vmware_nsx.plugins.nsx_v3 import availability_zones as nsx_az
 
 LOG = logging.getLogger(__name__)
 DNS_DOMAIN_DEFAULT = 'openstacklocal.'
+# The dns domains of the networks are cached, and invalidated on network
+# update. The ttl bounds the staleness of networks updated by other servers.
+DNS_DOMAIN_CACHE_SIZE = 10000
+DNS_DOMAIN_CACHE_TTL = 300
 
 
 def _dotted_domain(dns_domain):
@@ -321,22 +326,47 @@ class DNSExtensionDriverNSXv3(DNSExtensionDriver):
 
     def initialize(self):
         self._availability_zones = nsx_az.NsxV3AvailabilityZones()
+        self._dns_domain_cache = cache.ExpiringLRUCache(
+            DNS_DOMAIN_CACHE_SIZE, DNS_DOMAIN_CACHE_TTL)
+        self._cached_config_domains = self._get_config_domains()
         LOG.info("DNSExtensionDriverNSXv3 initialization complete")
 
     def _get_network_and_az(self, network_id, context):
         if not context:
             context = n_context.get_admin_context()
         network = self._get_network(context, network_id)
+        return network, self._get_network_az(network)
+
+    def _get_network_az(self, network):
         if az_def.AZ_HINTS in network and network[az_def.AZ_HINTS]:
             az_name = network[az_def.AZ_HINTS][0]
-            az = self._availability_zones.get_availability_zone(az_name)
-            return network, az
-        az = self._availability_zones.get_default_availability_zone()
-        return network, az
+            return self._availability_zones.get_availability_zone(az_name)
+        return self._availability_zones.get_default_availability_zone()
+
+    @staticmethod
+    def _get_config_domains():
+        return cfg.CONF.dns_domain, cfg.CONF.nsx_v3.dns_domain
+
+    def _get_dns_domain_cache(self):
+        # The cached domains may come from the configuration, so they are
+        # dropped when it is reloaded with different domains
+        config_domains = self._get_config_domains()
+        if config_domains != self._cached_config_domains:
+            self._dns_domain_cache.clear()
+            self._cached_config_domains = config_domains
+        return self._dns_domain_cache
 
     def _get_dns_domain(self, network_id, context=None):
+        dns_domain_cache = self._get_dns_domain_cache()
+        dns_domain = dns_domain_cache.get(network_id)
+        if dns_domain is None:
+            net, az = self._get_network_and_az(network_id, context)
+            dns_domain = self._get_network_dns_domain(net, az)
+            dns_domain_cache.set(network_id, dns_domain)
+        return dns_domain
+
+    def _get_network_dns_domain(self, net, az):
         # first try to get the dns_domain configured on the network
-        net, az = self._get_network_and_az(network_id, context)
         if net.get('dns_domain'):
             return _dotted_domain(net['dns_domain'])
         # try to get the dns-domain from the specific availability zone
@@ -357,6 +387,29 @@ class DNSExtensionDriverNSXv3(DNSExtensionDriver):
             return ''
         return _dotted_domain(dns_domain)
 
+    def prepare_ports_dicts(self, context, ports):
+        # Resolve the dns domains of all the ports networks at once
+        dns_domain_cache = self._get_dns_domain_cache()
+        network_ids = set(port['network_id'] for port in ports
+                          if port.get('network_id'))
+        missing_ids = [net_id for net_id in network_ids
+                       if dns_domain_cache.get(net_id) is None]
+        if not missing_ids:
+            return
+        networks = directory.get_plugin().get_networks(
+            context.elevated(), filters={'id': missing_ids},
+            fields=['id', dns.DNSDOMAIN, az_def.AZ_HINTS])
+        for net in networks:
+            dns_domain_cache.set(
+                net['id'],
+                self._get_network_dns_domain(net, self._get_network_az(net)))
+
+    def process_update_network(self, plugin_context, request_data, db_data):
+        super(DNSExtensionDriverNSXv3, self).process_update_network(
+            plugin_context, request_data, db_data)
+        if dns.DNSDOMAIN in request_data:
+            self._dns_domain_cache.invalidate(db_data['id'])
+
     def external_dns_not_needed(self, context, network):
         dns_driver = _get_dns_driver()
         if not dns_driver:
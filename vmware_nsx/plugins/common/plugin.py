@@ -34,6 +34,7 @@ from neutron_lib.callbacks import resources
 from neutron_lib import constants
 from neutron_lib import context as n_context
 from neutron_lib.db import api as db_api
+from neutron_lib.db import model_query
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
 from neutron_lib.utils import net as nl_net_utils
@@ -92,6 +93,17 @@ class NsxPluginBase(db_base_plugin_v2.NeutronDbPluginV2,
 
         return self.get_network_az(network)
 
+    def _get_ports_models(self, context, port_ids):
+        """Return a dictionary of the DB models of the given ports
+
+        Ports that were already deleted will not be in the result.
+        """
+        if not port_ids:
+            return {}
+        query = model_query.get_collection_query(
+            context, models_v2.Port, filters={'id': list(port_ids)})
+        return dict((port_model.id, port_model) for port_model in query)
+
     def _get_router_interface_ports_by_network(
         self, context, router_id, network_id):
         port_filters = {'device_id': [router_id],
@@ -750,6 +750,60 @@ class NsxPluginV3Base(plugin.NsxPluginBase,
                 port_data[pbin.VIF_DETAILS]['segmentation-id'] = (
                     self._get_network_segmentation_id(context, net_id))
 
+    def _get_networks_nsx_ids(self, context, net_ids):
+        """Return a dictionary of network id to its nsx id"""
+        return dict((net_id, self._get_network_nsx_id(context, net_id))
+                    for net_id in net_ids)
+
+    def _get_networks_segmentation_ids(self, context, net_ids):
+        """Return a dictionary of network id to its segmentation id"""
+        seg_ids = {}
+        if net_ids:
+            for binding in nsx_db.get_network_bindings_by_ids(
+                    context.session, list(net_ids)):
+                seg_ids.setdefault(binding.network_id, binding.vlan_id)
+        return seg_ids
+
+    def _extend_nsx_ports_dict_binding(self, context, ports):
+        """Bulk version of _extend_nsx_port_dict_binding
+
+        The nsx ids and segmentation ids of the ports networks are fetched
+        once for all the ports.
+        """
+        nsx_net_ids = set()
+        seg_net_ids = set()
+        for port_data in ports:
+            if pbin.VIF_TYPE not in port_data:
+                port_data[pbin.VIF_TYPE] = pbin.VIF_TYPE_OVS
+            if pbin.VNIC_TYPE not in port_data:
+                port_data[pbin.VNIC_TYPE] = pbin.VNIC_NORMAL
+            if 'network_id' in port_data:
+                if (port_data.get('device_owner') !=
+                    constants.DEVICE_OWNER_FLOATINGIP):
+                    nsx_net_ids.add(port_data['network_id'])
+                if port_data[pbin.VNIC_TYPE] != pbin.VNIC_NORMAL:
+                    seg_net_ids.add(port_data['network_id'])
+
+        nsx_ids = self._get_networks_nsx_ids(context, nsx_net_ids)
+        seg_ids = self._get_networks_segmentation_ids(context, seg_net_ids)
+        for port_data in ports:
+            if 'network_id' not in port_data:
+                continue
+            net_id = port_data['network_id']
+            if pbin.VIF_DETAILS not in port_data:
+                port_data[pbin.VIF_DETAILS] = {}
+            port_data[pbin.VIF_DETAILS][pbin.OVS_HYBRID_PLUG] = False
+            if (port_data.get('device_owner') ==
+                constants.DEVICE_OWNER_FLOATINGIP):
+                # floatingip belongs to an external net without nsx-id
+                port_data[pbin.VIF_DETAILS]['nsx-logical-switch-id'] = None
+            else:
+                port_data[pbin.VIF_DETAILS]['nsx-logical-switch-id'] = (
+                    nsx_ids.get(net_id))
+            if port_data[pbin.VNIC_TYPE] != pbin.VNIC_NORMAL:
+                port_data[pbin.VIF_DETAILS]['segmentation-id'] = (
+                    seg_ids.get(net_id))
+
     def fix_direct_vnic_port_sec(self, direct_vnic_type, port_data):
         if direct_vnic_type:
             if validators.is_attr_set(port_data.get(psec.PORTSECURITY)):
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from neutron_lib.api.definitions import network as net_def
 from neutron_lib.api.definitions import port as port_def
 from neutron_lib.api.definitions import subnet as subnet_def
@@ -50,6 +52,7 @@ from neutron_lib.api import validators
 from neutron_lib import exceptions as n_exc
 
 from vmware_nsx.common import availability_zones as nsx_com_az
+from vmware_nsx.common import cache
 from vmware_nsx.common import config
 from vmware_nsx.common import exceptions as nsx_exc
 from vmware_nsx.common import locking
@@ -110,6 +113,13 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
         self.init_is_complete = False
         # Validate configuration
         config.validate_nsx_config_options()
+        # Local caches of the project plugin & network project mappings
+        self._project_plugin_cache = cache.ExpiringLRUCache(
+            cfg.CONF.nsx_tvd.plugin_mapping_cache_size,
+            cfg.CONF.nsx_tvd.plugin_mapping_cache_ttl)
+        self._net_project_cache = cache.ExpiringLRUCache(
+            cfg.CONF.nsx_tvd.plugin_mapping_cache_size,
+            cfg.CONF.nsx_tvd.plugin_mapping_cache_ttl)
         super(NsxTVDPlugin, self).__init__()
 
         # init the different supported plugins
@@ -346,10 +356,45 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
                                              availability_zones)
 
     def _get_plugin_from_net_id(self, context, net_id):
-        # get the network using the super plugin - here we use the
-        # _get_network (so as not to call the make dict method)
-        network = self._get_network(context, net_id)
-        return self._get_plugin_from_project(context, network['tenant_id'])
+        # The network project never changes, so it can be cached
+        project_id = self._net_project_cache.get(net_id)
+        if project_id is None:
+            # get the network using the super plugin - here we use the
+            # _get_network (so as not to call the make dict method)
+            network = self._get_network(context, net_id)
+            project_id = network['tenant_id']
+            self._net_project_cache.set(net_id, project_id)
+        return self._get_plugin_from_project(context, project_id)
+
+    def _get_plugins_from_net_ids(self, context, net_ids):
+        """Return a dictionary of network id to the plugin handling it
+
+        The networks projects which are not cached are read with a single
+        query, and the plugin is calculated once per project.
+        """
+        net_projects = {}
+        for net_id in net_ids:
+            project_id = self._net_project_cache.get(net_id)
+            if project_id is not None:
+                net_projects[net_id] = project_id
+        missing_ids = [net_id for net_id in net_ids
+                       if net_id not in net_projects]
+        if missing_ids:
+            networks = context.session.query(
+                models_v2.Network.id, models_v2.Network.project_id).filter(
+                models_v2.Network.id.in_(missing_ids)).all()
+            for net_id, project_id in networks:
+                net_projects[net_id] = project_id
+                self._net_project_cache.set(net_id, project_id)
+
+        project_plugins = {}
+        net_plugins = {}
+        for net_id, project_id in net_projects.items():
+            if project_id not in project_plugins:
+                project_plugins[project_id] = self._get_plugin_from_project(
+                    context, project_id)
+            net_plugins[net_id] = project_plugins[project_id]
+        return net_plugins
 
     def get_network_availability_zones(self, net_db):
         ctx = n_context.get_admin_context()
@@ -390,6 +435,7 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
     def delete_network(self, context, id):
         p = self._get_plugin_from_net_id(context, id)
         p.delete_network(context, id)
+        self._net_project_cache.invalidate(id)
 
     def get_network(self, context, id, fields=None):
         p = self._get_plugin_from_net_id(context, id)
@@ -430,12 +476,20 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
                 super(NsxTVDPlugin, self).get_networks(
                     context, filters, fields, sorts,
                     limit, marker, page_reverse))
+            # Extend the networks of each plugin together
+            plugin_networks = collections.OrderedDict()
             for net in networks[:]:
                 p = self._get_plugin_from_project(context, net['tenant_id'])
                 if p == req_p or req_p is None:
-                    p._extend_get_network_dict_provider(context, net)
+                    plugin_networks.setdefault(p, []).append(net)
                 else:
                     networks.remove(net)
+            for p, nets in plugin_networks.items():
+                if hasattr(p, '_extend_get_networks_dict_provider'):
+                    p._extend_get_networks_dict_provider(context, nets)
+                else:
+                    for net in nets:
+                        p._extend_get_network_dict_provider(context, net)
         return (networks if not fields else
                 [db_utils.resource_fields(network,
                                           fields) for network in networks])
@@ -489,27 +543,51 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
                 super(NsxTVDPlugin, self).get_ports(
                     context, filters, fields, sorts,
                     limit, marker, page_reverse))
-            # Add port extensions
+            # Add port extensions, fetching the ports models and the
+            # plugins of their networks for all the ports together
+            port_models = self._get_ports_models(
+                context, [port['id'] for port in ports if 'id' in port])
+            net_plugins = self._get_plugins_from_net_ids(
+                context, set(port['network_id'] for port in ports))
+            plugin_ports = collections.OrderedDict()
             for port in ports[:]:
                 port_model = None
                 if 'id' in port:
-                    port_model = self._get_port(context, port['id'])
+                    port_model = port_models.get(port['id'])
+                    if port_model is None:
+                        # Port might have been deleted by now
+                        LOG.debug("Port %s was deleted during the get_ports "
+                                  "process, and is being skipped", port['id'])
+                        ports.remove(port)
+                        continue
                     resource_extend.apply_funcs('ports', port, port_model)
-                p = self._get_plugin_from_net_id(context, port['network_id'])
+                p = net_plugins.get(port['network_id'])
+                if p is None:
+                    p = self._get_plugin_from_net_id(
+                        context, port['network_id'])
                 if p == req_p or req_p is None:
-                    if hasattr(p, '_extend_get_port_dict_qos_and_binding'):
-                        p._extend_get_port_dict_qos_and_binding(context, port)
-                    else:
-                        if not port_model:
-                            port_model = port
-                        p._extend_port_dict_binding(port, port_model)
+                    plugin_ports.setdefault(p, []).append((port, port_model))
+                else:
+                    ports.remove(port)
+            for p, p_ports in plugin_ports.items():
+                if hasattr(p, '_extend_get_ports_dict_qos_and_binding'):
+                    p._extend_get_ports_dict_qos_and_binding(
+                        context, [port for port, port_model in p_ports])
+                else:
+                    for port, port_model in p_ports:
+                        if hasattr(p,
+                                   '_extend_get_port_dict_qos_and_binding'):
+                            p._extend_get_port_dict_qos_and_binding(
+                                context, port)
+                        else:
+                            p._extend_port_dict_binding(
+                                port, port_model or port)
+                for port, port_model in p_ports:
                     if hasattr(p,
                                '_remove_provider_security_groups_from_list'):
                         p._remove_provider_security_groups_from_list(port)
                     self._cleanup_obj_fields(
                         port, p.plugin_type(), 'port')
-                else:
-                    ports.remove(port)
         return (ports if not fields else
                 [db_utils.resource_fields(port, fields) for port in ports])
 
@@ -885,6 +963,7 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
         nsx_db.add_project_plugin_mapping(context.session,
                                           data['project'],
                                           data['plugin'])
+        self._project_plugin_cache.invalidate(data['project'])
         return self._get_project_plugin_dict(data)
 
     def get_project_plugin_map(self, context, id, fields=None):
@@ -913,6 +992,10 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
             # add to db (used by admin context to get actions)
             return plugin_type
 
+        cached_type = self._project_plugin_cache.get(project_id)
+        if cached_type is not None:
+            return cached_type
+
         mapping = nsx_db.get_project_plugin_mapping(
             context.session, project_id)
         if mapping:
@@ -926,17 +1009,27 @@ class NsxTVDPlugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
                                             'project': project_id}},
                     internal=True)
             except projectpluginmap.ProjectPluginAlreadyExists:
-                # Maybe added by another thread
-                pass
+                # Maybe added by another thread, possibly with another
+                # plugin, so use the stored mapping
+                mapping = nsx_db.get_project_plugin_mapping(
+                    context.session, project_id)
+                if mapping:
+                    plugin_type = mapping['plugin']
         if not self.plugins.get(plugin_type):
             msg = (_("Cannot use unsupported plugin %(plugin)s for project "
                      "%(project)s") % {'plugin': plugin_type,
                                        'project': project_id})
             raise nsx_exc.NsxPluginException(err_msg=msg)
 
+        self._project_plugin_cache.set(project_id, plugin_type)
         LOG.debug("Using %s plugin for project %s", plugin_type, project_id)
         return plugin_type
 
+    def get_plugin_mapping_cache_stats(self):
+        """Return the hits & misses of the plugin mapping caches"""
+        return {'project_plugin': self._project_plugin_cache.stats(),
+                'network_project': self._net_project_cache.stats()}
+
     def _get_plugin_from_project(self, context, project_id):
         """Get the correct plugin for this project.
 
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import weakref
 
 from neutron_lib.api.definitions import allowedaddresspairs as addr_apidef
@@ -197,7 +198,8 @@ class NsxPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         self.cluster = nsx_utils.create_nsx_cluster(
             cfg.CONF,
             self.nsx_opts.concurrent_connections,
-            self.nsx_opts.nsx_gen_timeout)
+            self.nsx_opts.nsx_gen_timeout,
+            min_connections=self.nsx_opts.min_connections)
 
         self.base_binding_dict = {
             pbin.VIF_TYPE: pbin.VIF_TYPE_OVS,
@@ -217,7 +219,9 @@ class NsxPluginV2(addr_pair_db.AllowedAddressPairsMixin,
             self.nsx_sync_opts.state_sync_interval,
             self.nsx_sync_opts.min_sync_req_delay,
             self.nsx_sync_opts.min_chunk_size,
-            self.nsx_sync_opts.max_random_sync_delay)
+            self.nsx_sync_opts.max_random_sync_delay,
+            compact_cache=self.nsx_sync_opts.compact_cache,
+            max_concurrent_fetches=self.nsx_sync_opts.max_concurrent_fetches)
 
     def _ensure_default_network_gateway(self):
         if self._is_default_net_gw_in_sync:
@@ -851,10 +855,10 @@ class NsxPluginV2(addr_pair_db.AllowedAddressPairsMixin,
 
     def _extend_network_dict_provider(self, context, network,
                                       multiprovider=None, bindings=None):
-        if not bindings:
+        if bindings is None:
             bindings = nsx_db.get_network_bindings(context.session,
                                                    network['id'])
-        if not multiprovider:
+        if multiprovider is None:
             multiprovider = nsx_db.is_multiprovider_network(context.session,
                                                             network['id'])
         # With NSX plugin 'normal' overlay networks will have no binding
@@ -874,6 +878,26 @@ class NsxPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                      pnet.SEGMENTATION_ID: binding.vlan_id}
                     for binding in bindings]
 
+    def _extend_networks_dict_provider(self, context, networks):
+        """Add the provider fields of a list of networks
+
+        The bindings and the multiprovider flags of all the networks are
+        read with a single query each.
+        """
+        net_ids = [net['id'] for net in networks]
+        if not net_ids:
+            return
+        bindings = collections.defaultdict(list)
+        for binding in nsx_db.get_network_bindings_by_ids(context.session,
+                                                          net_ids):
+            bindings[binding.network_id].append(binding)
+        multiprovider_ids = nsx_db.get_multiprovider_network_ids(
+            context.session, net_ids)
+        for net in networks:
+            self._extend_network_dict_provider(
+                context, net, multiprovider=net['id'] in multiprovider_ids,
+                bindings=bindings[net['id']])
+
     def extend_port_dict_binding(self, port_res, port_db):
         super(NsxPluginV2, self).extend_port_dict_binding(port_res, port_db)
         port_res[pbin.VNIC_TYPE] = pbin.VNIC_NORMAL
@@ -1062,8 +1086,7 @@ class NsxPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                 super(NsxPluginV2, self).get_networks(
                     context, filters, fields, sorts,
                     limit, marker, page_reverse))
-            for net in networks:
-                self._extend_network_dict_provider(context, net)
+            self._extend_networks_dict_provider(context, networks)
         return (networks if not fields else
                 [db_utils.resource_fields(network,
                                           fields) for network in networks])
@@ -13,9 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 from distutils import version
+import hashlib
 import xml.etree.ElementTree as et
 
+import eventlet
 import netaddr
 
 from neutron_lib.agent import topics
@@ -98,6 +101,7 @@ from vmware_nsx._i18n import _
 from vmware_nsx.common import availability_zones as nsx_com_az
 from vmware_nsx.common import config  # noqa
 from vmware_nsx.common import exceptions as nsx_exc
+from vmware_nsx.common import file_cache
 from vmware_nsx.common import l3_rpc_agent_api
 from vmware_nsx.common import locking
 from vmware_nsx.common import managers as nsx_managers
@@ -159,6 +163,8 @@ LOG = logging.getLogger(__name__)
 PORTGROUP_PREFIX = 'dvportgroup'
 ROUTER_SIZE = routersize.ROUTER_SIZE
 VALID_EDGE_SIZES = routersize.VALID_EDGE_SIZES
+# Number of concurrent backend calls validating the configuration
+CONFIG_VALIDATION_POOL_SIZE = 8
 
 SUBNET_RULE_NAME = 'Subnet Rule'
 DNAT_RULE_NAME = 'DNAT Rule'
@@ -296,6 +302,9 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         self.edge_manager = edge_utils.EdgeManager(self.nsx_v, self)
         self.nsx_sg_utils = securitygroup_utils.NsxSecurityGroupUtils(
             self.nsx_v)
+        self.nsx_sg_update_queue = securitygroup_utils.NsxSectionUpdateQueue(
+            self.nsx_sg_utils,
+            coalesce_window=cfg.CONF.nsxv.sg_rule_update_coalesce_window)
         self.init_availability_zones()
         self._validate_config()
 
@@ -829,13 +838,14 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         return False
 
     def _extend_network_dict_provider(self, context, network,
-                                      multiprovider=None, bindings=None):
+                                      multiprovider=None, bindings=None,
+                                      availability_zones=None):
         if 'id' not in network:
             return
-        if not bindings:
+        if bindings is None:
             bindings = nsxv_db.get_network_bindings(context.session,
                                                     network['id'])
-        if not multiprovider:
+        if multiprovider is None:
             multiprovider = nsx_db.is_multiprovider_network(context.session,
                                                             network['id'])
         # With NSX plugin 'normal' overlay networks will have no binding
@@ -856,8 +866,10 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                     for binding in bindings]
 
         # update availability zones
-        network[az_def.COLLECTION_NAME] = (
-            self._get_network_availability_zones(context, network))
+        if availability_zones is None:
+            availability_zones = self._get_network_availability_zones(
+                context, network)
+        network[az_def.COLLECTION_NAME] = availability_zones
 
     def _get_subnet_as_providers(self, context, subnet, nw_dict=None):
         net_id = subnet.get('network_id')
@@ -1606,6 +1618,42 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         net[qos_consts.QOS_POLICY_ID] = qos_com_utils.get_network_policy_id(
             context, net['id'])
 
+    def _extend_get_networks_dict_provider(self, context, networks):
+        """Add the provider fields of a list of networks
+
+        The bindings, multiprovider flags, availability zones and QoS
+        policies of all the networks are read with a few queries, instead of
+        a few queries per network.
+        """
+        net_ids = [net['id'] for net in networks if 'id' in net]
+        if not net_ids:
+            return
+        bindings = collections.defaultdict(list)
+        for binding in nsxv_db.get_network_bindings_by_network_ids(
+                context.session, net_ids):
+            bindings[binding.network_id].append(binding)
+        multiprovider_ids = nsx_db.get_multiprovider_network_ids(
+            context.session, net_ids)
+        # The availability zone of a network is the one of its DHCP edge
+        dhcp_resource_ids = dict(
+            (net_id, (vcns_const.DHCP_EDGE_PREFIX + net_id)[:36])
+            for net_id in net_ids)
+        dhcp_edge_azs = dict(
+            (binding['router_id'], binding['availability_zone'])
+            for binding in nsxv_db.get_nsxv_router_bindings_by_ids(
+                context.session, list(dhcp_resource_ids.values())))
+        policy_ids = qos_com_utils.get_networks_policy_ids(context, net_ids)
+        for net in networks:
+            if 'id' not in net:
+                continue
+            resource_id = dhcp_resource_ids[net['id']]
+            azs = ([dhcp_edge_azs[resource_id]]
+                   if resource_id in dhcp_edge_azs else [])
+            self._extend_network_dict_provider(
+                context, net, multiprovider=net['id'] in multiprovider_ids,
+                bindings=bindings[net['id']], availability_zones=azs)
+            net[qos_consts.QOS_POLICY_ID] = policy_ids.get(net['id'])
+
     def get_network(self, context, id, fields=None):
         with db_api.CONTEXT_READER.using(context):
             # goto to the plugin DB and fetch the network
@@ -1626,8 +1674,7 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                 super(NsxVPluginV2, self).get_networks(
                     context, filters, fields, sorts,
                     limit, marker, page_reverse))
-            for net in networks:
-                self._extend_get_network_dict_provider(context, net)
+            self._extend_get_networks_dict_provider(context, networks)
         return (networks if not fields else
                 [db_utils.resource_fields(network,
                                           fields) for network in networks])
@@ -2727,13 +2774,14 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         if dhcp_ports and dhcp_ports[0].get('fixed_ips'):
             return dhcp_ports[0]['fixed_ips'][0]['ip_address']
 
-    def is_dhcp_metadata(self, context, subnet_id):
-        try:
-            subnet = self.get_subnet(context, subnet_id)
-        except n_exc.SubnetNotFound:
-            LOG.debug("subnet %s not found to determine its dhcp meta",
-                      subnet_id)
-            return False
+    def is_dhcp_metadata(self, context, subnet_id, subnet=None):
+        if subnet is None:
+            try:
+                subnet = self.get_subnet(context, subnet_id)
+            except n_exc.SubnetNotFound:
+                LOG.debug("subnet %s not found to determine its dhcp meta",
+                          subnet_id)
+                return False
         return bool(subnet['enable_dhcp'] and self.metadata_proxy_handler)
 
     def create_subnet_bulk(self, context, subnets):
@@ -4556,40 +4604,36 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                      ' a policy') % sg_id)
             raise n_exc.InvalidInput(error_message=msg)
 
-        with locking.LockManager.get_lock('rule-update-%s' % sg_id):
-            # Querying DB for associated dfw section id
-            section_uri = self._get_section_uri(context.session, sg_id)
-            logging = self._is_security_group_logged(context, sg_id)
-            provider = self._is_provider_security_group(context, sg_id)
-            log_all_rules = cfg.CONF.nsxv.log_security_groups_allowed_traffic
-
-            # Translating Neutron rules to Nsx DFW rules
-            for r in sg_rules:
-                rule = r['security_group_rule']
-                if not self._check_local_ip_prefix(context, rule):
-                    rule[secgroup_rule_local_ip_prefix.LOCAL_IP_PREFIX] = None
-                rule['id'] = rule.get('id') or uuidutils.generate_uuid()
-                ruleids.add(rule['id'])
-                nsx_rules.append(
-                    self._create_nsx_rule(context, rule,
-                                        logged=log_all_rules or logging,
-                                        action='deny' if provider else 'allow')
-                )
-
-            _h, _c = self.nsx_v.vcns.get_section(section_uri)
-            section = self.nsx_sg_utils.parse_section(_c)
-            self.nsx_sg_utils.extend_section_with_rules(section, nsx_rules)
-            try:
-                h, c = self.nsx_v.vcns.update_section(
-                    section_uri, self.nsx_sg_utils.to_xml_string(section), _h)
-            except vsh_exc.RequestBad as e:
-                # Raise the original reason of the failure
-                details = et.fromstring(e.response).find('details')
-                raise n_exc.BadRequest(
-                    resource='security_group_rule',
-                    msg=details.text if details is not None else "Unknown")
-
-            rule_pairs = self.nsx_sg_utils.get_rule_id_pair_from_section(c)
+        # Querying DB for associated dfw section id
+        section_uri = self._get_section_uri(context.session, sg_id)
+        logging = self._is_security_group_logged(context, sg_id)
+        provider = self._is_provider_security_group(context, sg_id)
+        log_all_rules = cfg.CONF.nsxv.log_security_groups_allowed_traffic
+
+        # Translating Neutron rules to Nsx DFW rules
+        for r in sg_rules:
+            rule = r['security_group_rule']
+            if not self._check_local_ip_prefix(context, rule):
+                rule[secgroup_rule_local_ip_prefix.LOCAL_IP_PREFIX] = None
+            rule['id'] = rule.get('id') or uuidutils.generate_uuid()
+            ruleids.add(rule['id'])
+            nsx_rules.append(
+                self._create_nsx_rule(context, rule,
+                                      logged=log_all_rules or logging,
+                                      action='deny' if provider else 'allow')
+            )
+
+        # The section update may be coalesced with concurrent updates of
+        # the same security group rules
+        try:
+            rule_pairs = self.nsx_sg_update_queue.update_section(
+                'rule-update-%s' % sg_id, section_uri, nsx_rules=nsx_rules)
+        except vsh_exc.RequestBad as e:
+            # Raise the original reason of the failure
+            details = et.fromstring(e.response).find('details')
+            raise n_exc.BadRequest(
+                resource='security_group_rule',
+                msg=details.text if details is not None else "Unknown")
 
         try:
             # Save new rules in Database, including mappings between Nsx rules
@@ -4614,12 +4658,10 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                             context.session, neutron_rule_id, nsx_rule_id)
         except Exception:
             with excutils.save_and_reraise_exception():
-                for nsx_rule_id in [p['nsx_id'] for p in rule_pairs
-                                    if p['neutron_id'] in ruleids]:
-                    with locking.LockManager.get_lock('rule-update-%s' %
-                                                      sg_id):
-                        self.nsx_v.vcns.remove_rule_from_section(
-                            section_uri, nsx_rule_id)
+                self.nsx_sg_update_queue.update_section(
+                    'rule-update-%s' % sg_id, section_uri,
+                    removed_rule_ids=[p['nsx_id'] for p in rule_pairs
+                                      if p['neutron_id'] in ruleids])
                 LOG.exception("Failed to create security group rule")
         return new_rule_list
 
@@ -4635,10 +4677,9 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
             context.session, security_group_id)
         try:
             if nsx_rule_id and section_uri:
-                with locking.LockManager.get_lock('rule-update-%s' %
-                                                  security_group_id):
-                    self.nsx_v.vcns.remove_rule_from_section(
-                        section_uri, nsx_rule_id)
+                self.nsx_sg_update_queue.update_section(
+                    'rule-update-%s' % security_group_id, section_uri,
+                    removed_rule_ids=[nsx_rule_id])
         except vsh_exc.ResourceNotFound:
             LOG.debug("Security group rule %(id)s deleted, backend "
                       "nsx-rule %(nsx_rule_id)s doesn't exist.",
@@ -4717,76 +4758,119 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         except Exception:
             LOG.info("Unable to configure edge reservations")
 
+    def _get_config_fingerprint(self):
+        """Return a digest of the configuration validated on the backend"""
+        azs = sorted(
+            self._availability_zones_data.list_availability_zones_objects(),
+            key=lambda az: az.name)
+        config = {'nsxv': dict(cfg.CONF.nsxv.items()),
+                  'availability_zones': [vars(az) for az in azs],
+                  'network_vlans': self._network_vlans}
+        return hashlib.sha256(jsonutils.dumps(
+            config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     def _validate_config(self):
-        self.existing_dvs = self.nsx_v.vcns.get_dvs_list()
+        """Validate the configuration against the backend
+
+        A successful validation of the same configuration by another worker
+        of the host is reused for config_validation_cache_ttl seconds, and
+        the workers starting together wait for the first one to validate it.
+        """
+        cache = file_cache.FileCache(
+            'nsxv-config-validation',
+            cfg.CONF.nsxv.config_validation_cache_ttl)
+        if not cache.enabled:
+            self._validate_config_on_backend()
+            return
+        fingerprint = self._get_config_fingerprint()
+        with locking.LockManager.get_lock('nsxv-config-validation'):
+            validation = cache.get(fingerprint)
+            if validation is not None:
+                LOG.info("Skipping the validation of the configuration, "
+                         "validated by another worker")
+                self.existing_dvs = validation['existing_dvs']
+                return
+            self._validate_config_on_backend()
+            cache.set(fingerprint, {'existing_dvs': self.existing_dvs})
+
+    def _validate_config_on_backend(self):
+        vcns = self.nsx_v.vcns
+        pool = eventlet.GreenPool(CONFIG_VALIDATION_POOL_SIZE)
+        # Read the lists the resources are looked up in concurrently. The
+        # first datacenter validation reads the scoping objects, which are
+        # then shared by all the datacenter & network validations.
+        dvs_list = pool.spawn(vcns.get_dvs_list)
+        scope_list = pool.spawn(vcns.get_vdn_scope_list)
+        datacenter_valid = pool.spawn(vcns.validate_datacenter_moid,
+                                      cfg.CONF.nsxv.datacenter_moid,
+                                      during_init=True)
+        nsx_version = pool.spawn(vcns.get_version)
+
+        self.existing_dvs = dvs_list.wait()
         if (cfg.CONF.nsxv.dvs_id and
-            not self.nsx_v.vcns.validate_dvs(cfg.CONF.nsxv.dvs_id,
-                                             dvs_list=self.existing_dvs)):
+            not vcns.validate_dvs(cfg.CONF.nsxv.dvs_id,
+                                  dvs_list=self.existing_dvs)):
             raise nsx_exc.NsxResourceNotFound(
                                 res_name='dvs_id',
                                 res_id=cfg.CONF.nsxv.dvs_id)
         for dvs_id in self._availability_zones_data.get_additional_dvs_ids():
-            if not self.nsx_v.vcns.validate_dvs(dvs_id,
-                                                dvs_list=self.existing_dvs):
+            if not vcns.validate_dvs(dvs_id, dvs_list=self.existing_dvs):
                 raise nsx_exc.NsxAZResourceNotFound(
                     res_name='dvs_id', res_id=dvs_id)
 
         # validate network-vlan dvs ID's
         for dvs_id in self._network_vlans:
-            if not self.nsx_v.vcns.validate_dvs(dvs_id,
-                                                dvs_list=self.existing_dvs):
+            if not vcns.validate_dvs(dvs_id, dvs_list=self.existing_dvs):
                 raise nsx_exc.NsxResourceNotFound(res_name='dvs_id',
                                                   res_id=dvs_id)
 
         # Validate the global & per-AZ validate_datacenter_moid
-        if not self.nsx_v.vcns.validate_datacenter_moid(
-                cfg.CONF.nsxv.datacenter_moid,
-                during_init=True):
+        if not datacenter_valid.wait():
             raise nsx_exc.NsxResourceNotFound(
                                 res_name='datacenter_moid',
                                 res_id=cfg.CONF.nsxv.datacenter_moid)
         for dc in self._availability_zones_data.get_additional_datacenter():
-            if not self.nsx_v.vcns.validate_datacenter_moid(
-                dc, during_init=True):
+            if not vcns.validate_datacenter_moid(dc, during_init=True):
                 raise nsx_exc.NsxAZResourceNotFound(
                     res_name='datacenter_moid', res_id=dc)
 
         # Validate the global & per-AZ external_network
-        if not self.nsx_v.vcns.validate_network(
+        if not vcns.validate_network(
                 cfg.CONF.nsxv.external_network,
                 during_init=True):
             raise nsx_exc.NsxResourceNotFound(
                                 res_name='external_network',
                                 res_id=cfg.CONF.nsxv.external_network)
         for ext_net in self._availability_zones_data.get_additional_ext_net():
-            if not self.nsx_v.vcns.validate_network(
-                ext_net, during_init=True):
+            if not vcns.validate_network(ext_net, during_init=True):
                 raise nsx_exc.NsxAZResourceNotFound(
                     res_name='external_network', res_id=ext_net)
 
         # Validate the global & per-AZ vdn_scope_id
-        if not self.nsx_v.vcns.validate_vdn_scope(cfg.CONF.nsxv.vdn_scope_id):
+        scope_list = scope_list.wait()
+        if not vcns.validate_vdn_scope(cfg.CONF.nsxv.vdn_scope_id,
+                                       scope_list=scope_list):
             raise nsx_exc.NsxResourceNotFound(
                                 res_name='vdn_scope_id',
                                 res_id=cfg.CONF.nsxv.vdn_scope_id)
         for vdns in self._availability_zones_data.get_additional_vdn_scope():
-            if not self.nsx_v.vcns.validate_vdn_scope(vdns):
+            if not vcns.validate_vdn_scope(vdns, scope_list=scope_list):
                 raise nsx_exc.NsxAZResourceNotFound(
                     res_name='vdn_scope_id', res_id=vdns)
 
         # Validate the global & per-AZ mgt_net_moid
         if (cfg.CONF.nsxv.mgt_net_moid and
-            not self.nsx_v.vcns.validate_network(
-                cfg.CONF.nsxv.mgt_net_moid)):
+            not vcns.validate_network(cfg.CONF.nsxv.mgt_net_moid,
+                                      during_init=True)):
             raise nsx_exc.NsxResourceNotFound(
                                 res_name='mgt_net_moid',
                                 res_id=cfg.CONF.nsxv.mgt_net_moid)
         for mgmt_net in self._availability_zones_data.get_additional_mgt_net():
-            if not self.nsx_v.vcns.validate_network(mgmt_net):
+            if not vcns.validate_network(mgmt_net, during_init=True):
                 raise nsx_exc.NsxAZResourceNotFound(
                     res_name='mgt_net_moid', res_id=mgmt_net)
 
-        ver = self.nsx_v.vcns.get_version()
+        ver = nsx_version.wait()
         if version.LooseVersion(ver) < version.LooseVersion('6.2.0'):
             LOG.warning("Skipping validations. Not supported by version.")
             return
@@ -4836,8 +4920,11 @@ class NsxVPluginV2(addr_pair_db.AllowedAddressPairsMixin,
             inventory.append((cfg.CONF.nsxv.default_policy_id,
                               'default_policy_id'))
 
+        # Validate the inventory concurrently
+        morefs = list(set(moref for moref, field in inventory if moref))
+        valid = dict(zip(morefs, pool.imap(vcns.validate_inventory, morefs)))
         for moref, field in inventory:
-            if moref and not self.nsx_v.vcns.validate_inventory(moref):
+            if moref and not valid[moref]:
                 error = _("Configured %s not found") % field
                 raise nsx_exc.NsxPluginException(err_msg=error)
 
@@ -24,44 +24,60 @@ import six
 from vmware_nsx.plugins.nsx_v.vshield.common import exceptions
 
 
-def _xmldump(obj):
-    """Sort of improved xml creation method.
+def _xmlwrite(obj, out, append):
+    """Append the xml for obj to out, and return its attributes.
 
-    This converts the dict to xml with following assumptions:
-    Keys starting with _(underscore) are to be used as attributes and not
-    element keys starting with @ so that dict can be made.
-    Keys starting with __(double underscore) are to be skipped and its
-    value is processed.
-    The keys are not part of any xml schema.
+    The attributes are returned rather than written, as they belong to the
+    opening tag of the parent element, which has been written already.
+    append is out.append, passed along to save the lookups.
     """
-
-    config = ""
     attr = ""
     if isinstance(obj, dict):
         for key, value in six.iteritems(obj):
-            if key.startswith('__'):
-                # Skip the key and evaluate it's value.
-                a, x = _xmldump(value)
-                config += x
-            elif key.startswith('_'):
-                attr += ' %s="%s"' % (key[1:], value)
-            else:
-                a, x = _xmldump(value)
-                if key.startswith('@'):
-                    cfg = "%s" % (x)
+            if key.startswith('_'):
+                if key.startswith('__'):
+                    # Skip the key and evaluate it's value.
+                    _xmlwrite(value, out, append)
                 else:
-                    cfg = "<%s%s>%s</%s>" % (key, a, x, key)
-
-                config += cfg
+                    attr += ' %s="%s"' % (key[1:], value)
+            elif key.startswith('@'):
+                _xmlwrite(value, out, append)
+            elif isinstance(value, (dict, list)):
+                # Reserve a slot for the opening tag until the attributes
+                # are known
+                index = len(out)
+                append(None)
+                out[index] = "<%s%s>" % (key,
+                                         _xmlwrite(value, out, append))
+                append("</%s>" % key)
+            else:
+                append("<%s>%s</%s>" % (key, value, key))
     elif isinstance(obj, list):
         for value in obj:
-            a, x = _xmldump(value)
-            attr += a
-            config += x
+            attr += _xmlwrite(value, out, append)
     else:
-        config = obj
+        append("%s" % (obj,))
+    return attr
 
-    return attr, config
+
+def _xmldump(obj):
+    """Sort of improved xml creation method.
+
+    This converts the dict to xml with following assumptions:
+    Keys starting with _(underscore) are to be used as attributes and not
+    element keys starting with @ so that dict can be made.
+    Keys starting with __(double underscore) are to be skipped and its
+    value is processed.
+    The keys are not part of any xml schema.
+
+    The xml is written as a list of fragments joined only once, so that the
+    serialization is linear with the size of the document.
+    """
+    if not isinstance(obj, (dict, list)):
+        return "", obj
+    out = []
+    attr = _xmlwrite(obj, out, out.append)
+    return attr, "".join(out)
 
 
 def xmldumps(obj):
@@ -0,0 +1,79 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+
+import eventlet
+from eventlet import event
+
+# The creation of the DHCP static bindings of a port
+CreateBindings = collections.namedtuple('CreateBindings', ['bindings'])
+
+# The deletion of the DHCP static binding of a port
+DeleteBinding = collections.namedtuple(
+    'DeleteBinding', ['binding_id', 'port_id', 'mac_address'])
+
+
+class EdgeDhcpBindingsQueue(object):
+    """Aggregates the DHCP static binding changes of an edge
+
+    A change requested while no other change of the edge is in progress is
+    applied right away. The changes requested in the meantime are queued,
+    and applied together once it is done, so that concurrent requests share
+    the edge lock and the backend calls, instead of waiting for them one by
+    one.
+
+    apply_func is called with the edge id and the list of changes, and
+    returns the result of each change, or the exception it failed with.
+    """
+
+    def __init__(self, edge_id, apply_func):
+        self.edge_id = edge_id
+        self._apply_func = apply_func
+        self._pending = []
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def apply(self, change):
+        """Apply a change to the edge, and wait for its result
+
+        The exception the change failed with is raised to the caller.
+        """
+        done = event.Event()
+        with self._lock:
+            self._pending.append((change, done))
+            if not self._flushing:
+                self._flushing = True
+                eventlet.spawn_n(self._flush)
+        return done.wait()
+
+    def _flush(self):
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if not pending:
+                    self._flushing = False
+                    return
+            changes = [change for change, done in pending]
+            try:
+                results = self._apply_func(self.edge_id, changes)
+            except Exception as e:
+                results = [e] * len(pending)
+            for (change, done), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    done.send_exception(result)
+                else:
+                    done.send(result)
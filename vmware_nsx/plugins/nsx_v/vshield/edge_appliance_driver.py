@@ -248,6 +248,8 @@ class EdgeApplianceDriver(object):
             response = self.vcns.get_edge_status(edge_id)[1]
             status_level = self._edge_status_to_level(
                 response['edgeStatus'])
+            self.edge_inventory.update_edge_status(edge_id,
+                                                   response['edgeStatus'])
         except exceptions.VcnsApiException as e:
             LOG.error("VCNS: Failed to get edge %(edge_id)s status: "
                       "Reason: %(reason)s",
@@ -263,6 +265,12 @@ class EdgeApplianceDriver(object):
 
         return status_level
 
+    def get_cached_edge_status(self, edge_id):
+        """Return the edge status from the edges inventory if available"""
+        edge = self.edge_inventory.get_edge(edge_id)
+        if edge and edge.get('edgeStatus'):
+            return self._edge_status_to_level(edge['edgeStatus'])
+
     def get_interface(self, edge_id, vnic_index):
         # get vnic interface address groups
         try:
@@ -546,8 +554,10 @@ class EdgeApplianceDriver(object):
         if edge_id:
             try:
                 self.vcns.delete_edge(edge_id)
+                self.edge_inventory.remove_edge(edge_id)
                 return True
             except exceptions.ResourceNotFound:
+                self.edge_inventory.remove_edge(edge_id)
                 return True
             except exceptions.VcnsApiException as e:
                 LOG.exception("VCNS: Failed to delete %(edge_id)s:\n"
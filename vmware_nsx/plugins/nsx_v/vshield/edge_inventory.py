@@ -0,0 +1,81 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class EdgeInventory(object):
+    """A snapshot of the summaries of the NSX-V edges
+
+    The edges are listed from the backend at most once every ttl seconds,
+    and the snapshot is shared by all the callers. In between, entries are
+    updated from the edge status calls, and removed when edges are deleted.
+    A ttl of 0 disables the snapshot, and the edges are listed on each call.
+    """
+
+    def __init__(self, vcns, ttl):
+        self._vcns = vcns
+        self.ttl = ttl
+        self._edges = collections.OrderedDict()
+        self._expiry = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _get_snapshot(self):
+        # Must be called with the lock held, so that concurrent callers wait
+        # for a single listing of the edges
+        if self._expiry <= time.time():
+            edges = self._vcns.get_edges()
+            LOG.debug("Refreshed the snapshot of %d NSX edges", len(edges))
+            self._edges = collections.OrderedDict(
+                (edge['id'], edge) for edge in edges)
+            self._expiry = time.time() + self.ttl
+        return self._edges
+
+    def get_edges(self):
+        if not self.enabled:
+            return self._vcns.get_edges()
+        with self._lock:
+            return list(self._get_snapshot().values())
+
+    def get_edge(self, edge_id):
+        """Return the summary of an edge, or None if it is not listed"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._get_snapshot().get(edge_id)
+
+    def update_edge_status(self, edge_id, edge_status):
+        with self._lock:
+            edge = self._edges.get(edge_id)
+            if edge is not None:
+                self._edges[edge_id] = dict(edge, edgeStatus=edge_status)
+
+    def remove_edge(self, edge_id):
+        with self._lock:
+            self._edges.pop(edge_id, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._expiry = 0
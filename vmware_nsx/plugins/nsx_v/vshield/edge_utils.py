@@ -50,11 +50,17 @@ from vmware_nsx.plugins.nsx_v import availability_zones as nsx_az
 from vmware_nsx.plugins.nsx_v.vshield.common import (
     constants as vcns_const)
 from vmware_nsx.plugins.nsx_v.vshield.common import exceptions as nsxapi_exc
+from vmware_nsx.plugins.nsx_v.vshield import dhcp_bindings
 from vmware_nsx.plugins.nsx_v.vshield import vcns
 
 WORKER_POOL_SIZE = 8
 RP_FILTER_PROPERTY_OFF_TEMPLATE = 'sysctl.net.ipv4.conf.%s.rp_filter=%s'
 MAX_EDGE_PENDING_SEC = 600
+# With a distributed lock, batches of DHCP static binding changes of an
+# edge with fewer changes are applied with a request per binding, and
+# larger batches with a single reconfiguration of the DHCP service of the
+# edge
+DHCP_BINDINGS_RECONFIGURE_MIN = 3
 
 LOG = logging.getLogger(__name__)
 _uuid = uuidutils.generate_uuid
@@ -191,6 +197,7 @@ class EdgeManager(object):
         self.nsxv_plugin = nsxv_manager.callbacks.plugin
         self.plugin = plugin
         self.per_interface_rp_filter = self._get_per_edge_rp_filter_state()
+        self._dhcp_bindings_queues = {}
         self._check_backup_edge_pools()
 
     def _parse_backup_edge_pool_opt(self):
@@ -435,6 +442,12 @@ class EdgeManager(object):
 
     def check_edge_active_at_backend(self, edge_id):
         try:
+            # Rely on the edges inventory, which is shared by the concurrent
+            # allocations, for active edges only. Edges which are missing
+            # from it or not active may have changed since it was listed.
+            status = self.nsxv_manager.get_cached_edge_status(edge_id)
+            if status == vcns_const.RouterStatus.ROUTER_STATUS_ACTIVE:
+                return True
             status = self.nsxv_manager.get_edge_status(edge_id)
             return (status == vcns_const.RouterStatus.ROUTER_STATUS_ACTIVE)
         except Exception:
@@ -977,7 +990,116 @@ class EdgeManager(object):
             static_config['dhcpOptions']['others'].append(
                 {'code': opt_name, 'value': opt_val})
 
-    def create_static_binding(self, context, port):
+    def _make_subnet_dhcp_config(self, subnet, name_servers, host_routes,
+                                 sub_binding, metadata_ip):
+        """Return the configuration of a subnet for its static bindings"""
+        dhcp_config = {'gateway_ip': subnet['gateway_ip'],
+                       'name_servers': name_servers,
+                       'host_routes': host_routes,
+                       'dns_search_domain': None,
+                       'dhcp_mtu': None,
+                       'metadata_ip': metadata_ip}
+        if sub_binding:
+            dhcp_config['dns_search_domain'] = sub_binding.dns_search_domain
+            dhcp_config['dhcp_mtu'] = sub_binding.dhcp_mtu
+        return dhcp_config
+
+    def _get_subnet_metadata_ip(self, context, subnet, dhcp_ips=None):
+        """Return the nexthop of the metadata route of a subnet, if any
+
+        dhcp_ips optionally maps the subnets to the address of their DHCP
+        port. By default the DHCP port of the subnet is queried.
+        """
+        if self.nsxv_plugin.is_dhcp_metadata(context, subnet['id'],
+                                             subnet=subnet):
+            if dhcp_ips is not None:
+                dhcp_ip = dhcp_ips.get(subnet['id'])
+            else:
+                dhcp_ip = self.nsxv_plugin._get_dhcp_ip_addr_from_subnet(
+                    context, subnet['id'])
+            if dhcp_ip:
+                return dhcp_ip
+            LOG.error("Failed to find the dhcp port on subnet "
+                      "%s to do metadata host route insertion",
+                      subnet['id'])
+
+    def _get_subnet_dhcp_config(self, context, subnet_id):
+        # Query the subnet to get gateway and DNS
+        subnet = self.nsxv_plugin._get_subnet(context, subnet_id)
+        # Only configure if subnet has DHCP support
+        if not subnet['enable_dhcp']:
+            return
+        metadata_ip = self._get_subnet_metadata_ip(context, subnet)
+        return self._make_subnet_dhcp_config(
+            subnet,
+            [dns['address'] for dns in subnet['dns_nameservers']],
+            [(route['destination'], route['nexthop'])
+             for route in subnet['routes']],
+            nsxv_db.get_nsxv_subnet_ext_attributes(context.session,
+                                                   subnet_id),
+            metadata_ip)
+
+    def _get_subnets_dhcp_config(self, context, subnets, ports):
+        """Return the configuration of the subnets for their static bindings
+
+        The configurations are built from the DHCP enabled subnets, and the
+        ports of their networks, with a single query for the extended
+        attributes of all the subnets.
+        """
+        sub_bindings = dict(
+            (sub_binding.subnet_id, sub_binding) for sub_binding in
+            nsxv_db.get_nsxv_subnets_ext_attributes(
+                context.session, [subnet['id'] for subnet in subnets]))
+        # The first address of the first DHCP port on each subnet
+        dhcp_ips = {}
+        for port in ports:
+            if (port['device_owner'] == constants.DEVICE_OWNER_DHCP and
+                    port['fixed_ips']):
+                for fixed_ip in port['fixed_ips']:
+                    dhcp_ips.setdefault(fixed_ip['subnet_id'],
+                                        port['fixed_ips'][0]['ip_address'])
+        subnets_config = {}
+        for subnet in subnets:
+            metadata_ip = self._get_subnet_metadata_ip(context, subnet,
+                                                       dhcp_ips=dhcp_ips)
+            subnets_config[subnet['id']] = self._make_subnet_dhcp_config(
+                subnet, subnet['dns_nameservers'],
+                [(route['destination'], route['nexthop'])
+                 for route in subnet['host_routes']],
+                sub_bindings.get(subnet['id']), metadata_ip)
+        return subnets_config
+
+    def _add_subnet_on_static_binding(self, static_config, dhcp_config):
+        # Set gateway for static binding
+        static_config['defaultGateway'] = dhcp_config['gateway_ip']
+        # set primary and secondary dns
+        # if no nameservers have been configured then use the ones
+        # defined in the configuration
+        name_servers = (dhcp_config['name_servers'] or
+                        cfg.CONF.nsxv.nameservers)
+        if len(name_servers) == 1:
+            static_config['primaryNameServer'] = name_servers[0]
+        elif len(name_servers) >= 2:
+            static_config['primaryNameServer'] = name_servers[0]
+            static_config['secondaryNameServer'] = name_servers[1]
+        # Set search domain for static binding
+        dns_search_domain = (dhcp_config['dns_search_domain'] or
+                             cfg.CONF.nsxv.dns_search_domain)
+        if dns_search_domain:
+            static_config['domainName'] = dns_search_domain
+        if dhcp_config['dhcp_mtu']:
+            self.add_mtu_on_static_binding(static_config,
+                                           dhcp_config['dhcp_mtu'])
+        if dhcp_config['metadata_ip']:
+            self.add_host_route_on_static_bindings(
+                [static_config],
+                '169.254.169.254/32',
+                dhcp_config['metadata_ip'])
+        for destination, nexthop in dhcp_config['host_routes']:
+            self.add_host_route_on_static_bindings(
+                [static_config], destination, nexthop)
+
+    def create_static_binding(self, context, port, subnets_config=None):
         """Create the DHCP Edge static binding configuration
 
         <staticBinding>
@@ -989,6 +1111,10 @@ class EdgeManager(object):
             <secondaryNameServer></secondaryNameServer> <!--optional-->
             <domainName></domainName> <!--optional-->
         </staticBinding>
+
+        subnets_config maps the DHCP enabled subnets to their configuration,
+        as returned by _get_subnets_dhcp_config. By default the subnets of
+        the port are queried.
         """
         static_bindings = []
         static_config = {}
@@ -997,52 +1123,21 @@ class EdgeManager(object):
         static_config['leaseTime'] = cfg.CONF.nsxv.dhcp_lease_time
 
         for fixed_ip in port['fixed_ips']:
-            # Query the subnet to get gateway and DNS
-            try:
-                subnet_id = fixed_ip['subnet_id']
-                subnet = self.nsxv_plugin._get_subnet(context, subnet_id)
-            except n_exc.SubnetNotFound:
-                LOG.debug("No related subnet for port %s", port['id'])
-                continue
+            subnet_id = fixed_ip['subnet_id']
+            if subnets_config is not None:
+                dhcp_config = subnets_config.get(subnet_id)
+            else:
+                try:
+                    dhcp_config = self._get_subnet_dhcp_config(context,
+                                                               subnet_id)
+                except n_exc.SubnetNotFound:
+                    LOG.debug("No related subnet for port %s", port['id'])
+                    continue
             # Only configure if subnet has DHCP support
-            if not subnet['enable_dhcp']:
+            if not dhcp_config:
                 continue
             static_config['ipAddress'] = fixed_ip['ip_address']
-            # Set gateway for static binding
-            static_config['defaultGateway'] = subnet['gateway_ip']
-            # set primary and secondary dns
-            name_servers = [dns['address']
-                            for dns in subnet['dns_nameservers']]
-            # if no nameservers have been configured then use the ones
-            # defined in the configuration
-            name_servers = name_servers or cfg.CONF.nsxv.nameservers
-            if len(name_servers) == 1:
-                static_config['primaryNameServer'] = name_servers[0]
-            elif len(name_servers) >= 2:
-                static_config['primaryNameServer'] = name_servers[0]
-                static_config['secondaryNameServer'] = name_servers[1]
-            # Set search domain for static binding
-            sub_binding = nsxv_db.get_nsxv_subnet_ext_attributes(
-                context.session,
-                subnet_id)
-            dns_search_domain = None
-            if sub_binding and sub_binding.dns_search_domain:
-                dns_search_domain = sub_binding.dns_search_domain
-            elif cfg.CONF.nsxv.dns_search_domain:
-                dns_search_domain = cfg.CONF.nsxv.dns_search_domain
-            if dns_search_domain:
-                static_config['domainName'] = dns_search_domain
-            if sub_binding and sub_binding.dhcp_mtu:
-                static_config = self.add_mtu_on_static_binding(
-                    static_config, sub_binding.dhcp_mtu)
-
-            self.handle_meta_static_route(
-                context, subnet_id, [static_config])
-            for host_route in subnet['routes']:
-                self.add_host_route_on_static_bindings(
-                    [static_config],
-                    host_route['destination'],
-                    host_route['nexthop'])
+            self._add_subnet_on_static_binding(static_config, dhcp_config)
 
             dhcp_opts = port.get(ext_edo.EXTRADHCPOPTS)
             if dhcp_opts is not None:
@@ -1083,22 +1178,6 @@ class EdgeManager(object):
         static_binding['dhcpOptions']['option26'] = mtu
         return static_binding
 
-    def handle_meta_static_route(self, context, subnet_id, static_bindings):
-        is_dhcp_option121 = self.nsxv_plugin.is_dhcp_metadata(context,
-                                                              subnet_id)
-        if is_dhcp_option121:
-            dhcp_ip = self.nsxv_plugin._get_dhcp_ip_addr_from_subnet(
-                context, subnet_id)
-            if dhcp_ip:
-                self.add_host_route_on_static_bindings(
-                    static_bindings,
-                    '169.254.169.254/32',
-                    dhcp_ip)
-            else:
-                LOG.error("Failed to find the dhcp port on subnet "
-                          "%s to do metadata host route insertion",
-                          subnet_id)
-
     def update_dhcp_service_config(self, context, edge_id):
         """Reconfigure the DHCP to the edge."""
         # Get all networks attached to the edge
@@ -1112,17 +1191,21 @@ class EdgeManager(object):
                                          'enable_dhcp': [True]})
 
         static_bindings = []
-        for subnet in subnets:
+        if subnets:
+            # Build the bindings of all the ports of the networks from a
+            # single read of the ports and of the subnets configuration
             ports = self.nsxv_plugin.get_ports(
                 context.elevated(),
-                filters={'network_id': [subnet['network_id']],
-                         'fixed_ips': {'subnet_id': [subnet['id']]}})
-            inst_ports = [port for port in ports
-                          if port['device_owner'].startswith('compute')]
-            for port in inst_ports:
-                static_bindings.extend(
-                    self.create_static_binding(
-                        context.elevated(), port))
+                filters={'network_id': list(set(
+                    subnet['network_id'] for subnet in subnets))})
+            subnets_config = self._get_subnets_dhcp_config(
+                context, subnets, ports)
+            for port in ports:
+                if port['device_owner'].startswith('compute'):
+                    static_bindings.extend(
+                        self.create_static_binding(
+                            context.elevated(), port,
+                            subnets_config=subnets_config))
         dhcp_request = {
             'featureType': "dhcp_4.0",
             'enabled': True,
@@ -1131,11 +1214,8 @@ class EdgeManager(object):
             edge_id, dhcp_request)
         bindings_get = get_dhcp_binding_mappings(self.nsxv_manager, edge_id)
         # Refresh edge_dhcp_static_bindings attached to edge
-        nsxv_db.clean_edge_dhcp_static_bindings_by_edge(
-            context.session, edge_id)
-        for mac_address, binding_id in bindings_get.items():
-            nsxv_db.create_edge_dhcp_static_binding(context.session, edge_id,
-                                                    mac_address, binding_id)
+        nsxv_db.replace_edge_dhcp_static_bindings(
+            context.session, edge_id, bindings_get)
 
     def _get_random_available_edge(self, available_edge_ids):
         while available_edge_ids:
@@ -1829,33 +1909,130 @@ class EdgeManager(object):
                     return True
             return False
 
+    def _get_dhcp_bindings_queue(self, edge_id):
+        queue = self._dhcp_bindings_queues.get(edge_id)
+        if queue is None:
+            queue = self._dhcp_bindings_queues.setdefault(
+                edge_id, dhcp_bindings.EdgeDhcpBindingsQueue(
+                    edge_id, self._apply_dhcp_binding_changes))
+        return queue
+
+    def _apply_dhcp_binding_changes(self, edge_id, changes):
+        context = q_context.get_admin_context()
+        with locking.LockManager.get_lock(str(edge_id)):
+            # The edge lock is local to the host unless a distributed
+            # coordinator is configured. The other servers may then change
+            # the bindings of the edge between the read and the update of
+            # the whole DHCP service, and their changes would be lost.
+            if (cfg.CONF.locking_coordinator_url and
+                    len(changes) >= DHCP_BINDINGS_RECONFIGURE_MIN):
+                return self._reconfigure_dhcp_bindings(context, edge_id,
+                                                       changes)
+            results = []
+            for change in changes:
+                try:
+                    if isinstance(change, dhcp_bindings.CreateBindings):
+                        results.append(self._create_edge_dhcp_bindings(
+                            context, edge_id, change.bindings))
+                    else:
+                        results.append(self._delete_edge_dhcp_binding(
+                            context, edge_id, change))
+                except Exception as e:
+                    # Only the caller of this change fails
+                    results.append(e)
+            return results
+
+    def _reconfigure_dhcp_bindings(self, context, edge_id, changes):
+        """Apply the changes with a single update of the DHCP service
+
+        The conflicts of the new bindings with the existing ones are
+        resolved against one read of the static bindings of the edge. This
+        must only be done under a distributed edge lock.
+        """
+        dhcp_config = query_dhcp_service_config(self.nsxv_manager, edge_id)
+        static_bindings = (dhcp_config['staticBindings']['staticBindings']
+                           if dhcp_config else [])
+        results = []
+        for change in changes:
+            if isinstance(change, dhcp_bindings.CreateBindings):
+                for binding in change.bindings:
+                    # Replace the bindings with the same MAC address, IP
+                    # address or hostname
+                    static_bindings = [
+                        b for b in static_bindings
+                        if (b['macAddress'].lower() !=
+                            binding['macAddress'].lower() and
+                            b.get('ipAddress') != binding['ipAddress'] and
+                            b.get('hostname') != binding['hostname'])]
+                    static_bindings.append(binding)
+                results.append(change.bindings)
+                continue
+            deleted = False
+            for binding in static_bindings:
+                if binding.get('bindingId') == change.binding_id:
+                    # The hostname is the port_id so we have a unique
+                    # identifier
+                    if binding.get('hostname') == change.port_id:
+                        static_bindings.remove(binding)
+                        deleted = True
+                    break
+            if not deleted:
+                LOG.warning("Failed to find binding on edge %(edge_id)s for "
+                            "port %(port_id)s with %(binding_id)s",
+                            {'edge_id': edge_id,
+                             'port_id': change.port_id,
+                             'binding_id': change.binding_id})
+            results.append(deleted)
+        dhcp_request = {
+            'featureType': "dhcp_4.0",
+            'enabled': True,
+            'staticBindings': {'staticBindings': static_bindings}}
+        self.nsxv_manager.vcns.reconfigure_dhcp_service(
+            edge_id, dhcp_request)
+        LOG.debug("Reconfigured the DHCP service of edge %(edge_id)s with "
+                  "%(num)d binding changes",
+                  {'edge_id': edge_id, 'num': len(changes)})
+        # The bindings may get new ids when reconfiguring the service
+        bindings_get = get_dhcp_binding_mappings(self.nsxv_manager, edge_id)
+        nsxv_db.replace_edge_dhcp_static_bindings(
+            context.session, edge_id, bindings_get)
+        return [[bindings_get.get(binding['macAddress'].lower())
+                 for binding in result] if isinstance(result, list)
+                else result for result in results]
+
+    def _delete_edge_dhcp_binding(self, context, edge_id, change):
+        # We need to read the binding from the NSX to check that
+        # we are not deleting a updated entry. This may be the
+        # result of a async nova create and nova delete and the
+        # same port IP is selected
+        binding = get_dhcp_binding_for_binding_id(
+            self.nsxv_manager, edge_id, change.binding_id)
+        # The hostname is the port_id so we have a unique
+        # identifier
+        deleted = bool(binding and binding['hostname'] == change.port_id)
+        if deleted:
+            self.nsxv_manager.vcns.delete_dhcp_binding(
+                edge_id, change.binding_id)
+        else:
+            LOG.warning("Failed to find binding on edge "
+                        "%(edge_id)s for port "
+                        "%(port_id)s with %(binding_id)s",
+                        {'edge_id': edge_id,
+                         'port_id': change.port_id,
+                         'binding_id': change.binding_id})
+        nsxv_db.delete_edge_dhcp_static_binding(
+            context.session, edge_id, change.mac_address)
+        return deleted
+
     def delete_dhcp_binding(self, context, port_id, network_id, mac_address):
         edge_id = get_dhcp_edge_id(context, network_id)
         if edge_id:
             dhcp_binding = nsxv_db.get_edge_dhcp_static_binding(
                 context.session, edge_id, mac_address)
             if dhcp_binding:
-                with locking.LockManager.get_lock(str(edge_id)):
-                    # We need to read the binding from the NSX to check that
-                    # we are not deleting a updated entry. This may be the
-                    # result of a async nova create and nova delete and the
-                    # same port IP is selected
-                    binding = get_dhcp_binding_for_binding_id(
-                        self.nsxv_manager, edge_id, dhcp_binding.binding_id)
-                    # The hostname is the port_id so we have a unique
-                    # identifier
-                    if binding and binding['hostname'] == port_id:
-                        self.nsxv_manager.vcns.delete_dhcp_binding(
-                            edge_id, dhcp_binding.binding_id)
-                    else:
-                        LOG.warning("Failed to find binding on edge "
-                                    "%(edge_id)s for port "
-                                    "%(port_id)s with %(binding_id)s",
-                                    {'edge_id': edge_id,
-                                     'port_id': port_id,
-                                     'binding_id': dhcp_binding.binding_id})
-                    nsxv_db.delete_edge_dhcp_static_binding(
-                        context.session, edge_id, mac_address)
+                self._get_dhcp_bindings_queue(edge_id).apply(
+                    dhcp_bindings.DeleteBinding(dhcp_binding.binding_id,
+                                                port_id, mac_address))
             else:
                 LOG.warning("Failed to find dhcp binding on edge "
                             "%(edge_id)s to DELETE for port "
@@ -1910,7 +2087,30 @@ class EdgeManager(object):
                         context.session, edge_id, binding_id)
         return binding_id
 
+    def _create_edge_dhcp_bindings(self, context, edge_id, bindings):
+        configured_bindings = []
+        try:
+            for binding in bindings:
+                binding_id = self._create_dhcp_binding(
+                    context, edge_id, binding)
+                configured_bindings.append((binding_id,
+                                            binding['macAddress']))
+        except nsxapi_exc.VcnsApiException:
+            with excutils.save_and_reraise_exception():
+                for binding_id, mac_address in configured_bindings:
+                    self.nsxv_manager.vcns.delete_dhcp_binding(
+                        edge_id, binding_id)
+                    nsxv_db.delete_edge_dhcp_static_binding(
+                        context.session, edge_id, mac_address)
+        return [binding_id for binding_id, mac_address in configured_bindings]
+
     def create_dhcp_bindings(self, context, port_id, network_id, bindings):
+        """Create the DHCP static bindings of a port on its DHCP edge
+
+        The bindings are created together with the binding changes of the
+        other ports of the edge requested at the same time, and their ids
+        are returned.
+        """
         edge_id = get_dhcp_edge_id(context, network_id)
         if edge_id:
             # Check port is still there
@@ -1926,22 +2126,8 @@ class EdgeManager(object):
                      'edge_id': edge_id})
                 return
 
-            configured_bindings = []
-            try:
-                for binding in bindings:
-                    with locking.LockManager.get_lock(str(edge_id)):
-                        binding_id = self._create_dhcp_binding(
-                            context, edge_id, binding)
-                    configured_bindings.append((binding_id,
-                                                binding['macAddress']))
-            except nsxapi_exc.VcnsApiException:
-                with excutils.save_and_reraise_exception():
-                    for binding_id, mac_address in configured_bindings:
-                        with locking.LockManager.get_lock(str(edge_id)):
-                            self.nsxv_manager.vcns.delete_dhcp_binding(
-                                edge_id, binding_id)
-                            nsxv_db.delete_edge_dhcp_static_binding(
-                                context.session, edge_id, mac_address)
+            return self._get_dhcp_bindings_queue(edge_id).apply(
+                dhcp_bindings.CreateBindings(bindings))
         else:
             LOG.warning("Failed to create dhcp bindings since dhcp edge "
                         "for net %s not found at the backend",
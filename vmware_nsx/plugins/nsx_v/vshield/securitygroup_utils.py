@@ -13,11 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import threading
+import time
 import xml.etree.ElementTree as et
 
 from oslo_log import log as logging
 
+from vmware_nsx.common import locking
 from vmware_nsx.common import utils
+from vmware_nsx.plugins.nsx_v.vshield.common import exceptions as vsh_exc
 
 WAIT_INTERVAL = 2000
 MAX_ATTEMPTS = 5
@@ -215,3 +220,124 @@ class NsxSecurityGroupUtils(object):
 
         return self.nsxv_manager.vcns.update_security_policy(
             policy_id, et.tostring(policy))
+
+
+class _SectionUpdate(object):
+    """A pending modification of a single DFW section."""
+
+    def __init__(self, nsx_rules=None, removed_rule_ids=None):
+        self.nsx_rules = nsx_rules or []
+        self.removed_rule_ids = set(removed_rule_ids or [])
+        self.rule_pairs = []
+        self.error = None
+        self.done = False
+
+    def rule_names(self):
+        return set(rule.find('name').text for rule in self.nsx_rules)
+
+
+class NsxSectionUpdateQueue(object):
+    """Coalesce concurrent rule updates of the same DFW section.
+
+    Each caller queues its rule additions and removals, and then waits for
+    the section lock. The first caller to get the lock applies all the
+    pending updates of the section with a single GET/PUT of the section,
+    so a burst of rule changes to a security group costs one round trip
+    instead of one per request. Every caller still returns only once its
+    own rules were committed, and gets back its own rule id pairs.
+    """
+
+    def __init__(self, sg_utils, coalesce_window=0):
+        self._sg_utils = sg_utils
+        # The window is configured in milliseconds
+        self._coalesce_window = coalesce_window / 1000.0
+        self._pending = collections.defaultdict(list)
+        self._pending_lock = threading.Lock()
+
+    @property
+    def _vcns(self):
+        return self._sg_utils.nsxv_manager.vcns
+
+    def update_section(self, lock_name, section_uri, nsx_rules=None,
+                       removed_rule_ids=None):
+        """Add and remove rules of a section, and return the new rules ids
+
+        :param lock_name: the name of the lock protecting the section
+        :param section_uri: the uri of the backend section
+        :param nsx_rules: list of rule elements to add to the section
+        :param removed_rule_ids: list of nsx rule ids to remove
+        :return: list of {'nsx_id', 'neutron_id'} pairs of the added rules
+        """
+        update = _SectionUpdate(nsx_rules, removed_rule_ids)
+        with self._pending_lock:
+            self._pending[section_uri].append(update)
+
+        with locking.LockManager.get_lock(lock_name):
+            if not update.done:
+                if self._coalesce_window:
+                    # Let concurrent requests join this update
+                    time.sleep(self._coalesce_window)
+                with self._pending_lock:
+                    batch = self._pending.pop(section_uri, [])
+                self._apply(section_uri, batch)
+
+        if update.error is not None:
+            raise update.error
+        return update.rule_pairs
+
+    def _apply(self, section_uri, batch):
+        if len(batch) > 1:
+            LOG.debug("Coalescing %(num)s updates of section %(uri)s",
+                      {'num': len(batch), 'uri': section_uri})
+        try:
+            self._commit(section_uri, batch)
+        except vsh_exc.RequestBad as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                # One of the updates was rejected by the backend. Apply them
+                # one by one so that only the faulty request fails.
+                LOG.debug("Failed to apply coalesced updates of section "
+                          "%(uri)s: %(e)s. Retrying one by one",
+                          {'uri': section_uri, 'e': e})
+                for update in batch:
+                    try:
+                        self._commit(section_uri, [update])
+                    except Exception as err:
+                        update.error = err
+        except Exception as e:
+            for update in batch:
+                update.error = e
+        finally:
+            for update in batch:
+                update.done = True
+
+    def _commit(self, section_uri, batch):
+        if (len(batch) == 1 and not batch[0].nsx_rules and
+            len(batch[0].removed_rule_ids) == 1):
+            # A single rule deletion does not require the whole section
+            rule_id = list(batch[0].removed_rule_ids)[0]
+            self._vcns.remove_rule_from_section(section_uri, rule_id)
+            return
+
+        h, c = self._vcns.get_section(section_uri)
+        section = self._sg_utils.parse_section(c)
+        removed_rule_ids = set()
+        for update in batch:
+            removed_rule_ids |= update.removed_rule_ids
+        if removed_rule_ids:
+            for rule in section.findall('rule'):
+                if rule.attrib.get('id') in removed_rule_ids:
+                    section.remove(rule)
+        for update in batch:
+            self._sg_utils.extend_section_with_rules(
+                section, update.nsx_rules)
+
+        h, c = self._vcns.update_section(
+            section_uri, self._sg_utils.to_xml_string(section), h)
+
+        rule_pairs = self._sg_utils.get_rule_id_pair_from_section(c)
+        for update in batch:
+            names = update.rule_names()
+            update.rule_pairs = [pair for pair in rule_pairs
+                                 if pair['neutron_id'] in names]
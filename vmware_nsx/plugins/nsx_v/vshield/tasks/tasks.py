@@ -15,19 +15,23 @@
 
 import collections
 import copy
+import heapq
+import itertools
+import time
 import uuid
 
+import eventlet
 from eventlet import event
 from eventlet import greenthread
 from neutron_lib import exceptions
 from oslo_log import log as logging
-from oslo_service import loopingcall
 import six
 
 from vmware_nsx._i18n import _
 from vmware_nsx.plugins.nsx_v.vshield.tasks import constants
 
 DEFAULT_INTERVAL = 1000
+DEFAULT_SHARDS = 4
 
 LOG = logging.getLogger(__name__)
 
@@ -58,6 +62,7 @@ class Task(object):
                  status_callback=nop, result_callback=nop, userdata=None):
         self.name = name
         self.resource_id = resource_id
+        self.queued_at = None
         self._execute_callback = execute_callback
         self._status_callback = status_callback
         self._result_callback = result_callback
@@ -151,13 +156,21 @@ class Task(object):
             self.id)
 
 
-class TaskManager(object):
+class _TaskShard(object):
+    """A worker of the task manager
 
-    _instance = None
-    _default_interval = DEFAULT_INTERVAL
+    Runs the tasks of the resources hashed to this shard, one task at a
+    time per resource and in arrival order, on a green thread.
+    The status of the pending tasks is checked by another green thread, so
+    that a slow task execution does not delay the status checks. It wakes
+    up when the next check time of a pending task, kept in a heap, is due,
+    and checks only the due tasks.
+    """
 
-    def __init__(self, interval=None):
-        self._interval = interval or TaskManager._default_interval
+    def __init__(self, index, interval):
+        self.index = index
+        # The interval between status checks of a pending task, in ms
+        self._interval = interval
 
         # A queue to pass tasks from other threads
         self._tasks_queue = collections.deque()
@@ -165,25 +178,44 @@ class TaskManager(object):
         # A dict to store resource -> resource's tasks
         self._tasks = {}
 
+        # A heap of (next check time, sequence, task) of the pending tasks
+        self._pending_checks = []
+        self._sequence = itertools.count()
+
         # Current task being executed in main thread
         self._main_thread_exec_task = None
 
         # New request event
         self._req = event.Event()
 
+        # New status check event
+        self._check_req = event.Event()
+
         # TaskHandler stopped event
         self._stopped = False
 
-        # Periodic function trigger
+        # Thread checking the status of the pending tasks
         self._monitor = None
         self._monitor_busy = False
 
         # Thread handling the task request
         self._thread = None
 
+        # Statistics
+        self._executed = 0
+        self._total_wait_time = 0
+        self._max_wait_time = 0
+        self._total_exec_time = 0
+        self._max_exec_time = 0
+
     def _execute(self, task):
         """Execute task."""
         LOG.debug("Start task %s", str(task))
+        start = time.time()
+        if task.queued_at is not None:
+            wait_time = start - task.queued_at
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
         task._start()
         try:
             status = task._execute_callback(task)
@@ -193,12 +225,18 @@ class TaskManager(object):
                           {'task': str(task),
                            'cb': str(task._execute_callback)})
             status = constants.TaskStatus.ERROR
+        exec_time = time.time() - start
+        self._executed += 1
+        self._total_exec_time += exec_time
+        self._max_exec_time = max(self._max_exec_time, exec_time)
 
         LOG.debug("Task %(task)s return %(status)s",
                   {'task': str(task),
                    'status': status})
         task._update_status(status)
         task._executed()
+        if status == constants.TaskStatus.PENDING:
+            self._schedule_check(task)
 
         return status
 
@@ -216,16 +254,25 @@ class TaskManager(object):
 
         task._finished()
 
+    def _schedule_check(self, task):
+        heapq.heappush(self._pending_checks,
+                       (time.time() + self._interval / 1000.0,
+                        next(self._sequence), task))
+        if not self._check_req.ready():
+            self._check_req.send()
+
     def _check_pending_tasks(self):
-        """Check all pending tasks status."""
-        for resource_id in self._tasks.keys():
+        """Check the status of the pending tasks which are due."""
+        now = time.time()
+        tasks = []
+        while self._pending_checks and self._pending_checks[0][0] <= now:
+            tasks.append(heapq.heappop(self._pending_checks)[2])
+
+        for task in tasks:
             if self._stopped:
-                # Task manager is stopped, return now
+                # Task manager is stopped, the remaining tasks are aborted
                 return
 
-            tasks = self._tasks[resource_id]
-            # only the first task is executed and pending
-            task = tasks[0]
             try:
                 status = task._status_callback(task)
             except Exception:
@@ -237,6 +284,8 @@ class TaskManager(object):
             task._update_status(status)
             if status != constants.TaskStatus.PENDING:
                 self._dequeue(task, True)
+            else:
+                self._schedule_check(task)
 
     def _enqueue(self, task):
         if task.resource_id in self._tasks:
@@ -273,6 +322,7 @@ class TaskManager(object):
         for t in self._tasks_queue:
             self._enqueue(t)
         self._tasks_queue.clear()
+        self._pending_checks = []
 
         resources = copy.deepcopy(self._tasks)
         for resource_id in resources.keys():
@@ -289,16 +339,38 @@ class TaskManager(object):
             self._req.wait()
             self._req.reset()
 
+    def _check_loop(self):
+        """Check the status of the pending tasks when it is due."""
+        while not self._stopped:
+            timeout = None
+            if self._pending_checks:
+                timeout = self._pending_checks[0][0] - time.time()
+            if timeout is None or timeout > 0:
+                # wait for the next due check, or for a new pending task
+                with eventlet.Timeout(timeout, False):
+                    self._check_req.wait()
+                if self._check_req.ready():
+                    self._check_req.reset()
+                continue
+
+            self._monitor_busy = True
+            try:
+                self._check_pending_tasks()
+            except Exception:
+                LOG.exception("Exception in _check_pending_tasks")
+            finally:
+                self._monitor_busy = False
+
     def run(self):
         while True:
             try:
                 if self._stopped:
                     # Gracefully terminate this thread if the _stopped
                     # attribute was set to true
-                    LOG.info("Stopping TaskManager")
+                    LOG.info("Stopping TaskManager shard %d", self.index)
                     break
 
-                # get a task from queue, or timeout for periodic status check
+                # get a task from queue
                 task = self._get_task()
                 if task.resource_id in self._tasks:
                     # this resource already has some tasks under processing,
@@ -320,16 +392,21 @@ class TaskManager(object):
                     else:
                         self._enqueue(task)
             except Exception:
-                LOG.exception("TaskManager terminating because "
-                              "of an exception")
+                LOG.exception("TaskManager shard %d terminating because "
+                              "of an exception", self.index)
                 break
 
     def add(self, task):
-        task.id = uuid.uuid1()
+        task.queued_at = time.time()
         self._tasks_queue.append(task)
         if not self._req.ready():
             self._req.send()
-        return task.id
+
+    def start(self, interval):
+        self._interval = interval
+        self._stopped = False
+        self._thread = greenthread.spawn(self.run)
+        self._monitor = greenthread.spawn(self._check_loop)
 
     def stop(self):
         if self._thread is None:
@@ -337,18 +414,19 @@ class TaskManager(object):
         self._stopped = True
         self._thread.kill()
         self._thread = None
-        # Stop looping call and abort running tasks
-        self._monitor.stop()
+        # Stop the status checks and abort running tasks
         if self._monitor_busy:
+            # Let the status check in progress complete, the thread stops
+            # right after it
             self._monitor.wait()
+        else:
+            self._monitor.kill()
+        self._monitor = None
         self._abort()
-        LOG.info("TaskManager terminated")
 
     def has_pending_task(self):
-        if self._tasks_queue or self._tasks or self._main_thread_exec_task:
-            return True
-        else:
-            return False
+        return bool(self._tasks_queue or self._tasks or
+                    self._main_thread_exec_task)
 
     def show_pending_tasks(self):
         for task in self._tasks_queue:
@@ -365,31 +443,81 @@ class TaskManager(object):
             count += len(tasks)
         return count
 
-    def start(self, interval=None):
-        def _inner():
-            self.run()
+    def stats(self):
+        executed = self._executed or 1
+        return {'shard': self.index,
+                'queue_depth': self.count() + len(self._tasks_queue),
+                'pending_checks': len(self._pending_checks),
+                'executed': self._executed,
+                'avg_wait_time': self._total_wait_time / executed,
+                'max_wait_time': self._max_wait_time,
+                'avg_exec_time': self._total_exec_time / executed,
+                'max_exec_time': self._max_exec_time}
 
-        def _loopingcall_callback():
-            self._monitor_busy = True
-            try:
-                self._check_pending_tasks()
-            except Exception:
-                LOG.exception("Exception in _check_pending_tasks")
-            self._monitor_busy = False
 
+class TaskManager(object):
+    """Runs the tasks of the resources on sharded workers
+
+    The resources are hashed to a number of shards, each running its tasks
+    on its own thread, so that slow tasks or status checks of a resource do
+    not delay the tasks of the resources of other shards. The tasks of a
+    resource are run in order.
+    """
+
+    _instance = None
+    _default_interval = DEFAULT_INTERVAL
+    _default_shards = DEFAULT_SHARDS
+
+    def __init__(self, interval=None, shards=None):
+        self._interval = interval or TaskManager._default_interval
+        self._shards = [
+            _TaskShard(index, self._interval)
+            for index in range(shards or TaskManager._default_shards)]
+
+        # Threads handling the task requests of the shards
+        self._thread = None
+
+    def _get_shard(self, resource_id):
+        return self._shards[hash(resource_id) % len(self._shards)]
+
+    def add(self, task):
+        task.id = uuid.uuid1()
+        self._get_shard(task.resource_id).add(task)
+        return task.id
+
+    def stop(self):
+        if self._thread is None:
+            return
+        for shard in self._shards:
+            shard.stop()
+        self._thread = None
+        LOG.info("TaskManager terminated")
+
+    def has_pending_task(self):
+        return any(shard.has_pending_task() for shard in self._shards)
+
+    def show_pending_tasks(self):
+        for shard in self._shards:
+            shard.show_pending_tasks()
+
+    def count(self):
+        return sum(shard.count() for shard in self._shards)
+
+    def stats(self):
+        """Return the queue depth and timing statistics of each shard"""
+        return [shard.stats() for shard in self._shards]
+
+    def start(self, interval=None):
         if self._thread is not None:
             return self
 
         if interval is None or interval == 0:
             interval = self._interval
 
-        self._stopped = False
-        self._thread = greenthread.spawn(_inner)
-        self._monitor = loopingcall.FixedIntervalLoopingCall(
-            _loopingcall_callback)
-        self._monitor.start(interval / 1000.0,
-                            interval / 1000.0)
-        # To allow the created thread start running
+        for shard in self._shards:
+            shard.start(interval)
+        self._thread = [shard._thread for shard in self._shards]
+        # To allow the created threads start running
         greenthread.sleep(0)
 
         return self
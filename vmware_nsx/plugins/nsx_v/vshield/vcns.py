@@ -12,9 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import re
 import time
 import xml.etree.ElementTree as et
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -89,6 +92,36 @@ ROUTING_CONFIG = "routing/config"
 BGP_ROUTING_CONFIG = "routing/config/bgp"
 ELAPSED_TIME_THRESHOLD = 30
 MAX_EDGE_DEPLOY_TIMEOUT = 1200
+MAX_EDGE_PAGE_FETCHES = 5
+
+# Timing of a backend call. The status is None if the call succeeded, as
+# the API client reports the HTTP status of failed calls only.
+VcnsCallRecord = collections.namedtuple(
+    'VcnsCallRecord', ['method', 'uri', 'status', 'bytes', 'seconds'])
+
+_URI_ID_SEGMENT = re.compile(r'^(\d+|\w+-\d+|[0-9a-fA-F-]{36})$')
+
+
+def _get_uri_template(uri):
+    """Replace the object identifiers in a backend URI with a placeholder
+
+    This allows grouping the records of the calls for the same resource type.
+    """
+    path = uri.split('?', 1)[0]
+    return '/'.join('{id}' if _URI_ID_SEGMENT.match(segment) else segment
+                    for segment in path.split('/'))
+
+
+def _format_body_for_log(body, mask=False):
+    if not isinstance(body, six.string_types):
+        body = jsonutils.dumps(body)
+    if mask:
+        body = strutils.mask_password(body)
+    max_length = cfg.CONF.nsxv.api_log_max_body_length
+    if max_length and len(body) > max_length:
+        body = '%s... (%d more characters)' % (body[:max_length],
+                                              len(body) - max_length)
+    return body
 
 
 def retry_upon_exception_exclude_error_codes(
@@ -122,6 +155,22 @@ class Vcns(object):
         self._nsx_version = None
         self._normalized_scoping_objects = None
         self._normalized_global_objects = None
+        self._call_observers = []
+
+    def add_call_observer(self, observer):
+        """Register a callable receiving a VcnsCallRecord for each call"""
+        self._call_observers.append(observer)
+
+    def remove_call_observer(self, observer):
+        self._call_observers.remove(observer)
+
+    def _notify_call_observers(self, record):
+        for observer in self._call_observers:
+            try:
+                observer(record)
+            except Exception as e:
+                LOG.warning("Failed to report NSX call record %(rec)s: "
+                            "%(err)s", {'rec': record, 'err': e})
 
     @retry_upon_exception(exceptions.ServiceConflict)
     def _client_request(self, client, method, uri,
@@ -130,11 +179,13 @@ class Vcns(object):
                       timeout=timeout)
 
     def do_request(self, method, uri, params=None, format='json', **kwargs):
-        msg = ("VcnsApiHelper('%(method)s', '%(uri)s', '%(body)s')" %
-               {'method': method,
-                'uri': uri,
-                'body': jsonutils.dumps(params)})
-        LOG.debug(strutils.mask_password(msg))
+        # Rendering the bodies might be expensive, so do it only if they
+        # are going to be logged
+        debug = LOG.isEnabledFor(logging.DEBUG)
+        if debug:
+            LOG.debug("VcnsApiHelper('%(method)s', '%(uri)s', '%(body)s')",
+                      {'method': method, 'uri': uri,
+                       'body': _format_body_for_log(params, mask=True)})
 
         headers = kwargs.get('headers')
         encodeParams = kwargs.get('encode', True)
@@ -144,22 +195,38 @@ class Vcns(object):
             _client = self.xmlapi_client.request
 
         timeout = kwargs.get('timeout')
+        status = None
+        content = None
         ts = time.time()
-        header, content = self._client_request(_client, method, uri, params,
-                                               headers, encodeParams,
-                                               timeout=timeout)
-        te = time.time()
-        elapsed_time = te - ts
-
-        LOG.debug('VcnsApiHelper for %(method)s %(uri)s took %(seconds)2.4f. '
-                  'reply: header=%(header)s content=%(content)s',
-                  {'method': method, 'uri': uri,
-                   'header': header, 'content': content,
-                   'seconds': elapsed_time})
-        if elapsed_time > ELAPSED_TIME_THRESHOLD:
+        try:
+            header, content = self._client_request(_client, method, uri,
+                                                   params, headers,
+                                                   encodeParams,
+                                                   timeout=timeout)
+        except exceptions.VcnsApiException as e:
+            status = e.status
+            content = e.response
+            raise
+        finally:
+            record = VcnsCallRecord(method=method,
+                                    uri=_get_uri_template(uri),
+                                    status=status,
+                                    bytes=len(content) if content else 0,
+                                    seconds=time.time() - ts)
+            self._notify_call_observers(record)
+
+        if debug:
+            LOG.debug('VcnsApiHelper for %(method)s %(uri)s took '
+                      '%(seconds)2.4f. reply: header=%(header)s '
+                      'content=%(content)s',
+                      {'method': method, 'uri': uri,
+                       'header': header,
+                       'content': _format_body_for_log(content),
+                       'seconds': record.seconds})
+        if record.seconds > ELAPSED_TIME_THRESHOLD:
             LOG.warning('Vcns call for %(method)s %(uri)s took %(seconds)2.4f',
                         {'method': method, 'uri': uri,
-                         'seconds': elapsed_time})
+                         'seconds': record.seconds})
 
         if content == '':
             return header, {}
@@ -255,6 +322,9 @@ class Vcns(object):
         uri = '%s?startIndex=%d' % (URI_PREFIX, startindex)
         return self.do_request(HTTP_GET, uri, decode=True)
 
+    def _get_edges_page(self, startindex):
+        return self._get_edges(startindex)[1]['edgePage']['data']
+
     def get_edges(self):
         edges = []
         h, d = self._get_edges()
@@ -264,11 +334,13 @@ class Vcns(object):
         count = int(paging_info['totalCount'])
         LOG.debug("There are total %s edges and page size is %s",
                   count, page_size)
-        pages = count / page_size + 1
-        for i in range(1, pages):
-            start_index = page_size * i
-            h, d = self._get_edges(start_index)
-            edges.extend(d['edgePage']['data'])
+        # The first page tells the number of pages, so the others can be
+        # fetched concurrently
+        start_indexes = range(page_size, count, page_size)
+        if start_indexes:
+            pool = eventlet.GreenPool(MAX_EDGE_PAGE_FETCHES)
+            for page in pool.imap(self._get_edges_page, start_indexes):
+                edges.extend(page)
         return edges
 
     def get_edge_syslog(self, edge_id):
@@ -932,16 +1004,17 @@ class Vcns(object):
         return self._scopingobjects_lookup(NETWORK_TYPES, object_id,
                                            name=name, use_cache=during_init)
 
-    def validate_vdn_scope(self, object_id):
+    def get_vdn_scope_list(self):
         uri = '%s/scopes' % VDN_PREFIX
         h, scope_list = self.do_request(HTTP_GET, uri, decode=False,
                                         format='xml')
         root = utils.normalize_xml(scope_list)
-        for obj_id in root.iter('objectId'):
-            if obj_id.text == object_id:
-                return True
+        return [obj_id.text for obj_id in root.iter('objectId')]
 
-        return False
+    def validate_vdn_scope(self, object_id, scope_list=None):
+        if scope_list is None:
+            scope_list = self.get_vdn_scope_list()
+        return object_id in scope_list
 
     def get_dvs_list(self):
         uri = '%s/switches' % VDN_PREFIX
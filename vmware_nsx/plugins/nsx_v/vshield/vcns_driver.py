@@ -20,6 +20,7 @@ from oslo_log import log as logging
 from vmware_nsx.plugins.nsx_v.vshield import edge_appliance_driver
 from vmware_nsx.plugins.nsx_v.vshield import edge_dynamic_routing_driver
 from vmware_nsx.plugins.nsx_v.vshield import edge_firewall_driver
+from vmware_nsx.plugins.nsx_v.vshield import edge_inventory
 from vmware_nsx.plugins.nsx_v.vshield.tasks import tasks
 from vmware_nsx.plugins.nsx_v.vshield import vcns
 from vmware_nsx.services.lbaas.nsx_v.v2 import (
@@ -47,6 +48,8 @@ class VcnsDriver(edge_appliance_driver.EdgeApplianceDriver,
         self._task_manager = None
         self.vcns = vcns.Vcns(self.vcns_uri, self.vcns_user, self.vcns_passwd,
                               self.ca_file, self.insecure)
+        self.edge_inventory = edge_inventory.EdgeInventory(
+            self.vcns, cfg.CONF.nsxv.edge_inventory_cache_ttl)
 
     @property
     def task_manager(self):
@@ -55,7 +58,8 @@ class VcnsDriver(edge_appliance_driver.EdgeApplianceDriver,
             LOG.debug("Creating task manager")
             self._pid = os.getpid()
             interval = cfg.CONF.nsxv.task_status_check_interval
-            self._task_manager = tasks.TaskManager(interval)
+            self._task_manager = tasks.TaskManager(
+                interval, shards=cfg.CONF.nsxv.task_manager_shards)
             LOG.debug("Starting task manager")
             self._task_manager.start()
         return self._task_manager
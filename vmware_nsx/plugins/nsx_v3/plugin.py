@@ -1273,6 +1273,26 @@ class NsxV3Plugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
         else:
             return mappings[0]
 
+    def _get_networks_nsx_ids(self, context, net_ids):
+        """Return a dictionary of network id to its nsx id
+
+        The DB mappings of all the networks are fetched in a single query,
+        with the same fallback as _get_network_nsx_id.
+        """
+        if not net_ids:
+            return {}
+        mappings = nsx_db.get_nsx_switch_ids_by_net_ids(
+            context.session, list(net_ids))
+        nsx_ids = {}
+        for net_id in net_ids:
+            if mappings.get(net_id):
+                nsx_ids[net_id] = mappings[net_id][0]
+            else:
+                LOG.debug("Unable to find NSX mappings for neutron "
+                          "network %s.", net_id)
+                nsx_ids[net_id] = net_id
+        return nsx_ids
+
     def update_network(self, context, id, network):
         original_net = super(NsxV3Plugin, self).get_network(context, id)
         net_data = network['network']
@@ -3121,6 +3141,17 @@ class NsxV3Plugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
             port[qos_consts.QOS_POLICY_ID] = qos_com_utils.get_port_policy_id(
                 context, port['id'])
 
+    def _extend_get_ports_dict_qos_and_binding(self, context, ports):
+        """Bulk version of _extend_get_port_dict_qos_and_binding"""
+        self._extend_nsx_ports_dict_binding(context, ports)
+
+        # add the qos policy ids from the DB
+        port_ids = [port['id'] for port in ports if 'id' in port]
+        policy_ids = qos_com_utils.get_ports_policy_ids(context, port_ids)
+        for port in ports:
+            if 'id' in port:
+                port[qos_consts.QOS_POLICY_ID] = policy_ids.get(port['id'])
+
     def get_port(self, context, id, fields=None):
         port = super(NsxV3Plugin, self).get_port(context, id, fields=None)
         if 'id' in port:
@@ -3141,18 +3172,21 @@ class NsxV3Plugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
                     context, filters, fields, sorts,
                     limit, marker, page_reverse))
             # Add port extensions
+            port_models = self._get_ports_models(
+                context, [port['id'] for port in ports if 'id' in port])
+            self._extension_manager.prepare_ports_dicts(context, ports)
             for port in ports[:]:
                 if 'id' in port:
-                    try:
-                        port_model = self._get_port(context, port['id'])
-                        resource_extend.apply_funcs('ports', port, port_model)
-                    except n_exc.PortNotFound:
+                    port_model = port_models.get(port['id'])
+                    if port_model is None:
                         # Port might have been deleted by now
                         LOG.debug("Port %s was deleted during the get_ports "
                                   "process, and is being skipped", port['id'])
                         ports.remove(port)
                         continue
-                self._extend_get_port_dict_qos_and_binding(context, port)
+                    resource_extend.apply_funcs('ports', port, port_model)
+            self._extend_get_ports_dict_qos_and_binding(context, ports)
+            for port in ports:
                 self._remove_provider_security_groups_from_list(port)
         return (ports if not fields else
                 [db_utils.resource_fields(port, fields) for port in ports])
@@ -3651,6 +3685,42 @@ class NsxV3Plugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
             destination_ports=['2535'])
         return [service1, service2]
 
+    def _get_relay_fw_rules(self, relay_servers, port_target):
+        # translate the relay server ips to the firewall format
+        relay_target = []
+        if self.fwaas_callbacks:
+            relay_target = (self.fwaas_callbacks.fwaas_driver.
+                translate_addresses_to_target(set(relay_servers)))
+
+        dhcp_services = self._get_port_relay_services()
+
+        return [
+            # ingress rule
+            {'display_name': "DHCP Relay ingress traffic",
+             'action': nsxlib_consts.FW_ACTION_ALLOW,
+             'sources': relay_target,
+             'destinations': port_target,
+             'services': dhcp_services,
+             'direction': 'IN'},
+            # egress rule
+            {'display_name': "DHCP Relay egress traffic",
+             'action': nsxlib_consts.FW_ACTION_ALLOW,
+             'destinations': relay_target,
+             'sources': port_target,
+             'services': dhcp_services,
+             'direction': 'OUT'}]
+
+    def _get_vpn_fw_rules(self, context, router_id):
+        vpn_plugin = directory.get_plugin(plugin_const.VPN)
+        if vpn_plugin:
+            vpn_driver = vpn_plugin.drivers[vpn_plugin.default_provider]
+            vpn_rules = (
+                vpn_driver._generate_ipsecvpn_firewall_rules(
+                    self.plugin_type(), context, router_id=router_id))
+            if vpn_rules:
+                return vpn_rules
+        return []
+
     def get_extra_fw_rules(self, context, router_id, port_id=None):
         """Return firewall rules that should be added to the router firewall
 
@@ -3691,43 +3761,42 @@ class NsxV3Plugin(agentschedulers_db.AZDhcpAgentSchedulerDbMixin,
                                 'target_id': nsx_ls_id}]
             else:
                 port_target = None
-            # translate the relay server ips to the firewall format
-            relay_target = []
-            if self.fwaas_callbacks:
-                relay_target = (self.fwaas_callbacks.fwaas_driver.
-                    translate_addresses_to_target(set(relay_servers)))
-
-            dhcp_services = self._get_port_relay_services()
-
-            # ingress rule
-            extra_rules.append({
-                'display_name': "DHCP Relay ingress traffic",
-                'action': nsxlib_consts.FW_ACTION_ALLOW,
-                'sources': relay_target,
-                'destinations': port_target,
-                'services': dhcp_services,
-                'direction': 'IN'})
-            # egress rule
-            extra_rules.append({
-                'display_name': "DHCP Relay egress traffic",
-                'action': nsxlib_consts.FW_ACTION_ALLOW,
-                'destinations': relay_target,
-                'sources': port_target,
-                'services': dhcp_services,
-                'direction': 'OUT'})
+            extra_rules.extend(self._get_relay_fw_rules(relay_servers,
+                                                        port_target))
 
         # VPN rules:
-        vpn_plugin = directory.get_plugin(plugin_const.VPN)
-        if vpn_plugin:
-            vpn_driver = vpn_plugin.drivers[vpn_plugin.default_provider]
-            vpn_rules = (
-                vpn_driver._generate_ipsecvpn_firewall_rules(
-                    self.plugin_type(), context, router_id=router_id))
-            if vpn_rules:
-                extra_rules.extend(vpn_rules)
+        extra_rules.extend(self._get_vpn_fw_rules(context, router_id))
 
         return extra_rules
 
+    def get_ports_extra_fw_rules(self, context, router_id, ports):
+        """Return a dictionary of router interface port id to its extra rules
+
+        This is the bulk version of get_extra_fw_rules with a port_id, for
+        the given router interface ports. The nsx ids of the ports are
+        fetched in a single query, and the VPN rules of the router are
+        generated once.
+        """
+        elv_ctx = context.elevated()
+        nsx_ids = nsx_db.get_nsx_switch_and_port_ids(
+            context.session, [port['id'] for port in ports])
+        vpn_rules = self._get_vpn_fw_rules(context, router_id)
+        ports_rules = {}
+        for port in ports:
+            extra_rules = []
+            relay_servers = self._get_port_relay_servers(
+                elv_ctx, port['id'], network_id=port.get('network_id'))
+            if relay_servers:
+                nsx_ls_id, _nsx_port_id = nsx_ids.get(port['id'],
+                                                      (None, None))
+                port_target = [{'target_type': 'LogicalSwitch',
+                                'target_id': nsx_ls_id}]
+                extra_rules.extend(self._get_relay_fw_rules(relay_servers,
+                                                            port_target))
+            extra_rules.extend(vpn_rules)
+            ports_rules[port['id']] = extra_rules
+        return ports_rules
+
     def _get_ports_and_address_groups(self, context, router_id, network_id,
                                       exclude_sub_ids=None):
         exclude_sub_ids = [] if not exclude_sub_ids else exclude_sub_ids
@@ -13,8 +13,10 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import eventlet
 import netaddr
 
+from neutron.db.models import l3 as l3_db_models
 from neutron_dynamic_routing.extensions import bgp as bgp_ext
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -36,6 +38,9 @@ from vmware_nsx.plugins.nsx_v.vshield.common import exceptions as vcns_exc
 
 LOG = logging.getLogger(__name__)
 
+# Maximal number of edges whose BGP configuration is updated concurrently
+MAX_CONCURRENT_EDGE_UPDATES = 10
+
 
 def ip_prefix(name, ip_address):
     return {'ipPrefix': {'name': name, 'ipAddress': ip_address}}
@@ -120,6 +125,87 @@ class NSXvBgpDriver(object):
             advertise_static_routes = True
         return edge_binding['edge_id'], advertise_static_routes
 
+    def _get_plr_ids_by_tlr_ids(self, context, tlr_lswitches):
+        """Return the PLR of each distributed router
+
+        tlr_lswitches is a dictionary of distributed router id to its
+        lswitch id, as used by the edge manager get_plr_by_tlr_id.
+        """
+        vnic_bindings = nsxv_db.get_edge_vnic_bindings_by_int_lswitches(
+            context.session, list(set(tlr_lswitches.values())))
+        if not vnic_bindings:
+            return {}
+        # The first router bound to each edge of those interfaces
+        edge_routers = {}
+        for binding in nsxv_db.get_nsxv_router_bindings_by_edges(
+                context.session,
+                list(set(b.edge_id for b in vnic_bindings))):
+            edge_routers.setdefault(binding['edge_id'], binding['router_id'])
+        lswitch_bindings = {}
+        for vnic_binding in vnic_bindings:
+            lswitch_bindings.setdefault(vnic_binding.network_id,
+                                        []).append(vnic_binding)
+        plr_ids = {}
+        for tlr_id, lswitch_id in tlr_lswitches.items():
+            for vnic_binding in lswitch_bindings.get(lswitch_id, []):
+                plr_router_id = edge_routers.get(vnic_binding.edge_id)
+                if plr_router_id and plr_router_id != tlr_id:
+                    plr_ids[tlr_id] = plr_router_id
+                    break
+        return plr_ids
+
+    def _get_routers_edge_info(self, context, router_ids):
+        """Return the edge info of each router, like _get_router_edge_info
+
+        The edge bindings of all the routers, and of the PLRs of the
+        distributed routers, are fetched with a few queries.
+        Routers which are not attached on any edge are not included.
+        """
+        edges_info = {}
+        if not router_ids:
+            return edges_info
+        bindings = dict((binding['router_id'], binding) for binding in
+                        nsxv_db.get_nsxv_router_bindings_by_ids(
+                            context.session, router_ids))
+        tlr_lswitches = {}
+        for router_id in router_ids:
+            binding = bindings.get(router_id)
+            if not binding:
+                continue
+            if binding['edge_type'] == nsxv_constants.SERVICE_EDGE:
+                edges_info[router_id] = (binding['edge_id'], False)
+            elif binding['lswitch_id']:
+                tlr_lswitches[router_id] = binding['lswitch_id']
+
+        if tlr_lswitches:
+            # PLR for distributed router, advertise static routes.
+            plr_ids = self._get_plr_ids_by_tlr_ids(context, tlr_lswitches)
+            plr_bindings = dict((binding['router_id'], binding) for binding in
+                                nsxv_db.get_nsxv_router_bindings_by_ids(
+                                    context.session,
+                                    list(set(plr_ids.values()))))
+            for router_id, plr_id in plr_ids.items():
+                if plr_id in plr_bindings:
+                    edges_info[router_id] = (
+                        plr_bindings[plr_id]['edge_id'], True)
+        return edges_info
+
+    def _run_on_edges(self, func, edge_ids):
+        """Call func(edge_id) for each edge, concurrently
+
+        Return a dictionary of edge id to the VcnsApiException raised on
+        this edge, or None on success.
+        """
+        def _run(edge_id):
+            try:
+                func(edge_id)
+            except vcns_exc.VcnsApiException as e:
+                return edge_id, e
+            return edge_id, None
+
+        pool = eventlet.GreenPool(MAX_CONCURRENT_EDGE_UPDATES)
+        return dict(pool.imap(_run, edge_ids))
+
     def get_advertised_routes(self, context, bgp_speaker_id):
         routes = []
         bgp_speaker = self._plugin.get_bgp_speaker(context, bgp_speaker_id)
@@ -150,12 +236,21 @@ class NSXvBgpDriver(object):
         binding_info = {bgp_binding['edge_id']: bgp_binding['bgp_identifier']
                         for bgp_binding in bgp_bindings}
 
+        router_ids = list(set(port['device_id'] for port in gateway_ports))
+        if not router_ids:
+            return {}
+        routers_snat = dict(context.session.query(
+            l3_db_models.Router.id, l3_db_models.Router.enable_snat).filter(
+            l3_db_models.Router.id.in_(router_ids)).all())
+        edges_info = self._get_routers_edge_info(context, router_ids)
+
         edge_router_dict = {}
         for port in gateway_ports:
             router_id = port['device_id']
-            router = self._core_plugin._get_router(context, router_id)
-            edge_id, advertise_static_routes = (
-                self._get_router_edge_info(context, router_id))
+            if router_id not in routers_snat:
+                continue
+            edge_id, advertise_static_routes = edges_info.get(
+                router_id, (None, None))
             if not edge_id:
                 # Shared router is not attached on any edge
                 continue
@@ -168,7 +263,7 @@ class NSXvBgpDriver(object):
                                              bgp_identifier,
                                              'advertise_static_routes':
                                              advertise_static_routes}
-            if not router.enable_snat:
+            if not routers_snat[router_id]:
                 edge_router_dict[edge_id]['no_snat_routers'].append(router_id)
         return edge_router_dict
 
@@ -185,21 +280,41 @@ class NSXvBgpDriver(object):
     def _query_tenant_subnets(self, context, router_ids):
         # Query subnets attached to all of routers attached to same edge
         subnets = []
+        if not router_ids:
+            return subnets
+        filters = {'device_id': router_ids,
+                   'device_owner': [n_const.DEVICE_OWNER_ROUTER_INTF]}
+        int_ports = self._core_plugin.get_ports(
+            context, filters=filters, fields=['device_id', 'fixed_ips'])
+        router_ports = {}
+        for p in int_ports:
+            router_ports.setdefault(p['device_id'], []).append(p)
+        subnet_ids = [p['fixed_ips'][0]['subnet_id'] for p in int_ports]
+        subnet_cidrs = {}
+        if subnet_ids:
+            subnet_cidrs = dict(
+                (subnet['id'], subnet['cidr']) for subnet in
+                self._core_plugin.get_subnets(
+                    context, filters={'id': subnet_ids},
+                    fields=['id', 'cidr']))
+        bindings = dict((binding['router_id'], binding) for binding in
+                        nsxv_db.get_nsxv_router_bindings_by_ids(
+                            context.session, list(router_ports)))
         for router_id in router_ids:
-            filters = {'device_id': [router_id],
-                       'device_owner': [n_const.DEVICE_OWNER_ROUTER_INTF]}
-            int_ports = self._core_plugin.get_ports(context,
-                                                    filters=filters,
-                                                    fields=['fixed_ips'])
             # We need to skip metadata subnets
-            md_proxy = self._get_md_proxy_for_router(context, router_id)
-            for p in int_ports:
+            md_proxy = None
+            binding = bindings.get(router_id)
+            if binding:
+                md_proxy = self._core_plugin.get_metadata_proxy_handler(
+                    binding['availability_zone'])
+            for p in router_ports.get(router_id, []):
                 subnet_id = p['fixed_ips'][0]['subnet_id']
                 if md_proxy and md_proxy.is_md_subnet(subnet_id):
                     continue
-                subnet = self._core_plugin.get_subnet(context, subnet_id)
+                if subnet_id not in subnet_cidrs:
+                    continue
                 subnets.append({'id': subnet_id,
-                                'cidr': subnet['cidr']})
+                                'cidr': subnet_cidrs[subnet_id]})
         LOG.debug("Got related subnets %s", subnets)
         return subnets
 
@@ -244,11 +359,12 @@ class NSXvBgpDriver(object):
         edge_ids = [bgp_binding['edge_id'] for bgp_binding in bgp_bindings]
         action = 'Enabling' if new_enabled_state else 'Disabling'
         LOG.info("%s BGP route redistribution on edges: %s.", action, edge_ids)
+        errors = self._run_on_edges(
+            lambda edge_id: self._nsxv.update_routing_redistribution(
+                edge_id, new_enabled_state),
+            edge_ids)
         for edge_id in edge_ids:
-            try:
-                self._nsxv.update_routing_redistribution(edge_id,
-                                                         new_enabled_state)
-            except vcns_exc.VcnsApiException:
+            if errors[edge_id]:
                 LOG.warning("Failed to update BGP on edge '%s'.", edge_id)
 
     def delete_bgp_speaker(self, context, bgp_speaker_id):
@@ -310,16 +426,17 @@ class NSXvBgpDriver(object):
                     continue
                 bgp_bindings = nsxv_db.get_nsxv_bgp_speaker_bindings(
                     context.session, bgp_speaker_id)
-                for binding in bgp_bindings:
-                    try:
-                        # Neighbours are identified by their ip address
-                        self._nsxv.update_bgp_neighbours(binding['edge_id'],
-                                                         [neighbour],
-                                                         [neighbour])
-                    except vcns_exc.VcnsApiException:
+                edge_ids = [binding['edge_id'] for binding in bgp_bindings]
+                # Neighbours are identified by their ip address
+                errors = self._run_on_edges(
+                    lambda edge_id: self._nsxv.update_bgp_neighbours(
+                        edge_id, [neighbour], [neighbour]),
+                    edge_ids)
+                for edge_id in edge_ids:
+                    if errors[edge_id]:
                         LOG.error("Failed to update BGP neighbor '%s' on "
                                   "edge '%s'", old_bgp_peer['peer_ip'],
-                                  binding['edge_id'])
+                                  edge_id)
 
     def _validate_bgp_peer(self, context, bgp_speaker_id, new_peer_id):
         new_peer = self._plugin._get_bgp_peer(context, new_peer_id)
@@ -341,10 +458,11 @@ class NSXvBgpDriver(object):
         # list of tenant edge routers to be removed as bgp-neighbours to this
         # peer if it's associated with specific ESG.
         neighbours = []
+        errors = self._run_on_edges(
+            lambda edge_id: self._nsxv.add_bgp_neighbours(edge_id, [nbr]),
+            [binding['edge_id'] for binding in bgp_bindings])
         for binding in bgp_bindings:
-            try:
-                self._nsxv.add_bgp_neighbours(binding['edge_id'], [nbr])
-            except vcns_exc.VcnsApiException:
+            if errors[binding['edge_id']]:
                 LOG.error("Failed to add BGP neighbour on '%s'",
                           binding['edge_id'])
             else:
@@ -374,10 +492,11 @@ class NSXvBgpDriver(object):
         # list of tenant edge routers to be removed as bgp-neighbours to this
         # peer if it's associated with specific ESG.
         neighbours = []
+        errors = self._run_on_edges(
+            lambda edge_id: self._nsxv.remove_bgp_neighbours(edge_id, [nbr]),
+            [binding['edge_id'] for binding in bgp_bindings])
         for binding in bgp_bindings:
-            try:
-                self._nsxv.remove_bgp_neighbours(binding['edge_id'], [nbr])
-            except vcns_exc.VcnsApiException:
+            if errors[binding['edge_id']]:
                 LOG.error("Failed to remove BGP neighbour on '%s'",
                           binding['edge_id'])
             else:
@@ -439,23 +558,30 @@ class NSXvBgpDriver(object):
         bgp_peers = self._plugin.get_bgp_peers_by_bgp_speaker(
             context, bgp_speaker_id)
         local_as = speaker['local_as']
-        peers = []
+        edges_subnets = {}
         for edge_id, edge_router_config in edge_router_dict.items():
             router_ids = edge_router_config['no_snat_routers']
-            advertise_static_routes = (
-                edge_router_config['advertise_static_routes'])
-            subnets = self._query_tenant_subnets(context, router_ids)
-            # router_id here is in IP address format and is required for
-            # the BGP configuration.
+            edges_subnets[edge_id] = self._query_tenant_subnets(context,
+                                                                router_ids)
+
+        # router_id here is in IP address format and is required for
+        # the BGP configuration.
+        errors = self._run_on_edges(
+            lambda edge_id: self._configure_bgp_on_edge(
+                edge_id, speaker, bgp_peers,
+                edge_router_dict[edge_id]['bgp_identifier'],
+                edges_subnets[edge_id],
+                edge_router_dict[edge_id]['advertise_static_routes']),
+            list(edge_router_dict))
+        peers = []
+        for edge_id, edge_router_config in edge_router_dict.items():
             bgp_identifier = edge_router_config['bgp_identifier']
-            try:
-                self._start_bgp_on_edge(context, edge_id, speaker,
-                                        bgp_peers, bgp_identifier, subnets,
-                                        advertise_static_routes)
-            except vcns_exc.VcnsApiException:
+            if errors[edge_id]:
                 LOG.error("Failed to configure BGP speaker %s on edge '%s'.",
                           bgp_speaker_id, edge_id)
             else:
+                nsxv_db.add_nsxv_bgp_speaker_binding(
+                    context.session, edge_id, bgp_speaker_id, bgp_identifier)
                 peers.append(bgp_identifier)
 
         for edge_gw, password in [(peer['esg_id'], peer['password'])
@@ -470,6 +596,15 @@ class NSXvBgpDriver(object):
 
     def _start_bgp_on_edge(self, context, edge_id, speaker, bgp_peers,
                            bgp_identifier, subnets, advertise_static_routes):
+        self._configure_bgp_on_edge(edge_id, speaker, bgp_peers,
+                                    bgp_identifier, subnets,
+                                    advertise_static_routes)
+        nsxv_db.add_nsxv_bgp_speaker_binding(context.session, edge_id,
+                                             speaker['id'], bgp_identifier)
+
+    def _configure_bgp_on_edge(self, edge_id, speaker, bgp_peers,
+                               bgp_identifier, subnets,
+                               advertise_static_routes):
         enabled_state = speaker['advertise_tenant_networks']
         local_as = speaker['local_as']
         prefixes, redis_rules = self._get_prefixes_and_redistribution_rules(
@@ -486,19 +621,17 @@ class NSXvBgpDriver(object):
             with excutils.save_and_reraise_exception():
                 LOG.error("Failed to configure BGP speaker '%s' on edge '%s'.",
                           speaker['id'], edge_id)
-        else:
-            nsxv_db.add_nsxv_bgp_speaker_binding(context.session, edge_id,
-                                                 speaker['id'], bgp_identifier)
 
     def _stop_bgp_on_edges(self, context, bgp_bindings, speaker_id):
         peers_to_remove = []
         speaker = self._plugin.get_bgp_speaker(context, speaker_id)
         local_as = speaker['local_as']
+        errors = self._run_on_edges(
+            self._nsxv.delete_bgp_speaker_config,
+            [bgp_binding['edge_id'] for bgp_binding in bgp_bindings])
         for bgp_binding in bgp_bindings:
             edge_id = bgp_binding['edge_id']
-            try:
-                self._nsxv.delete_bgp_speaker_config(edge_id)
-            except vcns_exc.VcnsApiException:
+            if errors[edge_id]:
                 LOG.error("Failed to delete BGP speaker '%s' config on edge "
                           "'%s'.", speaker_id, edge_id)
             else:
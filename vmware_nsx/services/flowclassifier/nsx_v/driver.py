@@ -35,6 +35,7 @@ from vmware_nsx.common import locking
 from vmware_nsx.common import nsxv_constants
 from vmware_nsx.plugins.nsx_v.vshield import vcns as nsxv_api
 from vmware_nsx.plugins.nsx_v.vshield import vcns_driver
+from vmware_nsx.services.flowclassifier.nsx_v import redirect_section
 from vmware_nsx.services.flowclassifier.nsx_v import utils as fc_utils
 
 LOG = logging.getLogger(__name__)
@@ -52,6 +53,9 @@ class NsxvFlowClassifierDriver(fc_driver.FlowClassifierDriverBase):
         self.init_profile_id()
         self.init_security_group()
         self.init_security_group_in_profile()
+        self._redirect_section = redirect_section.RedirectSectionManager(
+            self._get_redirect_section, self._update_redirect_section,
+            self._loc_fw_section)
 
         # register an event to the end of the init to handle the first upgrade
         if self._is_new_security_group:
@@ -188,12 +192,21 @@ class NsxvFlowClassifierDriver(fc_driver.FlowClassifierDriverBase):
             xml_section = section_resp[1]
             return et.fromstring(xml_section)
 
-    def update_redirect_section_in_backed(self, section):
+    def update_redirect_section_in_backed(self, section, headers=None):
+        # With the headers of the section, the ETag of the section is not
+        # read again from the backend
         section_uri = self.get_redirect_fw_section_uri()
-        self._nsxv.vcns.update_section(
+        return self._nsxv.vcns.update_section(
             section_uri,
             et.tostring(section, encoding="us-ascii"),
-            None)
+            headers)
+
+    def _get_redirect_section(self):
+        return self._nsxv.vcns.get_section(
+            self.get_redirect_fw_section_uri())
+
+    def _update_redirect_section(self, section, headers):
+        return self.update_redirect_section_in_backed(section, headers)
 
     def _rule_ip_type(self, flow_classifier):
         if flow_classifier.get('ethertype') == 'IPv6':
@@ -284,11 +297,13 @@ class NsxvFlowClassifierDriver(fc_driver.FlowClassifierDriverBase):
         """Create a redirect rule at the backend
         """
         flow_classifier = context.current
-        with self._loc_fw_section():
-            section = self.get_redirect_fw_section_from_backend()
+
+        def add_rule(section):
             new_rule = et.SubElement(section, 'rule')
             self.init_redirect_fw_rule(new_rule, flow_classifier)
-            self.update_redirect_section_in_backed(section)
+            return True
+
+        self._redirect_section.apply(add_rule)
 
     @log_helpers.log_method_call
     def update_flow_classifier(self, context):
@@ -296,8 +311,7 @@ class NsxvFlowClassifierDriver(fc_driver.FlowClassifierDriverBase):
         """
         flow_classifier = context.current
 
-        with self._loc_fw_section():
-            section = self.get_redirect_fw_section_from_backend()
+        def update_rule(section):
             redirect_rule = None
             for rule in section.iter('rule'):
                 if self._is_the_same_rule(rule, flow_classifier['id']):
@@ -308,36 +322,35 @@ class NsxvFlowClassifierDriver(fc_driver.FlowClassifierDriverBase):
                 msg = _("Failed to find redirect rule %s "
                         "on backed") % flow_classifier['id']
                 raise exc.FlowClassifierException(message=msg)
-            else:
-                # The flowclassifier plugin currently supports updating only
-                # name or description
-                name = redirect_rule.find('name')
-                name.text = self._rule_name(flow_classifier)
-                notes = redirect_rule.find('notes')
-                notes.text = flow_classifier.get('description') or ''
-                self.update_redirect_section_in_backed(section)
+            # The flowclassifier plugin currently supports updating only
+            # name or description
+            name = redirect_rule.find('name')
+            name.text = self._rule_name(flow_classifier)
+            notes = redirect_rule.find('notes')
+            notes.text = flow_classifier.get('description') or ''
+            return True
+
+        self._redirect_section.apply(update_rule)
 
     @log_helpers.log_method_call
     def delete_flow_classifier(self, context):
         """Delete the backend redirect rule
         """
         flow_classifier_id = context.current['id']
-        with self._loc_fw_section():
-            section = self.get_redirect_fw_section_from_backend()
-            redirect_rule = None
+
+        def delete_rule(section):
             for rule in section.iter('rule'):
                 if self._is_the_same_rule(rule, flow_classifier_id):
-                    redirect_rule = rule
-                    section.remove(redirect_rule)
-                    break
+                    section.remove(rule)
+                    return True
 
-            if redirect_rule is None:
-                LOG.error("Failed to delete redirect rule %s: "
-                          "Could not find rule on backed",
-                          flow_classifier_id)
-                # should not fail the deletion
-            else:
-                self.update_redirect_section_in_backed(section)
+            LOG.error("Failed to delete redirect rule %s: "
+                      "Could not find rule on backed",
+                      flow_classifier_id)
+            # should not fail the deletion
+            return False
+
+        self._redirect_section.apply(delete_rule)
 
     @log_helpers.log_method_call
     def create_flow_classifier_precommit(self, context):
@@ -0,0 +1,150 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import copy
+import threading
+import xml.etree.ElementTree as et
+
+import eventlet
+from eventlet import event
+from oslo_log import log as logging
+
+from vmware_nsx._i18n import _
+from vmware_nsx.plugins.nsx_v.vshield.common import exceptions as vcns_exc
+
+LOG = logging.getLogger(__name__)
+
+# Changes requested within this number of seconds are written to the backend
+# with a single section update
+BATCH_WINDOW = 0.05
+
+# The status of an update with an outdated section ETag
+PRECONDITION_FAILED = 412
+
+
+class RedirectSectionManager(object):
+    """Applies changes to the redirect firewall section in batches
+
+    A change is a function editing the parsed section in place, which
+    returns True if it modified the section. The changes requested within
+    BATCH_WINDOW seconds are applied together to a local copy of the
+    section, and written to the backend with a single update, using the
+    section ETag for optimistic concurrency. The local copy is replaced by
+    the section returned by the update, so the section is read from the
+    backend only the first time, and after a failed or conflicting update.
+
+    get_func returns the headers and body of the section from the backend.
+    update_func writes the parsed section to the backend, with the headers
+    of the local copy, and returns the headers and body of the response.
+    """
+
+    def __init__(self, get_func, update_func, lock_func):
+        self._get_func = get_func
+        self._update_func = update_func
+        self._lock_func = lock_func
+        self._headers = None
+        self._section = None
+        self._pending = []
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+
+    def apply(self, change):
+        """Apply a change to the section, and wait for it to be written
+
+        The exception raised by the change, or by the section update, is
+        raised to the caller.
+        """
+        done = event.Event()
+        with self._lock:
+            self._pending.append((change, done))
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                eventlet.spawn_after(BATCH_WINDOW, self._flush)
+        return done.wait()
+
+    def invalidate(self):
+        """Drop the local copy, so that the next change reads the section"""
+        self._headers = None
+        self._section = None
+
+    def _set_section(self, response):
+        if response and len(response) > 1 and response[1]:
+            self._headers = response[0]
+            self._section = et.fromstring(response[1])
+        else:
+            self.invalidate()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._flush_scheduled = False
+        changes = [change for change, done in pending]
+        try:
+            with self._lock_func():
+                results = self._write(changes)
+        except Exception as e:
+            results = [e] * len(pending)
+        for (change, done), result in zip(pending, results):
+            if isinstance(result, Exception):
+                done.send_exception(result)
+            else:
+                done.send(result)
+
+    def _apply_changes(self, section, changes):
+        results = []
+        modified = False
+        for change in changes:
+            try:
+                modified = change(section) or modified
+                results.append(None)
+            except Exception as e:
+                # Only the caller of this change fails
+                results.append(e)
+        return modified, results
+
+    def _write(self, changes):
+        retry = True
+        while True:
+            if self._section is None:
+                self._set_section(self._get_func())
+                if self._section is None:
+                    raise vcns_exc.VcnsGeneralException(
+                        _("Failed to read the redirect section"))
+            section = copy.deepcopy(self._section)
+            modified, results = self._apply_changes(section, changes)
+            if not modified:
+                return results
+            try:
+                response = self._update_func(section, self._headers)
+            except vcns_exc.VcnsApiException as e:
+                self.invalidate()
+                conflict = (isinstance(e, vcns_exc.ServiceConflict) or
+                            e.status == PRECONDITION_FAILED)
+                if conflict and retry:
+                    # The section was changed by another server since it was
+                    # read. Apply the changes again to the current section.
+                    LOG.debug("Redirect section was modified on the backend, "
+                              "retrying the update of %d changes",
+                              len(changes))
+                    retry = False
+                    continue
+                raise
+            except Exception:
+                self.invalidate()
+                raise
+            LOG.debug("Updated the redirect section with %d changes",
+                      len(changes))
+            self._set_section(response)
+            return results
@@ -168,16 +168,31 @@ class NsxFwaasCallbacksV2(firewall_l3_agent_v2.L3WithFWaaS):
         """
         if not self.fwaas_enabled:
             return False
+        return self.get_ports_fwgs(context, [port_id]).get(port_id)
 
-        ctx = context.elevated()
-        fwg_id = self._get_port_firewall_group_id(ctx, port_id)
-        if fwg_id is None:
-            # No FWaas Firewall was assigned to this port
-            return
+    def get_ports_fwgs(self, context, port_ids):
+        """Return a dictionary of port id to its firewall group
 
-        # check the state of this firewall group
-        fwg = self._get_fw_group_from_plugin(ctx, fwg_id)
-        if fwg is not None:
+        Only ports with a firewall group whose FWaaS rules should be added
+        to the backend router are included. The firewall groups are fetched
+        once for all the ports.
+        """
+        if not self.fwaas_enabled or not port_ids:
+            return {}
+
+        ctx = context.elevated()
+        fwg_ids = self._get_ports_firewall_group_ids(ctx, port_ids)
+        if not fwg_ids:
+            # No FWaas Firewall was assigned to those ports
+            return {}
+
+        fwgs = self._get_fw_groups_from_plugin(ctx)
+        ports_fwgs = {}
+        for port_id, fwg_id in fwg_ids.items():
+            fwg = fwgs.get(fwg_id)
+            if fwg is None:
+                continue
+            # check the state of this firewall group
             if fwg.get('status') in (nl_constants.ERROR,
                                      nl_constants.PENDING_DELETE):
                 # Do not add rules of firewalls with errors
@@ -185,21 +200,21 @@ class NsxFwaasCallbacksV2(firewall_l3_agent_v2.L3WithFWaaS):
                             "group %(fwg)s which is in %(status)s",
                             {'port': port_id, 'fwg': fwg_id,
                              'status': fwg['status']})
-                return
+                continue
+            ports_fwgs[port_id] = fwg
 
-        return fwg
+        return ports_fwgs
 
-    def _get_fw_group_from_plugin(self, context, fwg_id):
+    def _get_fw_groups_from_plugin(self, context):
         # NOTE(asarfaty): currently there is no api to get a specific firewall
         fwg_list = self.fwplugin_rpc.get_firewall_groups_for_project(context)
-        for fwg in fwg_list:
-            if fwg['id'] == fwg_id:
-                return fwg
+        return dict((fwg['id'], fwg) for fwg in fwg_list)
 
     # TODO(asarfaty): add this api to fwaas firewall_db_v2
-    def _get_port_firewall_group_id(self, context, port_id):
-        entry = context.session.query(
-            firewall_db_v2.FirewallGroupPortAssociation).filter_by(
-            port_id=port_id).first()
-        if entry:
-            return entry.firewall_group_id
+    def _get_ports_firewall_group_ids(self, context, port_ids):
+        entries = context.session.query(
+            firewall_db_v2.FirewallGroupPortAssociation).filter(
+            firewall_db_v2.FirewallGroupPortAssociation.port_id.in_(
+                port_ids)).all()
+        return dict((entry.port_id, entry.firewall_group_id)
+                    for entry in entries)
@@ -13,7 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
+
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 
 from neutron_lib import constants as nl_constants
 
@@ -22,9 +26,13 @@ from vmware_nsx.extensions import projectpluginmap
 from vmware_nsx.services.fwaas.common import fwaas_callbacks_v2 as \
     com_callbacks
 from vmware_nsx.services.fwaas.nsx_tv import edge_fwaas_driver_v2 as tv_driver
+from vmware_nsxlib.v3 import nsx_constants as nsxlib_consts
 
 LOG = logging.getLogger(__name__)
 
+# Above this number of rules to update, the whole section is rewritten
+MAX_RULES_TO_UPDATE = 20
+
 
 class Nsxv3FwaasCallbacksV2(com_callbacks.NsxFwaasCallbacksV2):
     """NSX-V3 RPC callbacks for Firewall As A Service - V2."""
@@ -38,6 +46,8 @@ class Nsxv3FwaasCallbacksV2(com_callbacks.NsxFwaasCallbacksV2):
                 self.internal_driver = self.fwaas_driver.get_T_driver()
             else:
                 self.internal_driver = self.fwaas_driver
+        # The rules last written to each router firewall section
+        self._sections_state = {}
 
     @property
     def plugin_type(self):
@@ -68,38 +78,177 @@ class Nsxv3FwaasCallbacksV2(com_callbacks.NsxFwaasCallbacksV2):
         return self.internal_driver.get_port_translated_rules(
             nsx_ls_id, fwg, plugin_rules)
 
+    def _get_ports_rules(self, context, router_id, router_interfaces):
+        """Return the FWaaS rules of each router interface
+
+        Only interfaces attached to a firewall group are included, in the
+        order of the router interfaces.
+        """
+        ports_rules = collections.OrderedDict()
+        ports_fwgs = self.get_ports_fwgs(
+            context, [port['id'] for port in router_interfaces])
+        # Check which ports have a firewall
+        fwg_ports = [port for port in router_interfaces
+                     if ports_fwgs.get(port['id'])]
+        if not fwg_ports:
+            return ports_rules
+        nsx_ids = nsx_db.get_nsx_switch_and_port_ids(
+            context.session, [port['id'] for port in fwg_ports])
+
+        # Add plugin additional allow rules
+        plugin_rules = self.core_plugin.get_ports_extra_fw_rules(
+            context, router_id, fwg_ports)
+
+        for port in fwg_ports:
+            nsx_ls_id, _nsx_port_id = nsx_ids.get(port['id'], (None, None))
+            # add the FWaaS rules for this port
+            # ingress/egress firewall rules + default ingress/egress drop
+            # rule for this port
+            ports_rules[port['id']] = self.get_port_rules(
+                nsx_ls_id, ports_fwgs[port['id']], plugin_rules[port['id']])
+        return ports_rules
+
+    @staticmethod
+    def _get_rules_fingerprint(rules):
+        return hashlib.sha1(jsonutils.dump_as_bytes(
+            rules, sort_keys=True)).hexdigest()
+
+    @staticmethod
+    def _get_section_revision(nsxlib, section_id):
+        try:
+            return nsxlib.firewall_section.get(section_id).get('_revision')
+        except Exception as e:
+            LOG.warning("Failed to get firewall section %(id)s: %(e)s",
+                        {'id': section_id, 'e': e})
+
+    def _save_section_state(self, section_id, fingerprints, ports_rules,
+                            section):
+        """Keep the rules ids of each port from the updated section"""
+        self._sections_state.pop(section_id, None)
+        if not isinstance(section, dict) or '_revision' not in section:
+            return
+        nsx_rules = section.get('rules', [])
+        if len(nsx_rules) != sum(len(r) for r in ports_rules.values()) + 1:
+            return
+        rule_ids = {}
+        index = 0
+        for port_id, rules in ports_rules.items():
+            rule_ids[port_id] = [nsx_rule.get('id') for nsx_rule in
+                                 nsx_rules[index:index + len(rules)]]
+            index += len(rules)
+        self._sections_state[section_id] = {
+            'revision': section['_revision'],
+            'fingerprints': fingerprints,
+            'rule_ids': rule_ids}
+
+    def _update_ports_rules(self, nsxlib, section_id, ports_rules,
+                            fingerprints):
+        """Update only the rules of the ports which changed
+
+        The rules of removed or changed ports are deleted one by one, and
+        the rules of new or changed ports are added at the top of the
+        section, before the default allow-all rule. nsxlib does not allow
+        adding rules before a specific rule, but the rules of each port
+        apply only to its own logical switch, so only their position before
+        the default rule matters.
+        The section revision is checked before the update, and compared
+        with the expected revision after it, so that changes done by other
+        processes or servers are never overridden.
+        Return True if the section is up to date, or False if it should be
+        rewritten.
+        """
+        state = self._sections_state.get(section_id)
+        old_fingerprints = state['fingerprints']
+        deleted_ids = [rule_id
+                       for port_id, fingerprint in old_fingerprints.items()
+                       if fingerprints.get(port_id) != fingerprint
+                       for rule_id in state['rule_ids'][port_id]]
+        added_ports = [port_id for port_id, fingerprint in fingerprints.items()
+                       if old_fingerprints.get(port_id) != fingerprint]
+        added_rules = [rule for port_id in added_ports
+                       for rule in ports_rules[port_id]]
+        if len(deleted_ids) + len(added_rules) > MAX_RULES_TO_UPDATE:
+            return False
+        # make sure the section was not changed since the last update
+        revision = self._get_section_revision(nsxlib, section_id)
+        if revision is None or revision != state['revision']:
+            return False
+        if not deleted_ids and not added_rules:
+            LOG.debug("Firewall section %s is up to date", section_id)
+            return True
+        nsx_rules = []
+        try:
+            for rule_id in deleted_ids:
+                nsxlib.firewall_section.delete_rule(section_id, rule_id)
+                revision += 1
+            if added_rules:
+                result = nsxlib.firewall_section.add_rules(
+                    added_rules, section_id,
+                    operation=nsxlib_consts.FW_INSERT_TOP)
+                nsx_rules = result.get('rules', [])
+                revision += 1
+        except Exception as e:
+            LOG.warning("Failed to update rules of firewall section %(id)s: "
+                        "%(e)s", {'id': section_id, 'e': e})
+            return False
+        if len(nsx_rules) != len(added_rules):
+            return False
+        # Each update should have changed the section revision once
+        if self._get_section_revision(nsxlib, section_id) != revision:
+            return False
+        rule_ids = dict((port_id, state['rule_ids'][port_id])
+                        for port_id in fingerprints
+                        if port_id not in added_ports)
+        index = 0
+        for port_id in added_ports:
+            num_rules = len(ports_rules[port_id])
+            rule_ids[port_id] = [nsx_rule.get('id') for nsx_rule in
+                                 nsx_rules[index:index + num_rules]]
+            index += num_rules
+        self._sections_state[section_id] = {
+            'revision': revision,
+            'fingerprints': fingerprints,
+            'rule_ids': rule_ids}
+        LOG.debug("Deleted %(deleted)s rules and added %(added)s rules to "
+                  "firewall section %(id)s",
+                  {'deleted': len(deleted_ids), 'added': len(added_rules),
+                   'id': section_id})
+        return True
+
     def update_router_firewall(self, context, nsxlib, router_id,
                                router_interfaces, nsx_router_id, section_id):
         """Rewrite all the FWaaS v2 rules in the router edge firewall
 
         This method should be called on FWaaS updates, and on router
         interfaces changes.
+        The fingerprints of the rules of each port are kept, so that only
+        the rules of ports which were added, changed or removed since the
+        last update are updated, as long as the section was not changed by
+        someone else in the meantime.
         """
+        ports_rules = self._get_ports_rules(context, router_id,
+                                            router_interfaces)
+        fingerprints = collections.OrderedDict(
+            (port_id, self._get_rules_fingerprint(rules))
+            for port_id, rules in ports_rules.items())
+        if section_id in self._sections_state:
+            if self._update_ports_rules(nsxlib, section_id, ports_rules,
+                                        fingerprints):
+                return
+            self._sections_state.pop(section_id, None)
+
         fw_rules = []
-        # Add firewall rules per port attached to a firewall group
-        for port in router_interfaces:
-            nsx_ls_id, _nsx_port_id = nsx_db.get_nsx_switch_and_port_id(
-                context.session, port['id'])
-
-            # Check if this port has a firewall
-            fwg = self.get_port_fwg(context, port['id'])
-            if fwg:
-                # Add plugin additional allow rules
-                plugin_rules = self.core_plugin.get_extra_fw_rules(
-                    context, router_id, port['id'])
-
-                # add the FWaaS rules for this port
-                # ingress/egress firewall rules + default ingress/egress drop
-                # rule for this port
-                fw_rules.extend(self.get_port_rules(nsx_ls_id, fwg,
-                                                    plugin_rules))
+        for rules in ports_rules.values():
+            fw_rules.extend(rules)
 
         # add a default allow-all rule to all other traffic & ports
         fw_rules.append(self.internal_driver.get_default_backend_rule(
             section_id, allow_all=True))
 
         # update the backend router firewall
-        nsxlib.firewall_section.update(section_id, rules=fw_rules)
+        section = nsxlib.firewall_section.update(section_id, rules=fw_rules)
+        self._save_section_state(section_id, fingerprints, ports_rules,
+                                 section)
 
     def delete_port(self, context, port_id):
         # Mark the FW group as inactive if this is the last port
@@ -16,19 +16,23 @@
 
 import abc
 
+import eventlet
 import six
 
 from oslo_log import log as logging
 
+from neutron.db import models_v2
 from neutron.ipam import driver as ipam_base
 from neutron.ipam.drivers.neutrondb_ipam import driver as neutron_driver
 from neutron.ipam import exceptions as ipam_exc
 from neutron.ipam import requests as ipam_req
 from neutron.ipam import subnet_alloc
+from neutron_lib import context as n_context
 from neutron_lib.plugins import directory
 
 from vmware_nsx.db import db as nsx_db
 from vmware_nsx.extensions import projectpluginmap
+from vmware_nsx.services.ipam.common import reserve
 
 LOG = logging.getLogger(__name__)
 
@@ -180,9 +184,10 @@ class NsxAbstractIpamDriver(subnet_alloc.SubnetAllocator, NsxIpamBase):
                 subnet_request)
 
         # get the current pool data
-        curr_subnet = self._subnet_class.load(
+        ipam_subnet = self._subnet_class.load(
             subnet_request.subnet_id, nsx_pool_id,
-            self._context, tenant_id=subnet_request.tenant_id).get_details()
+            self._context, tenant_id=subnet_request.tenant_id)
+        curr_subnet = ipam_subnet.get_details()
 
         # check if the gateway changed
         gateway_changed = False
@@ -226,6 +231,9 @@ class NsxAbstractIpamDriver(subnet_alloc.SubnetAllocator, NsxIpamBase):
 
         # update the relevant attributes at the backend pool
         if gateway_changed or pools_changed:
+            # Reserved addresses may be out of the updated pools
+            reserve.close_pool_reserve(nsx_pool_id,
+                                       ipam_subnet.backend_deallocate)
             self.update_backend_pool(nsx_pool_id, subnet_request)
 
     @abc.abstractmethod
@@ -242,6 +250,9 @@ class NsxAbstractIpamDriver(subnet_alloc.SubnetAllocator, NsxIpamBase):
             return
 
         # Delete from backend
+        reserve.close_pool_reserve(
+            nsx_pool_id, self._subnet_class.load(
+                subnet_id, nsx_pool_id, self._context).backend_deallocate)
         self.delete_backend_pool(nsx_pool_id)
 
         # delete pool from DB
@@ -276,8 +287,57 @@ class NsxAbstractIpamSubnet(ipam_base.Subnet, NsxIpamBase):
         """Load an IPAM subnet object given its neutron ID."""
         return cls(neutron_subnet_id, nsx_pool_id, ctx, tenant_id)
 
+    @property
+    def _prefetch_size(self):
+        """Number of addresses to allocate ahead of time from the pool"""
+        return 0
+
+    def _get_pool_reserve(self):
+        if self._prefetch_size <= 0:
+            return
+        pool_reserve = reserve.get_pool_reserve(self._nsx_pool_id,
+                                                self._prefetch_size)
+        if pool_reserve.reconcile_needed():
+            eventlet.spawn_n(pool_reserve.reconcile,
+                             self._get_unused_backend_addresses,
+                             self.backend_deallocate)
+        return pool_reserve
+
+    def _backend_allocate_any(self):
+        return self.backend_allocate(ipam_req.AnyAddressRequest())
+
+    def backend_get_allocations(self):
+        """Return the addresses allocated on the backend pool
+
+        Return None if the backend cannot list them.
+        """
+        return None
+
+    def _get_unused_backend_addresses(self):
+        """Return the addresses of the backend pool unused by neutron"""
+        allocated = self.backend_get_allocations()
+        if not allocated:
+            return []
+        # The context of the request may be gone by now
+        ctx = n_context.get_admin_context()
+        used = set(ip_address for ip_address, in ctx.session.query(
+            models_v2.IPAllocation.ip_address).filter_by(
+            subnet_id=self._subnet_id))
+        return [ip_address for ip_address in allocated
+                if ip_address not in used]
+
     def allocate(self, address_request):
         """Allocate an IP from the pool"""
+        pool_reserve = self._get_pool_reserve()
+        if pool_reserve is not None:
+            if isinstance(address_request, ipam_req.SpecificAddressRequest):
+                ip_address = str(address_request.address)
+                if pool_reserve.take(ip_address):
+                    # Already allocated on the backend by this server
+                    return ip_address
+            elif isinstance(address_request, ipam_req.AnyAddressRequest):
+                return pool_reserve.allocate(self._backend_allocate_any,
+                                             self.backend_deallocate)
         return self.backend_allocate(address_request)
 
     @abc.abstractmethod
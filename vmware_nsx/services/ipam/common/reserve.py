@@ -0,0 +1,244 @@
+# Copyright 2018 VMware, Inc.
+#
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import eventlet
+import netaddr
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Unused reserved addresses are released back to the backend pool after
+# this number of seconds without allocations
+RESERVE_IDLE_TIMEOUT = 60
+# Minimal number of seconds between two checks of the backend pool for
+# addresses leaked by the reserves of former neutron server processes
+RESERVE_RECONCILE_INTERVAL = 600
+
+_reserves = {}
+_reserves_lock = threading.Lock()
+
+
+class IpPoolReserve(object):
+    """Addresses allocated ahead of time from a backend IP pool
+
+    Allocations of any address are served from a local reserve of addresses
+    which are already allocated on the backend. The reserve is refilled in
+    the background up to block_size addresses when it runs low, and
+    released back to the backend when no allocation was done for
+    RESERVE_IDLE_TIMEOUT seconds. The reserved addresses are kept in a set,
+    so that its size does not depend on how far apart they are.
+
+    The backend calls are not bound to the reserve. allocate_func allocates
+    any address on the backend and returns it, or raises the IPAM exception
+    of the failure. release_func releases an address on the backend. The
+    background refill and release use the functions of the last call.
+
+    The reserved addresses are lost if the neutron server stops, while they
+    are still allocated on the backend. The pool is therefore reconciled
+    periodically with the addresses used by neutron, see reconcile.
+    """
+
+    def __init__(self, pool_id, block_size):
+        self.pool_id = pool_id
+        self.block_size = block_size
+        self._allocate_func = None
+        self._release_func = None
+        self._reserved = set()
+        self._refilling = False
+        self._closed = False
+        self._idle_check = None
+        self._last_used = time.time()
+        self._reconciling = False
+        self._last_reconcile = None
+        self._leak_suspects = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._reserved)
+
+    def _pop(self):
+        if not self._reserved:
+            return None
+        # Hand out the lowest address first, like the backend does
+        ip_address = min(self._reserved, key=netaddr.IPAddress)
+        self._reserved.remove(ip_address)
+        return ip_address
+
+    def _set_funcs(self, allocate_func, release_func):
+        self._allocate_func = allocate_func
+        self._release_func = release_func
+
+    def allocate(self, allocate_func, release_func):
+        """Allocate any address, from the reserve if possible"""
+        with self._lock:
+            self._set_funcs(allocate_func, release_func)
+            ip_address = self._pop()
+            self._last_used = time.time()
+        if ip_address is None:
+            # Exhaustion of the backend pool is reported as before
+            ip_address = allocate_func()
+        with self._lock:
+            # Refill the reserve once it is half empty
+            refill = (not self._refilling and not self._closed and
+                      len(self._reserved) <= self.block_size // 2)
+            if refill:
+                self._refilling = True
+        if refill:
+            eventlet.spawn_n(self._refill)
+        return ip_address
+
+    def take(self, ip_address):
+        """Take a specific address from the reserve
+
+        Return True if the address was reserved, and can be used without
+        allocating it on the backend.
+        """
+        with self._lock:
+            self._last_used = time.time()
+            if ip_address not in self._reserved:
+                return False
+            self._reserved.remove(ip_address)
+            return True
+
+    def _refill(self):
+        allocate_func = self._allocate_func
+        allocated = []
+        try:
+            for i in range(self.block_size - len(self._reserved)):
+                try:
+                    allocated.append(allocate_func())
+                except Exception as e:
+                    # The pool is probably exhausted
+                    LOG.debug("Stopped filling the reserve of pool %(id)s: "
+                              "%(e)s", {'id': self.pool_id, 'e': e})
+                    break
+        finally:
+            with self._lock:
+                self._refilling = False
+                closed = self._closed
+                if not closed:
+                    self._reserved.update(allocated)
+                    if self._idle_check is None and self._reserved:
+                        self._idle_check = eventlet.spawn_after(
+                            RESERVE_IDLE_TIMEOUT, self._release_idle)
+        if closed:
+            self._release(allocated)
+
+    def _release_idle(self):
+        with self._lock:
+            idle_time = time.time() - self._last_used
+            if idle_time < RESERVE_IDLE_TIMEOUT:
+                self._idle_check = eventlet.spawn_after(
+                    RESERVE_IDLE_TIMEOUT - idle_time, self._release_idle)
+                return
+            self._idle_check = None
+            unused = self._pop_all()
+        self._release(unused)
+
+    def _pop_all(self):
+        unused = sorted(self._reserved, key=netaddr.IPAddress)
+        self._reserved = set()
+        return unused
+
+    def _release(self, addresses, release_func=None):
+        release_func = release_func or self._release_func
+        if addresses:
+            LOG.debug("Releasing %(num)d unused addresses of pool %(id)s",
+                      {'num': len(addresses), 'id': self.pool_id})
+        for ip_address in addresses:
+            try:
+                release_func(ip_address)
+            except Exception as e:
+                LOG.warning("Failed to release reserved ip %(ip)s of pool "
+                            "%(id)s: %(e)s",
+                            {'ip': ip_address, 'id': self.pool_id, 'e': e})
+
+    def reconcile_needed(self):
+        """Return True if the pool should be reconciled now
+
+        Only one reconciliation can be in progress at a time.
+        """
+        with self._lock:
+            if (self._reconciling or self._closed or
+                    (self._last_reconcile is not None and
+                     time.time() - self._last_reconcile <
+                     RESERVE_RECONCILE_INTERVAL)):
+                return False
+            self._reconciling = True
+            self._last_reconcile = time.time()
+            return True
+
+    def reconcile(self, get_unused_func, release_func):
+        """Release the addresses leaked by former reserves of the pool
+
+        get_unused_func returns the addresses allocated on the backend pool
+        which are not used by any neutron port. Those addresses which are not
+        in the reserve either, and were already unused at the previous
+        reconciliation, are released. Addresses found unused only once may
+        be in the middle of an allocation.
+        The reserves of other neutron servers using the same pool are not
+        known, so the prefetch should not be enabled by several servers.
+        """
+        try:
+            unused = set(get_unused_func())
+            with self._lock:
+                unused -= self._reserved
+                leaked = unused & self._leak_suspects
+                self._leak_suspects = unused - leaked
+            if leaked:
+                LOG.warning("Releasing %(num)d leaked addresses of pool "
+                            "%(id)s", {'num': len(leaked),
+                                       'id': self.pool_id})
+            self._release(sorted(leaked, key=netaddr.IPAddress),
+                          release_func=release_func)
+        except Exception as e:
+            LOG.warning("Failed to reconcile the reserve of pool %(id)s: "
+                        "%(e)s", {'id': self.pool_id, 'e': e})
+        finally:
+            with self._lock:
+                self._reconciling = False
+
+    def close(self, release_func):
+        """Release all the reserved addresses, and stop reserving"""
+        with self._lock:
+            self._closed = True
+            self._release_func = release_func
+            if self._idle_check is not None:
+                self._idle_check.cancel()
+                self._idle_check = None
+            unused = self._pop_all()
+        self._release(unused)
+
+
+def get_pool_reserve(pool_id, block_size):
+    """Return the reserve of a backend pool, creating it if needed"""
+    with _reserves_lock:
+        reserve = _reserves.get(pool_id)
+        if reserve is None:
+            reserve = IpPoolReserve(pool_id, block_size)
+            _reserves[pool_id] = reserve
+        return reserve
+
+
+def close_pool_reserve(pool_id, release_func):
+    """Release the reserved addresses of a pool before changing it"""
+    with _reserves_lock:
+        reserve = _reserves.pop(pool_id, None)
+    if reserve is not None:
+        reserve.close(release_func)
@@ -23,6 +23,7 @@ from neutron_lib.api.definitions import external_net as extnet_apidef
 from neutron_lib.api.definitions import multiprovidernet as mpnet_apidef
 from neutron_lib.api.definitions import provider_net as pnet
 from neutron_lib.api import validators
+from oslo_config import cfg
 from oslo_log import log as logging
 
 from vmware_nsx._i18n import _
@@ -117,6 +118,10 @@ class NsxvIpamDriver(common.NsxAbstractIpamDriver, common.NsxIpamBase):
 class NsxvIpamSubnet(common.NsxAbstractIpamSubnet, common.NsxIpamBase):
     """Manage IP addresses for the NSX-V IPAM driver."""
 
+    @property
+    def _prefetch_size(self):
+        return cfg.CONF.nsxv.ipam_prefetch_size
+
     def _get_vcns_error_code(self, e):
         """Get the error code out of VcnsApiException"""
         try:
@@ -16,18 +16,32 @@
 
 import netaddr
 
+from oslo_config import cfg
 from oslo_log import log as logging
 
 from neutron.ipam import exceptions as ipam_exc
 from neutron.ipam import requests as ipam_req
 
 from vmware_nsx._i18n import _
+from vmware_nsx.common import cache
 from vmware_nsx.services.ipam.common import driver as common
 from vmware_nsxlib.v3 import exceptions as nsx_lib_exc
 from vmware_nsxlib.v3 import nsx_constants as error
 
 LOG = logging.getLogger(__name__)
 
+POOL_CACHE_SIZE = 1000
+
+_pool_details_cache = None
+
+
+def _get_pool_details_cache():
+    global _pool_details_cache
+    if _pool_details_cache is None:
+        _pool_details_cache = cache.ExpiringLRUCache(
+            POOL_CACHE_SIZE, cfg.CONF.nsx_v3.ipam_pool_cache_ttl)
+    return _pool_details_cache
+
 
 class Nsxv3IpamDriver(common.NsxAbstractIpamDriver):
     """IPAM Driver For NSX-V3 networks."""
@@ -88,6 +102,7 @@ class Nsxv3IpamDriver(common.NsxAbstractIpamDriver):
         # Those ports be deleted shortly after this function.
         # We need to release those IPs before deleting the backed pool,
         # or else it will fail.
+        _get_pool_details_cache().invalidate(nsx_pool_id)
         pool_allocations = self.nsxlib_ipam.get_allocations(nsx_pool_id)
         if pool_allocations and pool_allocations.get('result_count'):
             for allocation in pool_allocations.get('results', []):
@@ -109,6 +124,7 @@ class Nsxv3IpamDriver(common.NsxAbstractIpamDriver):
             'cidr': self._get_cidr_from_request(subnet_request),
             'allocation_ranges': self._get_ranges_from_request(subnet_request),
             'gateway_ip': subnet_request.gateway_ip}
+        _get_pool_details_cache().invalidate(nsx_pool_id)
         try:
             self.nsxlib_ipam.update(
                 nsx_pool_id, **update_args)
@@ -140,6 +156,10 @@ class Nsxv3IpamSubnet(common.NsxAbstractIpamSubnet):
             subnet_id, nsx_pool_id, ctx, tenant_id)
         self.nsxlib_ipam = self._nsxlib.ip_pool
 
+    @property
+    def _prefetch_size(self):
+        return cfg.CONF.nsx_v3.ipam_prefetch_size
+
     def backend_allocate(self, address_request):
         try:
             # allocate a specific IP
@@ -147,7 +167,7 @@ class Nsxv3IpamSubnet(common.NsxAbstractIpamSubnet):
                 # This handles both specific and automatic address requests
                 ip_address = str(address_request.address)
                 # If this is the subnet gateway IP - no need to allocate it
-                subnet = self.get_details()
+                subnet = self.get_details(use_cache=True)
                 if str(subnet.gateway_ip) == ip_address:
                     LOG.info("Skip allocation of gateway-ip for pool %s",
                              self._nsx_pool_id)
@@ -198,7 +218,7 @@ class Nsxv3IpamSubnet(common.NsxAbstractIpamSubnet):
 
     def backend_deallocate(self, ip_address):
         # If this is the subnet gateway IP - no need to allocate it
-        subnet = self.get_details()
+        subnet = self.get_details(use_cache=True)
         if str(subnet.gateway_ip) == ip_address:
             LOG.info("Skip deallocation of gateway-ip for pool %s",
                      self._nsx_pool_id)
@@ -214,8 +234,18 @@ class Nsxv3IpamSubnet(common.NsxAbstractIpamSubnet):
                        'id': self._subnet_id,
                        'code': e.error_code})
 
-    def get_details(self):
-        """Return subnet data as a SpecificSubnetRequest"""
+    def backend_get_allocations(self):
+        pool_allocations = self.nsxlib_ipam.get_allocations(
+            self._nsx_pool_id)
+        return [allocation.get('allocation_id') for allocation in
+                (pool_allocations or {}).get('results', [])]
+
+    def _get_pool_details(self, use_cache=False):
+        details_cache = _get_pool_details_cache()
+        if use_cache:
+            pool_details = details_cache.get(self._nsx_pool_id)
+            if pool_details is not None:
+                return pool_details
         # get the pool from the backend
         try:
             pool_details = self.nsxlib_ipam.get(self._nsx_pool_id)
@@ -223,6 +253,16 @@ class Nsxv3IpamSubnet(common.NsxAbstractIpamSubnet):
             msg = _('Failed to get details for nsx pool: %(id)s: '
                     '%(e)s') % {'id': self._nsx_pool_id, 'e': e}
             raise ipam_exc.IpamValueInvalid(message=msg)
+        details_cache.set(self._nsx_pool_id, pool_details)
+        return pool_details
+
+    def get_details(self, use_cache=False):
+        """Return subnet data as a SpecificSubnetRequest
+
+        The pool details may be taken from the pool cache if use_cache is
+        True, for checking the gateway ip on each allocation.
+        """
+        pool_details = self._get_pool_details(use_cache=use_cache)
 
         first_range = pool_details.get('subnets', [None])[0]
         if not first_range:
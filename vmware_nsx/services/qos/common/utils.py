@@ -76,6 +76,38 @@ def get_network_policy_id(context, net_id):
         return policy.id
 
 
+def _get_visible_bindings_policy_ids(context, bindings, key):
+    policy_ids = set(binding.policy_id for binding in bindings)
+    if not policy_ids:
+        return {}
+    # Like get_port_policy & get_network_policy, ignore policies which are
+    # not visible to this context
+    visible_ids = set(policy.id for policy in
+                      obj_reg.load_class('QosPolicy').get_objects(
+                          context, id=list(policy_ids)))
+    return dict((getattr(binding, key), binding.policy_id)
+                for binding in bindings
+                if binding.policy_id in visible_ids)
+
+
+def get_ports_policy_ids(context, port_ids):
+    """Return a dictionary of port id to its QoS policy id"""
+    if not port_ids:
+        return {}
+    bindings = obj_reg.load_class('QosPolicyPortBinding').get_objects(
+        context, port_id=list(port_ids))
+    return _get_visible_bindings_policy_ids(context, bindings, 'port_id')
+
+
+def get_networks_policy_ids(context, net_ids):
+    """Return a dictionary of network id to its QoS policy id"""
+    if not net_ids:
+        return {}
+    bindings = obj_reg.load_class('QosPolicyNetworkBinding').get_objects(
+        context, network_id=list(net_ids))
+    return _get_visible_bindings_policy_ids(context, bindings, 'network_id')
+
+
 def set_qos_policy_on_new_net(context, net_data, created_net):
     """Update the network with the assigned or default QoS policy
 
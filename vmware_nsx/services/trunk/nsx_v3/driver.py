@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import excutils
@@ -23,6 +24,7 @@ from neutron.services.trunk.drivers import base
 from neutron_lib.api.definitions import portbindings
 from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
+from neutron_lib import exceptions as n_exc
 
 from vmware_nsx.common import nsx_constants as nsx_consts
 from vmware_nsx.common import utils as nsx_utils
@@ -38,6 +40,8 @@ SUPPORTED_INTERFACES = (
 SUPPORTED_SEGMENTATION_TYPES = (
     trunk_consts.VLAN,
 )
+# Maximum number of subports updated on the backend at once
+MAX_CONCURRENT_SUBPORT_UPDATES = 10
 
 
 class NsxV3TrunkHandler(object):
@@ -55,12 +59,8 @@ class NsxV3TrunkHandler(object):
         return switching_profile.build_switch_profile_ids(
             switching_profile.client, *profiles)
 
-    def _update_port_at_backend(self, context, parent_port_id, subport):
-        # Retrieve the child port details
-        child_port = self.plugin_driver.get_port(context, subport.port_id)
-        # Retrieve the logical port ID based on the child port's neutron ID
-        nsx_child_port_id = nsx_db.get_nsx_switch_and_port_id(
-            session=context.session, neutron_id=subport.port_id)[1]
+    def _update_child_port_at_backend(self, parent_port_id, subport,
+                                      child_port, nsx_child_port_id):
         # Retrieve child logical port from the backend
         try:
             nsx_child_port = self._nsxlib.logical_port.get(
@@ -112,16 +112,61 @@ class NsxV3TrunkHandler(object):
                           "type. Setting trunk status to ERROR. "
                           "Exception is %s", e)
 
+    def _update_ports_at_backend(self, context, parent_port_id, subports):
+        """Set or unset the parent port of the subports on the backend
+
+        The child ports and their NSX ids are retrieved in bulk, and the
+        logical ports are updated concurrently. All the subports are
+        handled even if some of them fail, and a ManagerError listing the
+        failures is raised at the end, so that the trunk status is set to
+        ERROR whatever the failure was.
+        """
+        port_ids = [subport.port_id for subport in subports]
+        # Retrieve the child ports details
+        child_ports = dict(
+            (port['id'], port) for port in self.plugin_driver.get_ports(
+                context, filters={'id': port_ids}))
+        # Retrieve the logical ports IDs based on the child ports neutron IDs
+        nsx_ids = nsx_db.get_nsx_switch_and_port_ids(
+            context.session, port_ids)
+
+        def _update_subport(subport):
+            child_port = child_ports.get(subport.port_id)
+            if child_port is None:
+                return subport, n_exc.PortNotFound(port_id=subport.port_id)
+            nsx_child_port_id = nsx_ids.get(subport.port_id, (None, None))[1]
+            try:
+                self._update_child_port_at_backend(
+                    parent_port_id, subport, child_port, nsx_child_port_id)
+            except Exception as e:
+                return subport, e
+            return subport, None
+
+        pool = eventlet.GreenPool(MAX_CONCURRENT_SUBPORT_UPDATES)
+        failures = [(subport, e) for subport, e in
+                    pool.imap(_update_subport, subports) if e is not None]
+        for subport, e in failures:
+            LOG.error("Failed to update subport %(port)s of parent port "
+                      "%(parent)s on the backend: %(e)s",
+                      {'port': subport.port_id, 'parent': parent_port_id,
+                       'e': e})
+        if failures:
+            details = '; '.join('%s: %s' % (subport.port_id, e)
+                                for subport, e in failures)
+            raise nsxlib_exc.ManagerError(
+                manager=', '.join(cfg.CONF.nsx_v3.nsx_api_managers),
+                operation='update subports',
+                details=': %s' % details)
+
     def _set_subports(self, context, parent_port_id, subports):
-        for subport in subports:
-            # Update port with parent port for backend.
-            self._update_port_at_backend(context, parent_port_id, subport)
+        if subports:
+            # Update ports with parent port for backend.
+            self._update_ports_at_backend(context, parent_port_id, subports)
 
     def _unset_subports(self, context, subports):
-        for subport in subports:
-            # Update port and remove parent port attachment in the backend
-            self._update_port_at_backend(
-                context=context, parent_port_id=None, subport=subport)
+        if subports:
+            # Update ports and remove parent port attachment in the backend
+            self._update_ports_at_backend(context, None, subports)
 
     def trunk_created(self, context, trunk):
         # Retrieve the logical port ID based on the parent port's neutron ID
@@ -37,13 +37,22 @@ class NsxVPNPlugin(plugin.VPNDriverPlugin):
 
     def update_all_connection_status(self, context):
         connections = super(NsxVPNPlugin, self).get_ipsec_site_connections(
-            context)
+            context, fields=['id', 'status'])
         if not connections:
             return
-        # TODO(asarfaty): This will not scale well. Should use a bulk action
-        # instead for the NSX api
+        driver = self.drivers[self.default_provider]
+        if not hasattr(driver, 'get_ipsec_site_connections_status'):
+            for connection in connections:
+                self._update_nsx_connection_status(context, connection['id'])
+            return
+        statuses = driver.get_ipsec_site_connections_status(
+            context, [connection['id'] for connection in connections])
+        # Update only the connections whose status changed
         for connection in connections:
-            self._update_nsx_connection_status(context, connection['id'])
+            status = statuses.get(connection['id'])
+            if status and status != connection['status']:
+                self._update_connection_status(context, connection['id'],
+                                               status, False)
 
     def get_ipsec_site_connection(self, context,
                                   ipsec_site_conn_id, fields=None):
@@ -106,3 +106,11 @@ class NSXIPsecVpnDriver(service_drivers.VpnDriver):
         if driver and hasattr(driver, 'get_ipsec_site_connection_status'):
             return driver.get_ipsec_site_connection_status(
                 context, ipsec_site_conn_id)
+
+    def get_ipsec_site_connections_status(self, context,
+                                          ipsec_site_conn_ids):
+        driver = self.drivers.get(projectpluginmap.NsxPlugins.NSX_T)
+        if driver and hasattr(driver, 'get_ipsec_site_connections_status'):
+            return driver.get_ipsec_site_connections_status(
+                context, ipsec_site_conn_ids)
+        return {}
@@ -0,0 +1,98 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+
+import netaddr
+
+
+class CidrIndex(object):
+    """An index of CIDRs by key, for looking up overlapping CIDRs
+
+    Two CIDRs overlap only if one of them contains the other. So the CIDRs
+    overlapping a given one are its indexed supernets, found by a lookup per
+    prefix length, and the indexed CIDRs starting inside it, found by a
+    binary search in the sorted list of the indexed networks.
+    """
+
+    def __init__(self):
+        self._cidrs = {}
+        # (ip version, first address, prefix length) -> keys
+        self._networks = {}
+        # the sorted networks tuples
+        self._sorted_networks = []
+
+    def __len__(self):
+        return len(self._cidrs)
+
+    def __contains__(self, key):
+        return key in self._cidrs
+
+    def keys(self):
+        return set(self._cidrs)
+
+    @staticmethod
+    def _get_network(cidr):
+        net = netaddr.IPNetwork(cidr)
+        return net.version, net.first, net.prefixlen
+
+    def add(self, key, cidr):
+        self.remove(key)
+        network = self._get_network(cidr)
+        self._cidrs[key] = network
+        keys = self._networks.get(network)
+        if keys is None:
+            keys = self._networks[network] = set()
+            bisect.insort(self._sorted_networks, network)
+        keys.add(key)
+
+    def remove(self, key):
+        network = self._cidrs.pop(key, None)
+        if network is None:
+            return
+        keys = self._networks[network]
+        keys.discard(key)
+        if not keys:
+            del self._networks[network]
+            index = bisect.bisect_left(self._sorted_networks, network)
+            del self._sorted_networks[index]
+
+    def clear(self):
+        self._cidrs.clear()
+        self._networks.clear()
+        self._sorted_networks = []
+
+    def get_overlapping(self, cidr):
+        """Return the keys of the indexed CIDRs overlapping this CIDR"""
+        version, first, prefixlen = self._get_network(cidr)
+        bits = 32 if version == 4 else 128
+        last = first | ((1 << (bits - prefixlen)) - 1)
+        keys = set()
+        # The indexed supernets of this cidr
+        for supernet_len in range(prefixlen + 1):
+            host_bits = bits - supernet_len
+            supernet = (version, first >> host_bits << host_bits,
+                        supernet_len)
+            keys.update(self._networks.get(supernet, ()))
+        # The indexed subnets of this cidr
+        index = bisect.bisect_left(self._sorted_networks,
+                                   (version, first, prefixlen))
+        while index < len(self._sorted_networks):
+            network = self._sorted_networks[index]
+            if network[0] != version or network[1] > last:
+                break
+            keys.update(self._networks[network])
+            index += 1
+        return keys
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+
 import netaddr
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -25,13 +27,16 @@ from neutron_lib import constants
 from neutron_lib import context as n_context
 from neutron_lib import exceptions as nexception
 from neutron_lib.plugins import directory
+from neutron_vpnaas.db.vpn import vpn_models
 from neutron_vpnaas.services.vpn import service_drivers
 
 from vmware_nsx.common import exceptions as nsx_exc
 from vmware_nsx.db import db
 from vmware_nsx.extensions import projectpluginmap
+from vmware_nsx.services.vpnaas.nsxv3 import cidr_index
 from vmware_nsx.services.vpnaas.nsxv3 import ipsec_utils
 from vmware_nsx.services.vpnaas.nsxv3 import ipsec_validator
+from vmware_nsx.services.vpnaas.nsxv3 import status_collector
 from vmware_nsxlib.v3 import exceptions as nsx_lib_exc
 from vmware_nsxlib.v3 import nsx_constants as consts
 from vmware_nsxlib.v3 import vpn_ipsec
@@ -67,6 +72,11 @@ class NSXv3IPsecVpnDriver(service_drivers.VpnDriver):
         self._nsx_vpn = self._nsxlib.vpn_ipsec
         validator = ipsec_validator.IPsecV3Validator(service_plugin)
         super(NSXv3IPsecVpnDriver, self).__init__(service_plugin, validator)
+        # Index of the vpn services subnets by connection id
+        self._conns_cidr_index = cidr_index.CidrIndex()
+        self._conns_cidr_index_lock = threading.Lock()
+        self._status_collector = status_collector.SessionStatusCollector(
+            self._get_session_status, cfg.CONF.nsx_v3.vpn_status_cache_ttl)
 
         registry.subscribe(
             self._delete_local_endpoint, resources.ROUTER_GATEWAY,
@@ -399,20 +409,72 @@ class NSXv3IPsecVpnDriver(service_drivers.VpnDriver):
         if port:
             self.l3_plugin.delete_port(ctx, port['id'], force_delete_vpn=True)
 
-    def _check_subnets_overlap_with_all_conns(self, context, subnets):
-        # find all vpn services with connections
-        filters = {'status': [constants.ACTIVE]}
+    def _add_conns_to_cidr_index(self, context, conn_ids):
         connections = self.vpn_plugin.get_ipsec_site_connections(
-            context, filters=filters)
+            context, filters={'id': conn_ids},
+            fields=['id', 'vpnservice_id'])
+        srv_ids = list(set(conn['vpnservice_id'] for conn in connections))
+        if not srv_ids:
+            return
+        services = self.vpn_plugin.get_vpnservices(
+            context, filters={'id': srv_ids}, fields=['id', 'subnet_id'])
+        srv_subnets = dict((srv['id'], srv['subnet_id'])
+                           for srv in services if srv.get('subnet_id'))
+        if not srv_subnets:
+            return
+        subnets = self.l3_plugin.get_subnets(
+            context, filters={'id': list(set(srv_subnets.values()))},
+            fields=['id', 'cidr'])
+        cidrs = dict((subnet['id'], subnet['cidr']) for subnet in subnets)
         for conn in connections:
-            srv_id = conn.get('vpnservice_id')
-            srv = self.vpn_plugin._get_vpnservice(context, srv_id)
-            srv_subnet = self.l3_plugin.get_subnet(
-                context, srv['subnet_id'])
-            if netaddr.IPSet(subnets) & netaddr.IPSet([srv_subnet['cidr']]):
-                return False
+            cidr = cidrs.get(srv_subnets.get(conn['vpnservice_id']))
+            if cidr:
+                self._conns_cidr_index.add(conn['id'], cidr)
+
+    def _get_indexed_conn_ids(self, context):
+        # Only the connections of vpn services with a subnet are indexed
+        query = context.session.query(
+            vpn_models.IPsecSiteConnection.id).join(
+            vpn_models.VPNService,
+            vpn_models.IPsecSiteConnection.vpnservice_id ==
+            vpn_models.VPNService.id).filter(
+            vpn_models.VPNService.subnet_id.isnot(None))
+        return set(conn.id for conn in query)
+
+    def _sync_conns_cidr_index(self, context):
+        """Make the connections subnets index consistent with the DB
+
+        Only the ids of the connections are read on each call. The subnets
+        of the connections which are not indexed yet are fetched, and the
+        deleted connections are removed from the index.
+        """
+        index = self._conns_cidr_index
+        conn_ids = self._get_indexed_conn_ids(context)
+        indexed_ids = index.keys()
+        if conn_ids == indexed_ids:
+            return
+        for conn_id in indexed_ids - conn_ids:
+            index.remove(conn_id)
+        missing_ids = conn_ids - indexed_ids
+        if missing_ids:
+            self._add_conns_to_cidr_index(context, list(missing_ids))
 
-        return True
+    def _check_subnets_overlap_with_all_conns(self, context, subnets):
+        # find the connections whose vpn service subnet overlaps
+        with self._conns_cidr_index_lock:
+            self._sync_conns_cidr_index(context)
+            conn_ids = set()
+            for cidr in subnets:
+                conn_ids.update(
+                    self._conns_cidr_index.get_overlapping(cidr))
+        if not conn_ids:
+            return True
+
+        # only active connections are relevant
+        filters = {'id': list(conn_ids), 'status': [constants.ACTIVE]}
+        connections = self.vpn_plugin.get_ipsec_site_connections(
+            context, filters=filters, fields=['id'])
+        return not connections
 
     def _verify_overlap_subnet(self, resource, event, trigger, **kwargs):
         """Upon router interface creation validation overlapping with vpn"""
@@ -495,16 +557,13 @@ class NSXv3IPsecVpnDriver(service_drivers.VpnDriver):
             description=connection['description'],
             policy_rules=rules,
             enabled=enabled)
+        self._status_collector.invalidate(session_id)
 
-    def get_ipsec_site_connection_status(self, context, ipsec_site_conn_id):
-        mapping = db.get_nsx_vpn_connection_mapping(
-            context.session, ipsec_site_conn_id)
-        if not mapping or not mapping['session_id']:
-            LOG.info("Couldn't find NSX session for VPN connection %s",
-                     ipsec_site_conn_id)
-            return
+    def _get_session_status(self, session_id):
+        return self._nsx_vpn.session.get_status(session_id)
 
-        status_result = self._nsx_vpn.session.get_status(mapping['session_id'])
+    @staticmethod
+    def _translate_session_status(status_result):
         if status_result and 'session_status' in status_result:
             status = status_result['session_status']
             # NSX statuses are UP, DOWN, DEGRADE
@@ -514,8 +573,40 @@ class NSXv3IPsecVpnDriver(service_drivers.VpnDriver):
             elif status == 'DOWN' or status == 'DEGRADED':
                 return 'DOWN'
 
+    def get_ipsec_site_connections_status(self, context, ipsec_site_conn_ids):
+        """Return the status of the connections by connection id
+
+        Connections without an NSX session or a known status are omitted.
+        """
+        mappings = db.get_nsx_vpn_connection_mappings(
+            context.session, ipsec_site_conn_ids)
+        sessions = dict((mapping['neutron_id'], mapping['session_id'])
+                        for mapping in mappings if mapping['session_id'])
+        for conn_id in set(ipsec_site_conn_ids) - set(sessions):
+            LOG.info("Couldn't find NSX session for VPN connection %s",
+                     conn_id)
+        if not sessions:
+            return {}
+
+        statuses = self._status_collector.get_statuses(sessions.values())
+        result = {}
+        for conn_id, session_id in sessions.items():
+            status = self._translate_session_status(statuses.get(session_id))
+            if status:
+                result[conn_id] = status
+        return result
+
+    def get_ipsec_site_connection_status(self, context, ipsec_site_conn_id):
+        return self.get_ipsec_site_connections_status(
+            context, [ipsec_site_conn_id]).get(ipsec_site_conn_id)
+
+    def get_status_stats(self):
+        """Return the timing of the sessions status sweeps"""
+        return self._status_collector.stats()
+
     def _delete_session(self, session_id):
         self._nsx_vpn.session.delete(session_id)
+        self._status_collector.invalidate(session_id)
 
     def create_ipsec_site_connection(self, context, ipsec_site_conn):
         LOG.debug('Creating ipsec site connection %(conn_info)s.',
@@ -575,6 +666,9 @@ class NSXv3IPsecVpnDriver(service_drivers.VpnDriver):
 
             self._update_status(context, vpnservice_id, ipsec_id,
                                 constants.ACTIVE)
+            # add the new connection to the subnets index
+            with self._conns_cidr_index_lock:
+                self._add_conns_to_cidr_index(context, [ipsec_id])
 
         except nsx_exc.NsxPluginException:
             with excutils.save_and_reraise_exception():
@@ -607,6 +701,8 @@ class NSXv3IPsecVpnDriver(service_drivers.VpnDriver):
         vpnservice_id = ipsec_site_conn['vpnservice_id']
         vpnservice = self.service_plugin._get_vpnservice(
             context, vpnservice_id)
+        with self._conns_cidr_index_lock:
+            self._conns_cidr_index.remove(ipsec_site_conn['id'])
 
         # get all data from the nsx based on the connection id in the DB
         mapping = db.get_nsx_vpn_connection_mapping(
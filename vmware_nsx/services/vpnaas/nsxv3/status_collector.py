@@ -0,0 +1,101 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import eventlet
+from oslo_log import log as logging
+
+from vmware_nsx.common import cache
+
+LOG = logging.getLogger(__name__)
+
+# Maximum number of session statuses queried from the NSX at once
+MAX_CONCURRENT_STATUS_QUERIES = 20
+STATUS_CACHE_SIZE = 10000
+
+
+class SessionStatusCollector(object):
+    """Collects the statuses of NSX IPsec sessions
+
+    The statuses of the requested sessions are queried concurrently, with
+    at most MAX_CONCURRENT_STATUS_QUERIES queries at a time, and are reused
+    for ttl seconds. A failed query is not cached, and returns None.
+    The timing of the sweeps is kept, and can be retrieved with stats().
+    """
+
+    def __init__(self, get_status_func, ttl):
+        self._get_status_func = get_status_func
+        self._cache = cache.ExpiringLRUCache(STATUS_CACHE_SIZE, ttl)
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.last_sweep_sessions = 0
+        self.last_sweep_queries = 0
+        self.last_sweep_duration = 0
+        self.max_sweep_duration = 0
+        self.total_sweep_duration = 0
+
+    def _get_status(self, session_id):
+        try:
+            status = self._get_status_func(session_id)
+        except Exception as e:
+            LOG.warning("Failed to get the status of NSX IPsec session "
+                        "%(id)s: %(e)s", {'id': session_id, 'e': e})
+            return session_id, None
+        self._cache.set(session_id, status)
+        return session_id, status
+
+    def get_statuses(self, session_ids):
+        """Return the statuses of the sessions by session id"""
+        start = time.time()
+        statuses = {}
+        missing_ids = []
+        for session_id in set(session_ids):
+            status = self._cache.get(session_id)
+            if status is None:
+                missing_ids.append(session_id)
+            else:
+                statuses[session_id] = status
+        if missing_ids:
+            pool = eventlet.GreenPool(MAX_CONCURRENT_STATUS_QUERIES)
+            statuses.update(pool.imap(self._get_status, missing_ids))
+        duration = time.time() - start
+        with self._lock:
+            self.sweeps += 1
+            self.last_sweep_sessions = len(statuses)
+            self.last_sweep_queries = len(missing_ids)
+            self.last_sweep_duration = duration
+            self.max_sweep_duration = max(self.max_sweep_duration, duration)
+            self.total_sweep_duration += duration
+        LOG.debug("Collected the status of %(num)d NSX IPsec sessions with "
+                  "%(queries)d queries in %(time).3f seconds",
+                  {'num': len(statuses), 'queries': len(missing_ids),
+                   'time': duration})
+        return statuses
+
+    def invalidate(self, session_id):
+        self._cache.invalidate(session_id)
+
+    def stats(self):
+        with self._lock:
+            stats = {'sweeps': self.sweeps,
+                     'last_sweep_sessions': self.last_sweep_sessions,
+                     'last_sweep_queries': self.last_sweep_queries,
+                     'last_sweep_duration': self.last_sweep_duration,
+                     'max_sweep_duration': self.max_sweep_duration,
+                     'total_sweep_duration': self.total_sweep_duration}
+        stats['cache'] = self._cache.stats()
+        return stats
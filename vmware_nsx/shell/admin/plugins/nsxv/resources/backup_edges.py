@@ -95,6 +95,7 @@ def _delete_edge_from_nsx_and_neutron(edge_id, router_id):
         with locking.LockManager.get_lock(edge_id):
             # Delete from NSXv backend
             nsxv.delete_edge(edge_id)
+            utils.get_edge_inventory().remove_edge(edge_id)
             # Remove bindings from Neutron DB
             _delete_backup_from_neutron_db(edge_id, router_id)
             return True
@@ -271,6 +271,7 @@ def nsx_delete_orphaned_edges(resource, event, trigger, **kwargs):
     for edge in orphaned_edges:
         LOG.info("Deleting edge: %s", edge)
         nsxv.delete_edge(edge)
+        utils.get_edge_inventory().remove_edge(edge)
 
     LOG.info("After delete; Orphaned Edges: \n%s",
         pprint.pformat(get_orphaned_edges()))
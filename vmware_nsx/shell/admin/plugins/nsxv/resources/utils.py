@@ -25,10 +25,15 @@ from neutron_lib.plugins import directory
 from vmware_nsx.common import config
 from vmware_nsx.extensions import projectpluginmap
 from vmware_nsx import plugin
+from vmware_nsx.plugins.nsx_v.vshield import edge_inventory
 from vmware_nsx.plugins.nsx_v.vshield import vcns
 from vmware_nsx.shell.admin.plugins.common import utils as admin_utils
 
 LOG = logging.getLogger(__name__)
+# Keep the edges listed by an admin command for the whole run, unless a
+# shorter time was configured
+ADMIN_EDGE_INVENTORY_TTL = 600
+_EDGE_INVENTORY = None
 
 
 def get_nsxv_client():
@@ -40,6 +45,18 @@ def get_nsxv_client():
         insecure=cfg.CONF.nsxv.insecure)
 
 
+def get_edge_inventory():
+    """Return the edges inventory shared by the admin commands"""
+    global _EDGE_INVENTORY
+
+    if _EDGE_INVENTORY is None:
+        ttl = (cfg.CONF.nsxv.edge_inventory_cache_ttl or
+               ADMIN_EDGE_INVENTORY_TTL)
+        _EDGE_INVENTORY = edge_inventory.EdgeInventory(get_nsxv_client(),
+                                                       ttl)
+    return _EDGE_INVENTORY
+
+
 def get_plugin_filters(context):
     return admin_utils.get_plugin_filters(
         context, projectpluginmap.NsxPlugins.NSX_V)
@@ -149,8 +166,7 @@ class NsxVPluginWrapper(plugin.NsxVPlugin):
 def get_nsxv_backend_edges():
     """Get a list of all the backend edges and some of their attributes
     """
-    nsxv = get_nsxv_client()
-    edges = nsxv.get_edges()
+    edges = get_edge_inventory().get_edges()
     backend_edges = []
     for edge in edges:
         summary = edge.get('appliancesSummary')
@@ -141,15 +141,19 @@ def migrate_compute_ports_vms(resource, event, trigger, **kwargs):
     with PortsPlugin() as plugin:
         neutron_ports = plugin.get_ports(admin_cxt, filters=port_filters)
 
+    # skip non compute ports
+    neutron_ports = [port for port in neutron_ports
+                     if port.get('device_owner').startswith(
+                         const.DEVICE_OWNER_COMPUTE_PREFIX)]
+    # get the vm morefs of all the ports at once
+    vm_morefs = vm_mng.get_vm_moref_objs(
+        set(port.get('device_id') for port in neutron_ports))
+
     for port in neutron_ports:
-        # skip non compute ports
-        if (not port.get('device_owner').startswith(
-            const.DEVICE_OWNER_COMPUTE_PREFIX)):
-            continue
         device_id = port.get('device_id')
 
         # get the vm moref & spec from the DVS
-        vm_moref = vm_mng.get_vm_moref_obj(device_id)
+        vm_moref = vm_morefs.get(device_id)
         vm_spec = vm_mng.get_vm_spec(vm_moref)
         if not vm_spec:
             LOG.error("Failed to get the spec of vm %s", device_id)
@@ -0,0 +1,63 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import time
+
+import fixtures
+import mock
+from neutron.tests import base
+from oslo_config import cfg
+
+from vmware_nsx.common import file_cache
+
+
+class TestFileCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestFileCache, self).setUp()
+        self.lock_path = self.useFixture(fixtures.TempDir()).path
+        cfg.CONF.set_override('lock_path', self.lock_path,
+                              group='oslo_concurrency')
+        self.cache = file_cache.FileCache('test-cache', 60)
+
+    def test_get_cached_value(self):
+        self.assertIsNone(self.cache.get('key-1'))
+        self.cache.set('key-1', {'value': [1, 2]})
+        # The value is shared with the other processes through the file
+        self.assertTrue(os.path.exists(
+            os.path.join(self.lock_path, 'test-cache')))
+        self.assertEqual({'value': [1, 2]},
+                         file_cache.FileCache('test-cache', 60).get('key-1'))
+        self.assertIsNone(self.cache.get('key-2'))
+
+    def test_expired_value(self):
+        self.cache.set('key-1', {'value': 1})
+        with mock.patch.object(file_cache.time, 'time',
+                               return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get('key-1'))
+
+    def test_corrupted_file(self):
+        with open(os.path.join(self.lock_path, 'test-cache'), 'w') as f:
+            f.write('{"key": ')
+        self.assertIsNone(self.cache.get('key-1'))
+
+    def test_disabled(self):
+        cache = file_cache.FileCache('test-cache', 0)
+        self.assertFalse(cache.enabled)
+        cache.set('key-1', {'value': 1})
+        self.assertIsNone(cache.get('key-1'))
+        cfg.CONF.set_override('lock_path', None, group='oslo_concurrency')
+        self.assertFalse(file_cache.FileCache('test-cache', 60).enabled)
@@ -0,0 +1,69 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+
+import mock
+from neutron.tests import base
+from oslo_config import cfg
+
+from vmware_nsx.common import config  # noqa
+from vmware_nsx.common import locking
+
+
+class TestLockManager(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestLockManager, self).setUp()
+        self.addCleanup(locking.LockManager.reset_lock_stats)
+        self.held = []
+
+        @contextlib.contextmanager
+        def _lock(name, **kwargs):
+            self.held.append(name)
+            yield
+            self.held.remove(name)
+
+        mock.patch.object(locking.LockManager, '_get_lock_local',
+                          side_effect=_lock).start()
+        mock.patch.object(locking.LockManager, '_start_stats_dump').start()
+
+    def test_get_lock_no_debug_stack(self):
+        with mock.patch.object(locking.LOG, 'isEnabledFor',
+                               return_value=False),\
+            mock.patch.object(locking.traceback,
+                              'extract_stack') as extract_stack:
+            with locking.LockManager.get_lock('lock1'):
+                self.assertEqual(['lock1'], self.held)
+        extract_stack.assert_not_called()
+        self.assertEqual([], self.held)
+        # The statistics are disabled by default
+        self.assertEqual({}, locking.LockManager.get_lock_stats())
+
+    def test_get_lock_stats(self):
+        cfg.CONF.set_override('lock_stats_dump_interval', 60)
+        for i in range(3):
+            with locking.LockManager.get_lock('lock1'):
+                stats = locking.LockManager.get_lock_stats()['lock1']
+                self.assertIsNotNone(stats['holder'])
+        stats = locking.LockManager.get_lock_stats()['lock1']
+        self.assertEqual(3, stats['acquired'])
+        self.assertEqual(0, stats['waiting'])
+        self.assertIsNone(stats['holder'])
+        self.assertEqual(3, sum(stats['wait_histogram']))
+        self.assertEqual(3, sum(stats['hold_histogram']))
+        with mock.patch.object(locking.LOG, 'info') as log_info:
+            locking.LockManager.dump_lock_stats()
+        self.assertEqual(2, log_info.call_count)
@@ -131,6 +131,110 @@ class DvsTestCase(base.BaseTestCase):
         fake_get_moref.assert_called_once_with(mock.ANY, net_id)
         fake_get_spec.assert_called_once_with(net_id, vlan, trunk_mode=False)
 
+    def _mock_port_group_index(self, manager, names):
+        dvs_moref = mock.Mock(value='dvs-1')
+        pgs = [mock.Mock(value='dvportgroup-%s' % (i + 1))
+               for i in range(len(names))]
+        dvs_props = [mock.Mock(propSet=[mock.Mock(val=[pgs])])]
+        pg_props = mock.Mock(objects=[
+            mock.Mock(obj=pg, propSet=[mock.Mock(val=name)])
+            for pg, name in zip(pgs, names)])
+        pg_config = mock.MagicMock(val={'name': names[0]})
+        pg_config.__len__.return_value = 1
+
+        def fake_invoke_api(module, method, *args, **kwargs):
+            if method == 'get_object_properties':
+                if args[-1] == ['config']:
+                    return [mock.Mock(propSet=[pg_config])]
+                return dvs_props
+            if method == 'get_properties_for_a_collection_of_objects':
+                return pg_props
+
+        invoke_api = mock.patch.object(manager._session, 'invoke_api',
+                                       side_effect=fake_invoke_api).start()
+        return dvs_moref, pgs, pg_props, invoke_api
+
+    def test_net_id_to_moref_index(self):
+        manager = self._dvs._dvs
+        dvs_moref, pgs, _pg_props, invoke_api = self._mock_port_group_index(
+            manager, ['net-1', 'net-2'])
+        pg1, pg2 = pgs
+        self.assertEqual(pg2, manager._net_id_to_moref(dvs_moref, 'net-2'))
+        self.assertEqual(pg1, manager._net_id_to_moref(dvs_moref,
+                                                       'dvportgroup-1'))
+        # A single bulk query for the names of all the port groups
+        invoke_api.assert_any_call(
+            dvs.vim_util, 'continue_retrieval', manager._session.vim,
+            mock.ANY)
+        self.assertEqual(3, invoke_api.call_count)
+        manager.delete_port_group(dvs_moref, 'net-1')
+        self.assertNotIn('net-1', manager._port_group_index['dvs-1'])
+        self.assertNotIn('dvportgroup-1', manager._port_group_index['dvs-1'])
+        self.assertEqual(pg2, manager._net_id_to_moref(dvs_moref, 'net-2'))
+        self.assertEqual(4, invoke_api.call_count)
+        self.assertRaises(exp.NetworkNotFound,
+                          manager._net_id_to_moref, dvs_moref, 'net-3')
+
+    def test_net_id_to_moref_index_rename(self):
+        manager = self._dvs._dvs
+        dvs_moref, pgs, pg_props, _invoke_api = self._mock_port_group_index(
+            manager, ['old-name'])
+        pg1 = pgs[0]
+        self.assertEqual(pg1, manager._net_id_to_moref(dvs_moref,
+                                                       'old-name'))
+        spec = mock.Mock()
+        spec.name = 'new-name'
+        pg_props.objects[0].propSet[0].val = 'new-name'
+        with mock.patch.object(manager, '_copy_port_group_spec',
+                               return_value=spec):
+            manager._reconfigure_port_group(
+                pg1, manager.update_port_group_spec_name, 'new-name')
+        self.assertNotIn('old-name', manager._port_group_index['dvs-1'])
+        self.assertRaises(exp.NetworkNotFound,
+                          manager._net_id_to_moref, dvs_moref, 'old-name')
+        self.assertEqual(pg1, manager._net_id_to_moref(dvs_moref,
+                                                       'new-name'))
+
+
+class VMManagerTestCase(base.BaseTestCase):
+
+    @mock.patch.object(dvs_utils, 'dvs_create_session',
+                       return_value=mock.Mock())
+    def setUp(self, mock_session):
+        super(VMManagerTestCase, self).setUp()
+        self._vm_mng = dvs.VMManager()
+
+    def test_get_vm_moref_obj_cached(self):
+        vm_moref = mock.Mock(value='vm-1')
+        with mock.patch.object(self._vm_mng._session, 'invoke_api',
+                               return_value=[vm_moref]) as invoke_api:
+            self.assertEqual(vm_moref,
+                             self._vm_mng.get_vm_moref_obj('uuid-1'))
+            self.assertEqual(vm_moref,
+                             self._vm_mng.get_vm_moref_obj('uuid-1'))
+            self.assertEqual(1, invoke_api.call_count)
+            self._vm_mng.invalidate_vm_moref('uuid-1')
+            self._vm_mng.get_vm_moref_obj('uuid-1')
+            self.assertEqual(2, invoke_api.call_count)
+
+    def test_get_vm_moref_objs(self):
+        vm1 = mock.Mock(value='vm-1')
+        vm2 = mock.Mock(value='vm-2')
+        vms = mock.Mock(objects=[
+            mock.Mock(obj=vm1, propSet=[mock.Mock(val='uuid-1')]),
+            mock.Mock(obj=vm2, propSet=[mock.Mock(val='uuid-2')])])
+        with mock.patch.object(self._vm_mng._session, 'invoke_api',
+                               return_value=vms) as invoke_api,\
+            mock.patch.object(dvs.vim_util, 'continue_retrieval',
+                              return_value=None):
+            vm_refs = self._vm_mng.get_vm_moref_objs(
+                ['uuid-1', 'uuid-2', 'uuid-3'])
+            self.assertEqual({'uuid-1': vm1, 'uuid-2': vm2}, vm_refs)
+            self.assertEqual(1, invoke_api.call_count)
+            # The found VMs are cached
+            self.assertEqual(vm2, self._vm_mng.get_vm_moref_obj('uuid-2'))
+            self.assertEqual(1, invoke_api.call_count)
+
 
 class NeutronSimpleDvsTestCase(test_plugin.NeutronDbPluginV2TestCase):
 
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+
 from neutron_lib.api.definitions import dns
 from neutron_lib import context
 from neutron_lib.plugins import directory
@@ -115,3 +117,53 @@ class NsxV3DNSIntegrationTestCase(NsxDNSIntegrationTestCase,
                              dns_assignment['ip_address'])
             self.assertEqual(PORT_DNS_NAME + '.' + NETWORK_DOMAIN_NAME,
                              dns_assignment['fqdn'])
+
+    def _get_dns_driver(self):
+        plugin = directory.get_plugin()
+        return plugin._extension_manager.ordered_ext_drivers[0].obj
+
+    def test_list_ports_dns_domain_prefetched(self):
+        with self.network(dns_domain=NETWORK_DOMAIN_NAME,
+                          arg_list=(dns.DNSDOMAIN,)) as network,\
+            self.subnet(network=network, cidr='10.0.0.0/24') as subnet,\
+            self.port(subnet=subnet, dns_name=PORT_DNS_NAME,
+                      arg_list=(dns.DNSNAME,)),\
+            self.port(subnet=subnet, dns_name=NEW_PORT_DNS_NAME,
+                      arg_list=(dns.DNSNAME,)):
+            dns_driver = self._get_dns_driver()
+            dns_driver._dns_domain_cache.clear()
+            with mock.patch.object(
+                dns_driver, '_get_network_and_az',
+                wraps=dns_driver._get_network_and_az) as get_net:
+                ports = directory.get_plugin().get_ports(
+                    context.get_admin_context(),
+                    filters={'network_id': [network['network']['id']]})
+            # The domain was resolved for all the ports at once
+            get_net.assert_not_called()
+            self.assertEqual(2, len(ports))
+            for port in ports:
+                self.assertEqual(
+                    port[dns.DNSNAME] + '.' + NETWORK_DOMAIN_NAME,
+                    port[dns.DNSASSIGNMENT][0]['fqdn'])
+
+    def test_update_network_dns_domain_cached(self):
+        with self.network(dns_domain=NETWORK_DOMAIN_NAME,
+                          arg_list=(dns.DNSDOMAIN,)) as network,\
+            self.subnet(network=network, cidr='10.0.0.0/24') as subnet,\
+            self.port(subnet=subnet, dns_name=PORT_DNS_NAME,
+                      arg_list=(dns.DNSNAME,)) as port:
+            plugin = directory.get_plugin()
+            ctx = context.get_admin_context()
+            update_data = {'network': {dns.DNSDOMAIN: NEW_NETWORK_DOMAIN_NAME}}
+            plugin.update_network(ctx, network['network']['id'], update_data)
+            port_data = plugin.get_port(ctx, port['port']['id'])
+            self.assertEqual(PORT_DNS_NAME + '.' + NEW_NETWORK_DOMAIN_NAME,
+                             port_data[dns.DNSASSIGNMENT][0]['fqdn'])
+
+            # The cached domains are dropped when the configuration changes
+            cfg.CONF.set_override('dns_domain', 'other-domain.com.',
+                                  'nsx_v3')
+            dns_driver = self._get_dns_driver()
+            dns_driver._dns_domain_cache.set('dummy', 'dummy.com.')
+            dns_driver._get_dns_domain(network['network']['id'])
+            self.assertIsNone(dns_driver._dns_domain_cache.get('dummy'))
@@ -0,0 +1,236 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import eventlet
+from eventlet import wsgi
+import mock
+from neutron.tests import base
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+
+from vmware_nsx.api_client import client
+from vmware_nsx.api_client import connection_pool
+from vmware_nsx.common import config  # noqa
+
+CTRL1 = ('ctrl1', 443, True)
+CTRL2 = ('ctrl2', 443, True)
+
+
+class FakeConnection(object):
+
+    def __init__(self, host, port, is_ssl):
+        self.host = host
+        self.port = port
+        self.is_ssl = is_ssl
+        self.sock = None
+        self.closed = False
+
+    def connect(self):
+        self.sock = mock.Mock()
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ConnectionPoolTestCase, self).setUp()
+        self.login = mock.Mock()
+        self.eventlet = mock.patch.object(
+            connection_pool, 'eventlet').start()
+        self.pool = connection_pool.ConnectionPool(
+            FakeConnection, self.login, 1, 2)
+        self.pool.add_controller(CTRL1)
+        self.pool.add_controller(CTRL2)
+
+    def _conn_params(self, conn):
+        return conn.host, conn.port, conn.is_ssl
+
+    def _request(self, conn, latency=0, error=False):
+        conn.acquired_at = time.time() - latency
+        self.pool.release(self._conn_params(conn), conn,
+                          service_unavail=error)
+
+    def test_acquire_healthiest_controller(self):
+        self._request(self.pool.acquire(CTRL1), latency=0.15)
+        self._request(self.pool.acquire(CTRL2), latency=0.1)
+        conn = self.pool.acquire()
+        self.assertEqual(CTRL2, self._conn_params(conn))
+        # The load of a controller counts
+        self.assertEqual(CTRL1, self._conn_params(self.pool.acquire()))
+        self._request(conn, latency=0.1, error=True)
+        self._request(self.pool.acquire(CTRL2), latency=0.1, error=True)
+        # The errors of a controller count
+        self.assertEqual(CTRL1, self._conn_params(self.pool.acquire()))
+
+    def test_failing_controller_avoided(self):
+        conns = [self.pool.acquire(CTRL1) for i in range(2)]
+        for conn in conns:
+            self._request(conn, error=True)
+        for conn in conns:
+            self._request(self.pool.acquire(CTRL1), error=True)
+        conns = [self.pool.acquire() for i in range(2)]
+        self.assertEqual([CTRL2, CTRL2],
+                         [self._conn_params(conn) for conn in conns])
+        # CTRL1 is used only when CTRL2 is failing too
+        self.assertIsNone(self.pool.acquire(wait=False))
+
+    def test_preferred_controller(self):
+        ctrl3 = ('ctrl3', 443, True)
+        self._request(self.pool.acquire(CTRL1), latency=0.1)
+        self.pool.add_controller(ctrl3, preferred=True)
+        self._request(self.pool.acquire(ctrl3), latency=1)
+        self.assertEqual(ctrl3, self._conn_params(self.pool.acquire()))
+
+    def test_acquire_waits_for_release(self):
+        conns = [self.pool.acquire() for i in range(4)]
+        self.assertEqual({'size': 2, 'idle': 0, 'in_use': 2},
+                         dict((key, value) for key, value in
+                              self.pool.stats()['https://ctrl1:443'].items()
+                              if key in ('size', 'idle', 'in_use')))
+        waiting = eventlet.spawn(self.pool.acquire)
+        eventlet.sleep(0)
+        self.assertFalse(waiting.dead)
+        self._request(conns[0])
+        self.assertIs(conns[0], waiting.wait())
+
+    def test_bad_state_reconnects(self):
+        conn = self.pool.acquire(CTRL1)
+        self.pool.release(CTRL1, conn, bad_state=True)
+        self.assertTrue(conn.closed)
+        self.assertIsNot(conn, self.pool.acquire(CTRL1))
+        self.assertEqual(1, self.pool.stats()['https://ctrl1:443']['errors'])
+
+    def test_maintenance_shrinks_and_warms(self):
+        conns = [self.pool.acquire(CTRL1) for i in range(2)]
+        for conn in conns:
+            self._request(conn)
+        conns[0].last_used -= connection_pool.SHRINK_IDLE_TIME + 1
+        self.pool._maintain()
+        stats = self.pool.stats()
+        self.assertEqual(1, stats['https://ctrl1:443']['size'])
+        self.assertTrue(conns[0].closed)
+        # The remaining connections are connected and logged in
+        self.assertIsNotNone(self.pool.acquire(CTRL1).sock)
+        self.assertIsNotNone(self.pool.acquire(CTRL2).sock)
+        self.assertEqual(2, self.login.call_count)
+
+    def test_maintenance_loop(self):
+        self.eventlet.spawn.assert_called_once_with(
+            connection_pool._maintenance_loop, mock.ANY)
+        self.assertIs(self.pool, self.eventlet.spawn.call_args[0][1]())
+        # The loop runs right away, and until the pool is garbage collected
+        pool_ref = mock.Mock(side_effect=[self.pool, self.pool, None])
+        connection_pool._maintenance_loop(pool_ref)
+        self.eventlet.sleep.assert_called_with(
+            connection_pool.MAINTENANCE_INTERVAL)
+        self.assertEqual(2, self.eventlet.sleep.call_count)
+        # The connections were connected and logged in before any request
+        self.assertIsNotNone(self.pool.acquire(CTRL1).sock)
+        self.assertEqual(4, self.login.call_count)
+
+    def test_maintenance_reconnects_idle_connections(self):
+        conn = self.pool.acquire(CTRL1)
+        self._request(conn)
+        # The connection would be idle for too long before the next
+        # maintenance
+        conn.last_used = (time.time() - cfg.CONF.conn_idle_timeout +
+                          connection_pool.MAINTENANCE_INTERVAL / 2)
+        self.pool._maintain()
+        self.assertTrue(conn.closed)
+        self.assertIsNot(conn, self.pool.acquire(CTRL1))
+
+    def test_maintenance_forgives_errors(self):
+        self._request(self.pool.acquire(CTRL1), error=True)
+        error_rate = self.pool.stats()['https://ctrl1:443']['error_rate']
+        self.pool._maintain()
+        # Requests were made since the previous maintenance
+        self.assertEqual(
+            error_rate, self.pool.stats()['https://ctrl1:443']['error_rate'])
+        self.pool._maintain()
+        self.assertGreater(
+            error_rate, self.pool.stats()['https://ctrl1:443']['error_rate'])
+
+
+class FakeController(object):
+    """A local NSX controller serving requests after a delay"""
+
+    def __init__(self, delay=0.01, status='200 OK'):
+        self.delay = delay
+        self.status = status
+        self.requests = 0
+        self.logins = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self._sock = eventlet.listen(('127.0.0.1', 0))
+        self.port = self._sock.getsockname()[1]
+        self._server = eventlet.spawn(
+            wsgi.server, self._sock, self, log_output=False)
+
+    def stop(self):
+        self._server.kill()
+        self._sock.close()
+
+    def __call__(self, environ, start_response):
+        if environ['PATH_INFO'] == '/ws.v1/login':
+            self.logins += 1
+            start_response('200 OK', [('Set-Cookie', 'session=1')])
+            return [b'']
+        self.requests += 1
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            eventlet.sleep(self.delay)
+        finally:
+            self.concurrent -= 1
+        start_response(self.status, [('Content-Type', 'application/json')])
+        return [jsonutils.dump_as_bytes({'results': []})]
+
+
+class ConnectionPoolLoadTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ConnectionPoolLoadTestCase, self).setUp()
+        self.healthy = FakeController()
+        self.unavailable = FakeController(status='503 Service Unavailable')
+        self.addCleanup(self.healthy.stop)
+        self.addCleanup(self.unavailable.stop)
+        self.client = client.NsxApiClient(
+            [('127.0.0.1', self.unavailable.port, False),
+             ('127.0.0.1', self.healthy.port, False)],
+            'admin', 'admin', concurrent_connections=4,
+            http_timeout=5, retries=3)
+
+    def test_concurrent_requests(self):
+        num_requests = 100
+        pool = eventlet.GreenPool(num_requests)
+        results = list(pool.imap(
+            lambda i: self.client.request('GET', '/ws.v1/lswitch'),
+            range(num_requests)))
+        self.assertEqual([b'{"results": []}'] * num_requests, results)
+        stats = self.client.get_pool_stats()
+        healthy = stats['http://127.0.0.1:%s' % self.healthy.port]
+        unavailable = stats['http://127.0.0.1:%s' % self.unavailable.port]
+        # The pools grew up to their maximum size, and no further
+        self.assertEqual(4, healthy['size'])
+        self.assertEqual(4, self.healthy.max_concurrent)
+        self.assertEqual(num_requests, healthy['requests'])
+        # The unavailable controller was avoided after its first errors
+        self.assertEqual(unavailable['requests'], unavailable['errors'])
+        self.assertLess(unavailable['requests'], num_requests // 4)
+        self.assertEqual(1, self.healthy.logins)
@@ -297,6 +297,19 @@ class TestNetworksV2(test_plugin.TestNetworksV2, NsxPluginV2TestCase):
                 self._test_list_resources('network', [net1, net2],
                                           query_params=query_params)
 
+    def test_list_networks_db_queries_per_page(self):
+        """The number of DB queries should not depend on the networks count"""
+        plugin = directory.get_plugin()
+        ctx = context.get_admin_context()
+        with self.network(name='net1'):
+            with test_utils.count_db_queries() as queries:
+                self.assertEqual(1, len(plugin.get_networks(ctx)))
+            single_network_queries = len(queries)
+            with self.network(name='net2'), self.network(name='net3'):
+                with test_utils.count_db_queries() as queries:
+                    self.assertEqual(3, len(plugin.get_networks(ctx)))
+                self.assertLessEqual(len(queries), single_network_queries)
+
     def test_delete_network_after_removing_subet(self):
         gateway_ip = '10.0.0.1'
         cidr = '10.0.0.0/24'
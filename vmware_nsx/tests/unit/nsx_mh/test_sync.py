@@ -244,6 +244,57 @@ class CacheTestCase(base.BaseTestCase):
             self._verify_delete(resource, hit=False, deleted=deleted)
 
 
+class CompactCacheTestCase(base.BaseTestCase):
+    """Test suite providing coverage for the compact Cache mode."""
+
+    def setUp(self):
+        super(CompactCacheTestCase, self).setUp()
+        self.nsx_cache = sync.NsxCache(compact=True)
+
+    def _get_lswitchport(self, uuid, status=True, name='lp'):
+        return {'uuid': uuid,
+                'display_name': name,
+                'tags': [{'scope': 'q_port_id', 'tag': 'port-%s' % uuid}],
+                '_relations': {
+                    'LogicalPortStatus': {'fabric_status_up': status,
+                                          'link_status_up': status,
+                                          '_href': 'fake_href'}}}
+
+    def test_compact_data(self):
+        uuid = _uuid()
+        lport = self._get_lswitchport(uuid)
+        self.nsx_cache.update_lswitchport(lport)
+        cached_resource = self.nsx_cache[uuid]
+        self.assertEqual({'uuid': uuid,
+                          'tags': lport['tags'],
+                          '_relations': {
+                              'LogicalPortStatus': {
+                                  'fabric_status_up': True}}},
+                         cached_resource['data'])
+        self.assertTrue(cached_resource['changed'])
+
+    def test_process_updates_ignores_irrelevant_changes(self):
+        uuid = _uuid()
+        self.nsx_cache.process_updates(
+            [], [], [self._get_lswitchport(uuid)])
+        _, _, lp_uuids = self.nsx_cache.process_updates(
+            [], [], [self._get_lswitchport(uuid, name='altered')])
+        self.assertEqual([], list(lp_uuids))
+
+    def test_process_updates_with_status_change(self):
+        uuid = _uuid()
+        self.nsx_cache.process_updates(
+            [], [], [self._get_lswitchport(uuid)])
+        _, _, lp_uuids = self.nsx_cache.process_updates(
+            [], [], [self._get_lswitchport(uuid, status=False)])
+        self.assertEqual([uuid], list(lp_uuids))
+        cached_resource = self.nsx_cache[uuid]
+        self.assertTrue(cached_resource['data_bk']['_relations']
+                        ['LogicalPortStatus']['fabric_status_up'])
+        self.assertFalse(cached_resource['data']['_relations']
+                         ['LogicalPortStatus']['fabric_status_up'])
+
+
 class SyncLoopingCallTestCase(base.BaseTestCase):
 
     def test_looping_calls(self):
@@ -555,6 +606,98 @@ class SyncTestCase(testlib_api.SqlTestCase):
                 # Chunk size should have stayed the same
                 self.assertEqual(sp.chunk_size, 6)
 
+    def test_sync_multi_chunk_concurrent_fetch(self):
+        ctx = context.get_admin_context()
+        synchronizer = self._plugin._synchronizer
+        with self._populate_data(ctx, net_size=4, port_size=1, router_size=4):
+            fake_lswitches = jsonutils.loads(
+                self.fc.handle_get('/ws.v1/lswitch'))['results']
+            fake_lrouters = jsonutils.loads(
+                self.fc.handle_get('/ws.v1/lrouter'))['results']
+            fake_lswitchports = jsonutils.loads(
+                self.fc.handle_get('/ws.v1/lswitch/*/lport'))['results']
+            return_values = {
+                synchronizer.LS_URI: [(fake_lswitches, None, 4)],
+                synchronizer.LR_URI: [(fake_lrouters[:2], 'xxx', 4),
+                                      (fake_lrouters[2:], None, None)],
+                synchronizer.LP_URI: [([], 'start', 4),
+                                      (fake_lswitchports, None, None)]}
+
+            def fake_fetch_data(uri, cursor, page_size):
+                return return_values[uri].pop(0)
+
+            with mock.patch.object(synchronizer, '_max_concurrent_fetches',
+                                   3),\
+                mock.patch.object(synchronizer, '_fetch_data',
+                                  side_effect=fake_fetch_data) as fetch:
+                sp = sync.SyncParameters(6)
+                # Resource counts from a previous synchronization cycle
+                sp.resource_totals = (4, 4, 4)
+                synchronizer._synchronize_state(sp)
+                # The chunk is split according to the resource counts
+                fetch.assert_has_calls(
+                    [mock.call(synchronizer.LS_URI, 'start', 6),
+                     mock.call(synchronizer.LR_URI, 'start', 2),
+                     mock.call(synchronizer.LP_URI, 'start', 0)],
+                    any_order=True)
+                self.assertEqual(1, sp.current_chunk)
+                self.assertEqual((None, 'xxx', 'start'),
+                                 (sp.ls_cursor, sp.lr_cursor, sp.lp_cursor))
+                # The estimates are refreshed with the actual results
+                self.assertEqual((4, 4, 4), sp.resource_totals)
+                self.assertEqual((0, 2, 4), sp.resource_pending)
+                fetch.reset_mock()
+                synchronizer._synchronize_state(sp)
+                # Logical switches were all fetched in the first chunk
+                fetch.assert_has_calls(
+                    [mock.call(synchronizer.LR_URI, 'xxx', 6),
+                     mock.call(synchronizer.LP_URI, 'start', 4)],
+                    any_order=True)
+                self.assertEqual(2, fetch.call_count)
+                self.assertEqual(0, sp.current_chunk)
+                self.assertEqual((None, None, None),
+                                 (sp.ls_cursor, sp.lr_cursor, sp.lp_cursor))
+                self.assertEqual(6, sp.chunk_size)
+
+    def test_sync_concurrent_fetch_fallback(self):
+        ctx = context.get_admin_context()
+        synchronizer = self._plugin._synchronizer
+        with self._populate_data(ctx, net_size=4, port_size=1, router_size=4):
+            fake_lswitches = jsonutils.loads(
+                self.fc.handle_get('/ws.v1/lswitch'))['results']
+            fake_lrouters = jsonutils.loads(
+                self.fc.handle_get('/ws.v1/lrouter'))['results']
+            return_values = [(fake_lswitches, None, 4),
+                             (fake_lrouters[:2], 'xxx', 4),
+                             ([], 'start', 4)]
+
+            def fake_fetch_data(*args, **kwargs):
+                return return_values.pop(0)
+
+            with mock.patch.object(synchronizer, '_max_concurrent_fetches',
+                                   3),\
+                mock.patch.object(synchronizer, '_fetch_data',
+                                  side_effect=fake_fetch_data) as fetch:
+                sp = sync.SyncParameters(6)
+                synchronizer._synchronize_state(sp)
+            # The resource counts are not known yet: one request per
+            # resource type, each one sized after the previous results
+            self.assertEqual(
+                [mock.call(synchronizer.LS_URI, 'start', 6),
+                 mock.call(synchronizer.LR_URI, 'start', 2),
+                 mock.call(synchronizer.LP_URI, 'start', 0)],
+                fetch.call_args_list)
+            self.assertEqual((4, 4, 4), sp.resource_totals)
+            self.assertEqual((0, 2, 4), sp.resource_pending)
+
+    def test_sync_pending_estimate(self):
+        estimate = sync.NsxSynchronizer._get_pending_estimate
+        self.assertEqual(0, estimate(2, 1, None))
+        self.assertEqual(3, estimate(3, 0, 'start'))
+        self.assertEqual(2, estimate(4, 2, 'xxx'))
+        # More resources than estimated were found
+        self.assertEqual(1, estimate(2, 3, 'xxx'))
+
     def test_synchronize_network(self):
         ctx = context.get_admin_context()
         with self._populate_data(ctx):
@@ -18,10 +18,13 @@ import mock
 from oslo_config import cfg
 from oslo_utils import uuidutils
 
+from neutron.db import models_v2
 from neutron_lib import context
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
 
+from vmware_nsx.db import db as nsx_db
+from vmware_nsx.extensions import projectpluginmap
 from vmware_nsx.tests.unit.dvs import test_plugin as dvs_tests
 from vmware_nsx.tests.unit.nsx_v import test_plugin as v_tests
 from vmware_nsx.tests.unit.nsx_v3 import test_plugin as t_tests
@@ -374,6 +377,105 @@ class TestPluginWithDefaultPlugin(NsxTVDPluginTestCase):
         project_id = _uuid()
         self._test_call_create('network', project_id=project_id)
 
+    def test_project_plugin_mapping_cache(self):
+        stats = self.core_plugin.get_plugin_mapping_cache_stats()
+        orig_hits = stats['project_plugin']['hits']
+        with mock.patch.object(nsx_db, 'get_project_plugin_mapping',
+                               wraps=nsx_db.get_project_plugin_mapping) as m:
+            for i in range(3):
+                self.assertEqual(
+                    self.plugin_type,
+                    self.core_plugin.get_plugin_type_from_project(
+                        self.context, self.project_id))
+            m.assert_called_once()
+        stats = self.core_plugin.get_plugin_mapping_cache_stats()
+        self.assertEqual(orig_hits + 2, stats['project_plugin']['hits'])
+
+    def test_project_plugin_mapping_added_concurrently(self):
+        project_id = _uuid()
+        other_type = [plugin_type for plugin_type, plugin in
+                      self.core_plugin.plugins.items()
+                      if plugin and
+                      plugin_type != self.core_plugin.default_plugin][0]
+
+        def _add_mapping(context, project_plugin_map, internal=False):
+            # Another worker mapped the project to another plugin meanwhile
+            nsx_db.add_project_plugin_mapping(
+                context.session, project_id, other_type)
+            raise projectpluginmap.ProjectPluginAlreadyExists(
+                project_id=project_id)
+
+        with mock.patch.object(self.core_plugin, 'create_project_plugin_map',
+                               side_effect=_add_mapping):
+            self.assertEqual(
+                other_type, self.core_plugin.get_plugin_type_from_project(
+                    self.context, project_id))
+        # The stored mapping is cached, not the default plugin
+        self.assertEqual(
+            other_type, self.core_plugin.get_plugin_type_from_project(
+                self.context, project_id))
+
+    def test_network_project_cache_invalidated_on_delete(self):
+        net_id = _uuid()
+        with mock.patch.object(self.sub_plugin, 'delete_network'),\
+            mock.patch.object(self.core_plugin, '_get_network',
+                              return_value={'tenant_id': self.project_id}
+                              ) as get_net:
+            for i in range(3):
+                self.assertEqual(
+                    self.sub_plugin,
+                    self.core_plugin._get_plugin_from_net_id(
+                        self.context, net_id))
+            get_net.assert_called_once()
+            self.core_plugin.delete_network(self.context, net_id)
+            self.core_plugin._get_plugin_from_net_id(self.context, net_id)
+            self.assertEqual(2, get_net.call_count)
+
+    def _save_network(self, project_id):
+        net_id = _uuid()
+        with self.context.session.begin(subtransactions=True):
+            self.context.session.add(models_v2.Network(
+                id=net_id, project_id=project_id))
+        return net_id
+
+    def test_get_plugins_from_net_ids(self):
+        other_project_id = _uuid()
+        other_type = [plugin_type for plugin_type, plugin in
+                      self.core_plugin.plugins.items()
+                      if plugin and
+                      plugin_type != self.core_plugin.default_plugin][0]
+        self.core_plugin.create_project_plugin_map(
+            self.context, {'project_plugin_map': {
+                'plugin': other_type, 'project': other_project_id}})
+        net_ids = [self._save_network(self.project_id),
+                   self._save_network(self.project_id),
+                   self._save_network(other_project_id)]
+        get_type = self.core_plugin.get_plugin_type_from_project
+        with mock.patch.object(self.core_plugin,
+                               'get_plugin_type_from_project',
+                               wraps=get_type) as get_type:
+            net_plugins = self.core_plugin._get_plugins_from_net_ids(
+                self.context, net_ids)
+        self.assertEqual({net_ids[0]: self.sub_plugin,
+                          net_ids[1]: self.sub_plugin,
+                          net_ids[2]: self.core_plugin.plugins[other_type]},
+                         net_plugins)
+        # The plugin is calculated once per project
+        self.assertEqual(2, get_type.call_count)
+
+    def test_get_plugins_from_net_ids_missing_mapping(self):
+        project_id = _uuid()
+        net_id = self._save_network(project_id)
+        net_plugins = self.core_plugin._get_plugins_from_net_ids(
+            self.context, [net_id, _uuid()])
+        # The project is mapped to the default plugin, and the unknown
+        # network is skipped
+        default_plugin = self.core_plugin.default_plugin
+        self.assertEqual({net_id: self.core_plugin.plugins[default_plugin]},
+                         net_plugins)
+        self.assertEqual(default_plugin, nsx_db.get_project_plugin_mapping(
+            self.context.session, project_id).plugin)
+
 
 class TestPluginWithNsxv(TestPluginWithDefaultPlugin):
     """Test TVD plugin with the NSX-V sub plugin"""
@@ -19,6 +19,7 @@ import copy
 import decorator
 
 from eventlet import greenthread
+import fixtures
 import mock
 import netaddr
 from neutron.db import securitygroups_db as sg_db
@@ -91,6 +92,7 @@ from vmware_nsx.plugins.nsx_v.vshield.common import exceptions as vcns_exc
 from vmware_nsx.plugins.nsx_v.vshield import edge_appliance_driver
 from vmware_nsx.plugins.nsx_v.vshield import edge_firewall_driver
 from vmware_nsx.plugins.nsx_v.vshield import edge_utils
+from vmware_nsx.plugins.nsx_v.vshield import securitygroup_utils
 from vmware_nsx.services.qos.nsx_v import utils as qos_utils
 from vmware_nsx.tests import unit as vmware
 from vmware_nsx.tests.unit.extensions import test_vnic_index
@@ -464,6 +466,23 @@ class TestNetworksV2(test_plugin.TestNetworksV2, NsxVPluginV2TestCase):
     def test_create_bridge_vlan_network(self):
         self._test_create_bridge_network(vlan_id=123)
 
+    def test_list_networks_db_queries_per_page(self):
+        """The number of DB queries should not depend on the networks count
+
+        The provider attributes, availability zones and QoS policies of the
+        listed networks are read in bulk.
+        """
+        p = directory.get_plugin()
+        ctx = context.get_admin_context()
+        with self.network(name='net1'):
+            with test_utils.count_db_queries() as queries:
+                self.assertEqual(1, len(p.get_networks(ctx)))
+            single_network_queries = len(queries)
+            with self.network(name='net2'), self.network(name='net3'):
+                with test_utils.count_db_queries() as queries:
+                    self.assertEqual(3, len(p.get_networks(ctx)))
+                self.assertLessEqual(len(queries), single_network_queries)
+
     def test_get_vlan_network_name(self):
         p = directory.get_plugin()
         net_id = uuidutils.generate_uuid()
@@ -2156,6 +2175,41 @@ class TestV2HTTPResponse(test_plugin.TestV2HTTPResponse, NsxVPluginV2TestCase):
     pass
 
 
+class TestConfigValidation(NsxVPluginV2TestCase):
+
+    def test_validate_config_cached(self):
+        cfg.CONF.set_override('lock_path',
+                              self.useFixture(fixtures.TempDir()).path,
+                              group='oslo_concurrency')
+        plugin = directory.get_plugin()
+        with mock.patch.object(self.fc2, 'get_dvs_list',
+                               return_value=['fake_dvs_id']) as get_dvs, \
+            mock.patch.object(self.fc2, 'validate_inventory',
+                              return_value=True) as validate_inventory:
+            plugin._validate_config()
+            inventory_calls = validate_inventory.call_count
+            plugin.existing_dvs = None
+            plugin._validate_config()
+            # The second worker reused the validation of the first one
+            get_dvs.assert_called_once_with()
+            self.assertEqual(inventory_calls, validate_inventory.call_count)
+            self.assertEqual(['fake_dvs_id'], plugin.existing_dvs)
+            # A different configuration is validated again
+            cfg.CONF.set_override('datastore_id', 'datastore-1',
+                                  group='nsxv')
+            plugin._validate_config()
+            self.assertEqual(2, get_dvs.call_count)
+
+    def test_validate_config_not_found(self):
+        cfg.CONF.set_override('config_validation_cache_ttl', 0,
+                              group='nsxv')
+        with mock.patch.object(self.fc2, 'validate_inventory',
+                               return_value=False):
+            plugin = directory.get_plugin()
+            self.assertRaises(nsxv_exc.NsxPluginException,
+                              plugin._validate_config)
+
+
 class TestL3ExtensionManager(object):
 
     def get_resources(self):
@@ -3957,6 +4011,45 @@ class NsxVTestSecurityGroup(ext_sg.TestSecurityGroups,
             self.assertEqual(2, len(ret['security_group_rules']))
             update_sect.assert_called_once()
 
+    def test_security_group_rules_section_updates_coalesced(self):
+        """Verify that pending section updates are applied together"""
+        plugin = directory.get_plugin()
+        _context = context.get_admin_context()
+        with self.security_group() as sg:
+            sg_id = sg['security_group']['id']
+            rules = []
+            for port in ('22', '23'):
+                rule = self._build_security_group_rule(
+                    sg_id, 'ingress', 'tcp', port, port, '10.0.0.1/24')
+                res = self._create_security_group_rule(self.fmt, rule)
+                rules.append(self.deserialize(
+                    self.fmt, res)['security_group_rule'])
+            nsx_rule_ids = [nsxv_db.get_nsx_rule_id(_context.session,
+                                                    rule['id'])
+                            for rule in rules]
+            section_uri = plugin._get_section_uri(_context.session, sg_id)
+
+            # Simulate an update queued by a concurrent request
+            queue = plugin.nsx_sg_update_queue
+            pending = securitygroup_utils._SectionUpdate(
+                removed_rule_ids=[nsx_rule_ids[0]])
+            queue._pending[section_uri].append(pending)
+
+            fake_update_sect = self.fc2.update_section
+            with mock.patch.object(plugin.nsx_v.vcns, 'update_section',
+                                   side_effect=fake_update_sect) as update,\
+                mock.patch.object(plugin.nsx_v.vcns,
+                                  'remove_rule_from_section') as rm_rule:
+                queue.update_section('rule-update-%s' % sg_id, section_uri,
+                                     removed_rule_ids=[nsx_rule_ids[1]])
+                update.assert_called_once()
+                rm_rule.assert_not_called()
+            self.assertTrue(pending.done)
+            self.assertIsNone(pending.error)
+            _h, c = self.fc2.get_section(section_uri)
+            self.assertEqual(
+                [], plugin.nsx_sg_utils.get_rule_id_pair_from_section(c))
+
     def test_create_security_group_rule_protocol_as_number_range(self):
         self.skipTest('not supported')
 
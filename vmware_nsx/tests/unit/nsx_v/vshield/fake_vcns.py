@@ -973,6 +973,8 @@ class FakeVcns(object):
                                                      'etag': 'Etag-0',
                                                      'rules': {}}
             self._sections['names'].add(section_name)
+            # The request replaces all the rules of the section
+            _section['rules'] = {}
             for rule in section.findall('rule'):
                 rule_id = str(self._sections['rule_ids'])
                 rule.attrib['id'] = rule_id
@@ -1005,6 +1007,8 @@ class FakeVcns(object):
             self._sections['names'].remove(_section['name'])
             _section['name'] = section_name
             self._sections['names'].add(section_name)
+            # The request replaces all the rules of the section
+            _section['rules'] = {}
             for rule in section.findall('rule'):
                 if not rule.attrib.get('id'):
                     rule.attrib['id'] = str(self._sections['rule_ids'])
@@ -1199,7 +1203,10 @@ class FakeVcns(object):
     def validate_network_name(self, object_id, name, during_init=False):
         return True
 
-    def validate_vdn_scope(self, object_id):
+    def get_vdn_scope_list(self):
+        return []
+
+    def validate_vdn_scope(self, object_id, scope_list=None):
         return True
 
     def get_dvs_list(self):
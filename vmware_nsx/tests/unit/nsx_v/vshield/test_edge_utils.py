@@ -13,6 +13,7 @@
 #    under the License.
 #
 
+import eventlet
 import mock
 from neutron_lib import constants
 from neutron_lib import context
@@ -24,6 +25,7 @@ from neutron.tests.unit import testlib_api
 from neutron_lib import exceptions as n_exc
 from vmware_nsx.common import config as conf
 from vmware_nsx.common import exceptions as nsx_exc
+from vmware_nsx.common import locking
 from vmware_nsx.common import nsxv_constants
 from vmware_nsx.db import nsxv_db
 from vmware_nsx.plugins.nsx_v import availability_zones as nsx_az
@@ -150,6 +152,230 @@ class EdgeDHCPManagerTestCase(EdgeUtilsTestCaseMixin):
             # a new DHCP edge is created.
             self.assertIsNone(selected_edge_id)
 
+    def _setup_dhcp_edge(self, network_id, edge_id='edge-1'):
+        nsxv_db.add_nsxv_router_binding(
+            self.ctx.session,
+            (vcns_const.DHCP_EDGE_PREFIX + network_id)[:36], edge_id, None,
+            constants.ACTIVE)
+        self.edge_manager.plugin = mock.Mock()
+
+    def _static_binding(self, port_id, mac_address, ip_address):
+        return {'macAddress': mac_address,
+                'hostname': port_id,
+                'ipAddress': ip_address}
+
+    def test_create_dhcp_bindings(self):
+        network_id = _uuid()
+        self._setup_dhcp_edge(network_id)
+        self.nsxv_manager.vcns.create_dhcp_binding.return_value = (
+            {'location': '/dhcp/config/bindings/binding-1'}, '')
+        binding = self._static_binding('port-1', 'fa:16:3e:00:00:01',
+                                       '10.0.0.3')
+        self.assertEqual(['binding-1'], self.edge_manager.create_dhcp_bindings(
+            self.ctx, 'port-1', network_id, [binding]))
+        self.nsxv_manager.vcns.create_dhcp_binding.assert_called_once_with(
+            'edge-1', binding)
+        self.assertFalse(
+            self.nsxv_manager.vcns.reconfigure_dhcp_service.called)
+        self.assertEqual('binding-1', nsxv_db.get_edge_dhcp_static_binding(
+            self.ctx.session, 'edge-1', 'fa:16:3e:00:00:01').binding_id)
+
+    def _use_distributed_lock(self):
+        cfg.CONF.set_override('locking_coordinator_url', 'fake://')
+        mock.patch.object(
+            locking.LockManager, '_get_lock_distributed',
+            side_effect=lambda name: locking.LockManager._get_lock_local(
+                name, external=True)).start()
+
+    def test_concurrent_dhcp_bindings_reconfigure(self):
+        network_id = _uuid()
+        self._setup_dhcp_edge(network_id)
+        self._use_distributed_lock()
+        nsxv_db.create_edge_dhcp_static_binding(
+            self.ctx.session, 'edge-1', 'fa:16:3e:00:00:10', 'binding-10')
+        existing = [
+            # Deleted
+            dict(self._static_binding('port-10', 'fa:16:3e:00:00:10',
+                                      '10.0.0.10'), bindingId='binding-10'),
+            # Conflicting with a new binding
+            dict(self._static_binding('port-11', 'fa:16:3e:00:00:11',
+                                      '10.0.0.3'), bindingId='binding-11'),
+            dict(self._static_binding('port-12', 'fa:16:3e:00:00:12',
+                                      '10.0.0.12'), bindingId='binding-12')]
+        bindings = [self._static_binding('port-%d' % i,
+                                         'fa:16:3e:00:00:0%d' % i,
+                                         '10.0.0.%d' % (i + 2))
+                    for i in range(1, 5)]
+        reconfigured = [dict(binding, bindingId='binding-%d' % i)
+                        for i, binding in enumerate(bindings, 1)]
+        self.nsxv_manager.vcns.query_dhcp_configuration.side_effect = [
+            ({}, {'staticBindings': {'staticBindings': existing}}),
+            ({}, {'staticBindings': {'staticBindings':
+                                     existing[2:] + reconfigured}})]
+        pool = eventlet.GreenPool()
+        creates = [pool.spawn(self.edge_manager.create_dhcp_bindings,
+                              self.ctx, binding['hostname'], network_id,
+                              [binding])
+                   for binding in bindings]
+        pool.spawn(self.edge_manager.delete_dhcp_binding, self.ctx,
+                   'port-10', network_id, 'fa:16:3e:00:00:10')
+        self.assertEqual([['binding-%d' % i] for i in range(1, 5)],
+                         [create.wait() for create in creates])
+        # All the changes were applied with a single update
+        self.assertFalse(self.nsxv_manager.vcns.create_dhcp_binding.called)
+        self.assertFalse(self.nsxv_manager.vcns.delete_dhcp_binding.called)
+        reconfigure = self.nsxv_manager.vcns.reconfigure_dhcp_service
+        reconfigure.assert_called_once_with(
+            'edge-1', {'featureType': 'dhcp_4.0',
+                       'enabled': True,
+                       'staticBindings': {'staticBindings':
+                                          existing[2:] + bindings}})
+        self.assertIsNone(nsxv_db.get_edge_dhcp_static_binding(
+            self.ctx.session, 'edge-1', 'fa:16:3e:00:00:10'))
+        self.assertEqual('binding-4', nsxv_db.get_edge_dhcp_static_binding(
+            self.ctx.session, 'edge-1', 'fa:16:3e:00:00:04').binding_id)
+
+    def test_concurrent_dhcp_bindings_local_lock(self):
+        network_id = _uuid()
+        self._setup_dhcp_edge(network_id)
+        other_binding = dict(self._static_binding(
+            'port-10', 'fa:16:3e:00:00:10', '10.0.0.10'),
+            bindingId='binding-10')
+        edge_bindings = []
+
+        def _create_binding(edge_id, binding):
+            if not edge_bindings:
+                # Another server adds a binding to the edge meanwhile
+                edge_bindings.append(other_binding)
+            binding_id = 'binding-%s' % binding['hostname'][-1]
+            edge_bindings.append(dict(binding, bindingId=binding_id))
+            return {'location': '/dhcp/config/bindings/%s' % binding_id}, ''
+
+        def _reconfigure(edge_id, request):
+            edge_bindings[:] = request['staticBindings']['staticBindings']
+
+        vcns = self.nsxv_manager.vcns
+        vcns.create_dhcp_binding.side_effect = _create_binding
+        vcns.reconfigure_dhcp_service.side_effect = _reconfigure
+        bindings = [self._static_binding('port-%d' % i,
+                                         'fa:16:3e:00:00:0%d' % i,
+                                         '10.0.0.%d' % (i + 2))
+                    for i in range(1, 5)]
+        pool = eventlet.GreenPool()
+        with mock.patch.object(locking.LockManager, 'get_lock',
+                               wraps=locking.LockManager.get_lock) as lock:
+            creates = [pool.spawn(self.edge_manager.create_dhcp_bindings,
+                                  self.ctx, binding['hostname'], network_id,
+                                  [binding])
+                       for binding in bindings]
+            self.assertEqual([['binding-%d' % i] for i in range(1, 5)],
+                             [create.wait() for create in creates])
+        # The changes were applied one by one, under a single edge lock
+        lock.assert_called_once_with('edge-1')
+        self.assertEqual(4, vcns.create_dhcp_binding.call_count)
+        self.assertFalse(vcns.reconfigure_dhcp_service.called)
+        self.assertIn(other_binding, edge_bindings)
+
+    def test_dhcp_bindings_change_failure(self):
+        network_id = _uuid()
+        self._setup_dhcp_edge(network_id)
+        self.nsxv_manager.vcns.create_dhcp_binding.side_effect = (
+            nsx_exc.NsxPluginException(err_msg='fake'))
+        binding = self._static_binding('port-1', 'fa:16:3e:00:00:01',
+                                       '10.0.0.3')
+        self.assertRaises(nsx_exc.NsxPluginException,
+                          self.edge_manager.create_dhcp_bindings,
+                          self.ctx, 'port-1', network_id, [binding])
+        # The edge is available to the next changes
+        self.nsxv_manager.vcns.create_dhcp_binding.side_effect = None
+        self.nsxv_manager.vcns.create_dhcp_binding.return_value = (
+            {'location': '/dhcp/config/bindings/binding-1'}, '')
+        self.assertEqual(['binding-1'], self.edge_manager.create_dhcp_bindings(
+            self.ctx, 'port-1', network_id, [binding]))
+
+    def test_update_dhcp_service_config(self):
+        subnets = [{'id': 'subnet-1', 'network_id': 'net-1',
+                    'enable_dhcp': True, 'gateway_ip': '10.0.0.1',
+                    'dns_nameservers': ['8.8.8.8'],
+                    'host_routes': [{'destination': '10.1.0.0/24',
+                                     'nexthop': '10.0.0.1'}]},
+                   {'id': 'subnet-2', 'network_id': 'net-2',
+                    'enable_dhcp': True, 'gateway_ip': '10.0.1.1',
+                    'dns_nameservers': [], 'host_routes': []}]
+        ports = [{'id': 'dhcp-port', 'device_owner': 'network:dhcp',
+                  'fixed_ips': [{'subnet_id': 'subnet-1',
+                                 'ip_address': '10.0.0.2'}]},
+                 {'id': 'port-1', 'device_owner': 'compute:nova',
+                  'mac_address': 'fa:16:3e:00:00:01',
+                  'fixed_ips': [{'subnet_id': 'subnet-1',
+                                 'ip_address': '10.0.0.3'}]},
+                 {'id': 'port-2', 'device_owner': 'compute:nova',
+                  'mac_address': 'fa:16:3e:00:00:02',
+                  'fixed_ips': [{'subnet_id': 'subnet-2',
+                                 'ip_address': '10.0.1.3'}]}]
+        plugin = self.edge_manager.nsxv_plugin
+        plugin.get_subnets.return_value = subnets
+        plugin.get_ports.return_value = ports
+        plugin.is_dhcp_metadata.side_effect = (
+            lambda context, subnet_id, subnet=None: subnet_id == 'subnet-1')
+        self.nsxv_manager.vcns.query_dhcp_configuration.return_value = (
+            {}, {'staticBindings': {'staticBindings': [
+                {'macAddress': 'FA:16:3E:00:00:01', 'bindingId': 'binding-1'},
+                {'macAddress': 'FA:16:3E:00:00:02',
+                 'bindingId': 'binding-2'}]}})
+        nsxv_db.create_edge_dhcp_static_binding(
+            self.ctx.session, 'edge-1', 'fa:16:3e:00:00:10', 'binding-10')
+        vnic_bindings = [mock.Mock(network_id='net-1'),
+                         mock.Mock(network_id='net-2')]
+        sub_bindings = [mock.Mock(subnet_id='subnet-1',
+                                  dns_search_domain='example.org',
+                                  dhcp_mtu=1400)]
+        with mock.patch.object(nsxv_db, 'get_edge_vnic_bindings_by_edge',
+                               return_value=vnic_bindings), \
+            mock.patch.object(nsxv_db, 'get_nsxv_subnets_ext_attributes',
+                              return_value=sub_bindings):
+            self.edge_manager.update_dhcp_service_config(self.ctx, 'edge-1')
+        # The ports of all the networks were read at once
+        plugin.get_ports.assert_called_once_with(mock.ANY, filters={
+            'network_id': mock.ANY})
+        self.assertEqual(
+            ['net-1', 'net-2'],
+            sorted(plugin.get_ports.call_args[1]['filters']['network_id']))
+        self.assertFalse(plugin._get_subnet.called)
+        self.assertFalse(plugin._get_dhcp_ip_addr_from_subnet.called)
+        lease_time = cfg.CONF.nsxv.dhcp_lease_time
+        reconfigure = self.nsxv_manager.vcns.reconfigure_dhcp_service
+        reconfigure.assert_called_once_with(
+            'edge-1', {'featureType': 'dhcp_4.0',
+                       'enabled': True,
+                       'staticBindings': {'staticBindings': [
+                           {'macAddress': 'fa:16:3e:00:00:01',
+                            'hostname': 'port-1',
+                            'leaseTime': lease_time,
+                            'ipAddress': '10.0.0.3',
+                            'defaultGateway': '10.0.0.1',
+                            'primaryNameServer': '8.8.8.8',
+                            'domainName': 'example.org',
+                            'dhcpOptions': {
+                                'option26': 1400,
+                                'option121': {'staticRoutes': [
+                                    {'destinationSubnet':
+                                     '169.254.169.254/32',
+                                     'router': '10.0.0.2'},
+                                    {'destinationSubnet': '10.1.0.0/24',
+                                     'router': '10.0.0.1'}]}}},
+                           {'macAddress': 'fa:16:3e:00:00:02',
+                            'hostname': 'port-2',
+                            'leaseTime': lease_time,
+                            'ipAddress': '10.0.1.3',
+                            'defaultGateway': '10.0.1.1'}]}})
+        self.assertEqual(
+            [('fa:16:3e:00:00:01', 'binding-1'),
+             ('fa:16:3e:00:00:02', 'binding-2')],
+            sorted((binding.mac_address, binding.binding_id) for binding in
+                   nsxv_db.get_dhcp_static_bindings_by_edge(
+                       self.ctx.session, 'edge-1')))
+
 
 class EdgeUtilsTestCase(EdgeUtilsTestCaseMixin):
 
@@ -25,10 +25,15 @@ from vmware_nsx.common import exceptions as nsxv_exc
 from vmware_nsx.plugins.nsx_v import availability_zones as nsx_az
 from vmware_nsx.plugins.nsx_v.vshield.common import (
     constants as vcns_const)
+from vmware_nsx.plugins.nsx_v.vshield.common import (
+    exceptions as vcns_exc)
+from vmware_nsx.plugins.nsx_v.vshield.common import VcnsApiClient
 from vmware_nsx.plugins.nsx_v.vshield import edge_appliance_driver as e_drv
+from vmware_nsx.plugins.nsx_v.vshield import edge_inventory
 from vmware_nsx.plugins.nsx_v.vshield.tasks import (
     constants as ts_const)
 from vmware_nsx.plugins.nsx_v.vshield.tasks import tasks as ts
+from vmware_nsx.plugins.nsx_v.vshield import vcns
 from vmware_nsx.plugins.nsx_v.vshield import vcns_driver
 from vmware_nsx.tests import unit as vmware
 from vmware_nsx.tests.unit.nsx_v.vshield import fake_vcns
@@ -288,6 +293,54 @@ class VcnsDriverTaskManagerTestCase(base.BaseTestCase):
             greenthread.sleep(0)
         self.assertFalse(manager.has_pending_task())
 
+    def test_task_manager_status_check_not_delayed(self):
+        manager = ts.TaskManager(shards=1).start(100)
+        self.addCleanup(manager.stop)
+        userdata = {'checked': False}
+
+        def _pending_exec(task):
+            return ts_const.TaskStatus.PENDING
+
+        def _status(task):
+            task.userdata['checked'] = True
+            return ts_const.TaskStatus.COMPLETED
+
+        def _slow_exec(task):
+            # The status of the pending task is checked meanwhile
+            for i in range(100):
+                if task.userdata['checked']:
+                    return ts_const.TaskStatus.COMPLETED
+                greenthread.sleep(0.01)
+            return ts_const.TaskStatus.ERROR
+
+        pending_task = ts.Task('pending', 'res-1', _pending_exec,
+                               status_callback=_status, userdata=userdata)
+        slow_task = ts.Task('slow', 'res-2', _slow_exec, userdata=userdata)
+        manager.add(pending_task)
+        manager.add(slow_task)
+        slow_task.wait(ts_const.TaskState.RESULT)
+        pending_task.wait(ts_const.TaskState.RESULT)
+        self.assertEqual(ts_const.TaskStatus.COMPLETED, slow_task.status)
+        self.assertEqual(ts_const.TaskStatus.COMPLETED, pending_task.status)
+
+    def test_task_manager_stats(self):
+        manager = ts.TaskManager(shards=2).start(100)
+        self.addCleanup(manager.stop)
+
+        def _exec(task):
+            return ts_const.TaskStatus.COMPLETED
+
+        tasks = [ts.Task('name', 'res-%d' % i, _exec) for i in range(10)]
+        for task in tasks:
+            manager.add(task)
+        for task in tasks:
+            task.wait(ts_const.TaskState.RESULT)
+        stats = manager.stats()
+        self.assertEqual(2, len(stats))
+        self.assertEqual(10, sum(shard['executed'] for shard in stats))
+        for shard in stats:
+            self.assertEqual(0, shard['queue_depth'])
+
 
 class VcnsDriverTestCase(base.BaseTestCase):
 
@@ -590,3 +643,127 @@ class VcnsDriverHATestCase(VcnsDriverTestCase):
         self.assertEqual(self._data_store, found_app[0]['datastoreId'])
         self.assertEqual(self._ha_data_store, found_app[1]['datastoreId'])
         return self.vcns_driver.vcns.orig_deploy(request)
+
+
+class VcnsRequestTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(VcnsRequestTestCase, self).setUp()
+        self.vcns = vcns.Vcns(None, None, None, None, True)
+        self.records = []
+        self.vcns.add_call_observer(self.records.append)
+
+    def test_do_request_call_record(self):
+        with mock.patch.object(self.vcns.jsonapi_client, 'request',
+                               return_value=({}, '{"id": "edge-1"}')):
+            header, content = self.vcns.do_request(
+                vcns.HTTP_GET, '/api/4.0/edges/edge-1?async=true')
+        self.assertEqual({'id': 'edge-1'}, content)
+        self.assertEqual(1, len(self.records))
+        record = self.records[0]
+        self.assertEqual(vcns.HTTP_GET, record.method)
+        self.assertEqual('/api/4.0/edges/{id}', record.uri)
+        self.assertIsNone(record.status)
+        self.assertEqual(16, record.bytes)
+
+    def test_do_request_failure_call_record(self):
+        error = vcns_exc.ResourceNotFound(uri='/api/4.0/edges/edge-1',
+                                          status=404, response='missing')
+        with mock.patch.object(self.vcns.jsonapi_client, 'request',
+                               side_effect=error):
+            self.assertRaises(vcns_exc.ResourceNotFound,
+                              self.vcns.do_request,
+                              vcns.HTTP_DELETE, '/api/4.0/edges/edge-1')
+        self.assertEqual(404, self.records[0].status)
+        self.assertEqual(7, self.records[0].bytes)
+
+    def test_do_request_no_debug_rendering(self):
+        with mock.patch.object(self.vcns.jsonapi_client, 'request',
+                               return_value=({}, '')),\
+            mock.patch.object(vcns.LOG, 'isEnabledFor', return_value=False),\
+            mock.patch.object(vcns, '_format_body_for_log') as format_body:
+            self.vcns.do_request(vcns.HTTP_PUT, '/api/4.0/edges/edge-1',
+                                 {'name': 'edge'})
+        format_body.assert_not_called()
+
+    def test_get_edges_pages(self):
+        def fake_get_edges(startindex=0):
+            data = [{'id': 'edge-%d' % i}
+                    for i in range(startindex, min(startindex + 2, 5))]
+            return {}, {'edgePage': {
+                'data': data,
+                'pagingInfo': {'pageSize': 2, 'totalCount': 5}}}
+
+        with mock.patch.object(self.vcns, '_get_edges',
+                               side_effect=fake_get_edges) as get_edges:
+            edges = self.vcns.get_edges()
+        self.assertEqual(['edge-%d' % i for i in range(5)],
+                         [edge['id'] for edge in edges])
+        self.assertEqual(3, get_edges.call_count)
+
+    def test_format_body_for_log_truncated(self):
+        cfg.CONF.set_override('api_log_max_body_length', 10, group='nsxv')
+        body = vcns._format_body_for_log({'password': 'secret',
+                                          'name': 'x' * 20}, mask=True)
+        self.assertTrue(body.startswith('{"'))
+        self.assertIn('more characters', body)
+        self.assertNotIn('secret', body)
+
+
+class XmlDumpsTestCase(base.BaseTestCase):
+
+    def test_xmldumps(self):
+        obj = {'routing': {
+            '_version': '2',
+            'enabled': True,
+            '__rules': {'rule': {'_id': '1', 'name': 'a'}},
+            '@neighbours': [{'neighbour': '10.0.0.1'}],
+            'peers': [{'_type': 'bgp', 'peer': '10.0.0.2'}]}}
+        self.assertEqual(
+            '<routing version="2"><enabled>True</enabled>'
+            '<rule id="1"><name>a</name></rule>'
+            '<neighbour>10.0.0.1</neighbour>'
+            '<peers type="bgp"><peer>10.0.0.2</peer></peers></routing>',
+            VcnsApiClient.xmldumps(obj))
+
+    def test_xml_api_helper(self):
+        helper = VcnsApiClient.VcnsApiHelper('https://1.1.1.1', 'admin',
+                                             'default', format='xml')
+        self.assertEqual('<enabled>True</enabled>',
+                         helper.encode({'enabled': True}))
+
+
+class EdgeInventoryTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(EdgeInventoryTestCase, self).setUp()
+        self.vcns = mock.Mock()
+        self.vcns.get_edges.return_value = [
+            {'id': 'edge-1', 'edgeStatus': 'GREEN'},
+            {'id': 'edge-2', 'edgeStatus': 'RED'}]
+
+    def test_snapshot_shared(self):
+        inventory = edge_inventory.EdgeInventory(self.vcns, 60)
+        self.assertEqual(2, len(inventory.get_edges()))
+        self.assertEqual('RED', inventory.get_edge('edge-2')['edgeStatus'])
+        self.assertIsNone(inventory.get_edge('edge-3'))
+        self.assertEqual(1, self.vcns.get_edges.call_count)
+        inventory.invalidate()
+        inventory.get_edges()
+        self.assertEqual(2, self.vcns.get_edges.call_count)
+
+    def test_incremental_updates(self):
+        inventory = edge_inventory.EdgeInventory(self.vcns, 60)
+        inventory.get_edges()
+        inventory.update_edge_status('edge-2', 'GREEN')
+        inventory.remove_edge('edge-1')
+        self.assertEqual([{'id': 'edge-2', 'edgeStatus': 'GREEN'}],
+                         inventory.get_edges())
+        self.assertEqual(1, self.vcns.get_edges.call_count)
+
+    def test_snapshot_disabled(self):
+        inventory = edge_inventory.EdgeInventory(self.vcns, 0)
+        self.assertIsNone(inventory.get_edge('edge-1'))
+        inventory.get_edges()
+        inventory.get_edges()
+        self.assertEqual(2, self.vcns.get_edges.call_count)
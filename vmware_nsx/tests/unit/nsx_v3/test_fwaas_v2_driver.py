@@ -203,10 +203,10 @@ class Nsxv3FwaasTestCase(test_v3_plugin.NsxV3PluginTestCaseMixin):
                                return_value=[port]),\
             mock.patch.object(self.plugin, 'get_port',
                               return_value=port),\
-            mock.patch.object(self.plugin.fwaas_callbacks, 'get_port_fwg',
-                              return_value=firewall),\
-            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_id",
-                       return_value=(FAKE_NSX_LS_ID, 0)),\
+            mock.patch.object(self.plugin.fwaas_callbacks, 'get_ports_fwgs',
+                              return_value={FAKE_PORT_ID: firewall}),\
+            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_ids",
+                       return_value={FAKE_PORT_ID: (FAKE_NSX_LS_ID, 0)}),\
             mock.patch("vmware_nsxlib.v3.security.NsxLibFirewallSection."
                        "update") as update_fw:
             self.firewall.create_firewall_group('nsx', apply_list, firewall)
@@ -238,10 +238,10 @@ class Nsxv3FwaasTestCase(test_v3_plugin.NsxV3PluginTestCaseMixin):
                                return_value=[port]),\
             mock.patch.object(self.plugin, 'get_port',
                               return_value=port),\
-            mock.patch.object(self.plugin.fwaas_callbacks, 'get_port_fwg',
-                              return_value=firewall),\
-            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_id",
-                       return_value=(FAKE_NSX_LS_ID, 0)),\
+            mock.patch.object(self.plugin.fwaas_callbacks, 'get_ports_fwgs',
+                              return_value={FAKE_PORT_ID: firewall}),\
+            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_ids",
+                       return_value={FAKE_PORT_ID: (FAKE_NSX_LS_ID, 0)}),\
             mock.patch("vmware_nsxlib.v3.security.NsxLibFirewallSection."
                        "update") as update_fw:
             func('nsx', apply_list, firewall)
@@ -295,10 +295,10 @@ class Nsxv3FwaasTestCase(test_v3_plugin.NsxV3PluginTestCaseMixin):
                                return_value=[port]),\
             mock.patch.object(self.plugin, 'get_port',
                               return_value=port),\
-            mock.patch.object(self.plugin.fwaas_callbacks, 'get_port_fwg',
-                              return_value=firewall),\
-            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_id",
-                       return_value=(FAKE_NSX_LS_ID, 0)):
+            mock.patch.object(self.plugin.fwaas_callbacks, 'get_ports_fwgs',
+                              return_value={FAKE_PORT_ID: firewall}),\
+            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_ids",
+                       return_value={FAKE_PORT_ID: (FAKE_NSX_LS_ID, 0)}):
             self.assertRaises(exceptions.FirewallInternalDriverError,
                               self.firewall.create_firewall_group, 'nsx',
                               apply_list, firewall)
@@ -309,10 +309,10 @@ class Nsxv3FwaasTestCase(test_v3_plugin.NsxV3PluginTestCaseMixin):
         port = {'id': FAKE_PORT_ID}
         with mock.patch.object(self.plugin, '_get_router_interfaces',
                                return_value=[port]),\
-            mock.patch.object(self.plugin.fwaas_callbacks, 'get_port_fwg',
-                              return_value=None),\
-            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_id",
-                       return_value=(FAKE_NSX_LS_ID, 0)),\
+            mock.patch.object(self.plugin.fwaas_callbacks, 'get_ports_fwgs',
+                              return_value={}),\
+            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_ids",
+                       return_value={FAKE_PORT_ID: (FAKE_NSX_LS_ID, 0)}),\
             mock.patch("vmware_nsxlib.v3.security.NsxLibFirewallSection."
                        "update") as update_fw:
             self.firewall.delete_firewall_group('nsx', apply_list, firewall)
@@ -342,10 +342,10 @@ class Nsxv3FwaasTestCase(test_v3_plugin.NsxV3PluginTestCaseMixin):
                               return_value=port),\
             mock.patch.object(self.plugin, '_get_port_relay_servers',
                               return_value=[relay_server]),\
-            mock.patch.object(self.plugin.fwaas_callbacks, 'get_port_fwg',
-                              return_value=firewall),\
-            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_id",
-                       return_value=(FAKE_NSX_LS_ID, 0)),\
+            mock.patch.object(self.plugin.fwaas_callbacks, 'get_ports_fwgs',
+                              return_value={FAKE_PORT_ID: firewall}),\
+            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_ids",
+                       return_value={FAKE_PORT_ID: (FAKE_NSX_LS_ID, 0)}),\
             mock.patch("vmware_nsxlib.v3.security.NsxLibFirewallSection."
                        "update") as update_fw:
             self.firewall.create_firewall_group('nsx', apply_list, firewall)
@@ -384,3 +384,86 @@ class Nsxv3FwaasTestCase(test_v3_plugin.NsxV3PluginTestCaseMixin):
             update_fw.assert_called_once_with(
                 MOCK_SECTION_ID,
                 rules=expected_rules)
+
+    def test_update_router_firewall_differential(self):
+        callbacks = self.plugin.fwaas_callbacks
+        firewall = self._fake_empty_firewall_group()
+        other_port_id = 'other_port_uuid'
+        ports = [{'id': FAKE_PORT_ID}, {'id': other_port_id}]
+        nsxlib = mock.Mock()
+        nsxlib.firewall_section.update.return_value = {
+            '_revision': 1,
+            'rules': [{'id': 'rule%s' % i} for i in range(5)]}
+        nsxlib.firewall_section.get.return_value = {'_revision': 1}
+        context = mock.Mock()
+        with mock.patch.object(callbacks, 'get_ports_fwgs',
+                               return_value={FAKE_PORT_ID: firewall,
+                                             other_port_id: firewall}),\
+            mock.patch.object(self.plugin, '_get_port_relay_servers',
+                              return_value=[]),\
+            mock.patch("vmware_nsx.db.db.get_nsx_switch_and_port_ids",
+                       return_value={FAKE_PORT_ID: (FAKE_NSX_LS_ID, 0)}):
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports, MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(1, nsxlib.firewall_section.update.call_count)
+
+            # Nothing changed: the section should not be rewritten
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports, MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(1, nsxlib.firewall_section.update.call_count)
+
+            # Removed port: only its rules should be deleted
+            nsxlib.firewall_section.get.side_effect = [{'_revision': 1},
+                                                       {'_revision': 3}]
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports[:1], MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(1, nsxlib.firewall_section.update.call_count)
+            nsxlib.firewall_section.delete_rule.assert_has_calls([
+                mock.call(MOCK_SECTION_ID, 'rule2'),
+                mock.call(MOCK_SECTION_ID, 'rule3')])
+
+            # Added port: only its rules should be added
+            nsxlib.firewall_section.get.side_effect = [{'_revision': 3},
+                                                       {'_revision': 4}]
+            nsxlib.firewall_section.add_rules.return_value = {
+                'rules': [{'id': 'rule5'}, {'id': 'rule6'}]}
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports, MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(1, nsxlib.firewall_section.update.call_count)
+            nsxlib.firewall_section.add_rules.assert_called_once_with(
+                mock.ANY, MOCK_SECTION_ID,
+                operation=consts.FW_INSERT_TOP)
+            self.assertEqual(
+                2, len(nsxlib.firewall_section.add_rules.call_args[0][0]))
+
+            # Removed again: the added rules should be deleted
+            nsxlib.firewall_section.delete_rule.reset_mock()
+            nsxlib.firewall_section.get.side_effect = [{'_revision': 4},
+                                                       {'_revision': 6}]
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports[:1], MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(1, nsxlib.firewall_section.update.call_count)
+            nsxlib.firewall_section.delete_rule.assert_has_calls([
+                mock.call(MOCK_SECTION_ID, 'rule5'),
+                mock.call(MOCK_SECTION_ID, 'rule6')])
+
+            # The section was changed during the update: rewrite it
+            nsxlib.firewall_section.get.side_effect = [{'_revision': 6},
+                                                       {'_revision': 8}]
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports, MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(2, nsxlib.firewall_section.update.call_count)
+
+            # The section was changed by someone else: rewrite it
+            nsxlib.firewall_section.get.side_effect = None
+            nsxlib.firewall_section.get.return_value = {'_revision': 4}
+            callbacks.update_router_firewall(
+                context, nsxlib, FAKE_ROUTER_ID, ports[:1], MOCK_NSX_ID,
+                MOCK_SECTION_ID)
+            self.assertEqual(3, nsxlib.firewall_section.update.call_count)
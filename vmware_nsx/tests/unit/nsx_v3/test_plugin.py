@@ -62,6 +62,7 @@ from vmware_nsx.plugins.nsx_v3 import plugin as nsx_plugin
 from vmware_nsx.services.lbaas.nsx_v3.v2 import lb_driver_v2
 from vmware_nsx.tests import unit as vmware
 from vmware_nsx.tests.unit.extensions import test_metadata
+from vmware_nsx.tests.unit import test_utils
 from vmware_nsxlib.tests.unit.v3 import mocks as nsx_v3_mocks
 from vmware_nsxlib.tests.unit.v3 import nsxlib_testcase
 from vmware_nsxlib.v3 import exceptions as nsxlib_exc
@@ -1431,26 +1432,46 @@ class TestPortsV2(test_plugin.TestPortsV2, NsxV3PluginTestCaseMixin,
 
     def test_list_ports_while_deleting(self):
         self.plugin = directory.get_plugin()
-        orig_get_port = self.plugin._get_port
+        orig_get_ports_models = self.plugin._get_ports_models
 
-        class local(object):
-            counter = 0
-
-        def mock_get_port(*args):
-            #global counter
-            local.counter += 1
-            if local.counter == 3:
-                raise n_exc.PortNotFound(port_id=args[1])
-            return orig_get_port(*args)
+        def mock_get_ports_models(context, port_ids):
+            # "delete" one of the ports before its model is fetched
+            models = orig_get_ports_models(context, port_ids)
+            models.pop(sorted(models)[0])
+            return models
 
         self.plugin = directory.get_plugin()
         with self.port(), self.port(), self.port(), self.port() as p:
             tenid = p['port']['tenant_id']
             # get all ports, while "deleting" one of them:
-            with mock.patch.object(self.plugin, "_get_port",
-                                   side_effect=mock_get_port):
+            with mock.patch.object(self.plugin, "_get_ports_models",
+                                   side_effect=mock_get_ports_models):
                 self._get_ports_with_fields(tenid, None, 3)
 
+    def test_list_ports_db_queries_per_page(self):
+        """The number of DB queries should not depend on the ports count"""
+        self.plugin = directory.get_plugin()
+        ctx = context.get_admin_context()
+        with self.network() as net:
+            net_id = net['network']['id']
+            filters = {'network_id': [net_id]}
+            with self.port(network=net):
+                with test_utils.count_db_queries() as queries:
+                    self.assertEqual(1, len(self.plugin.get_ports(
+                        ctx, filters=filters)))
+                single_port_queries = len(queries)
+                with self.port(network=net), self.port(network=net),\
+                    self.port(network=net),\
+                    mock.patch.object(self.plugin, '_get_port') as get_port,\
+                    mock.patch.object(self.plugin,
+                                      '_get_network_nsx_id') as get_nsx_id:
+                    with test_utils.count_db_queries() as queries:
+                        self.assertEqual(4, len(self.plugin.get_ports(
+                            ctx, filters=filters)))
+                    get_port.assert_not_called()
+                    get_nsx_id.assert_not_called()
+                    self.assertLessEqual(len(queries), single_port_queries)
+
     def test_list_ports_filtered_by_security_groups(self):
         ctx = context.get_admin_context()
         with self.port() as port1, self.port() as port2:
@@ -26,6 +26,7 @@ from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
 
 from vmware_nsx.common import exceptions as exc
+from vmware_nsx.common import nsxv_constants
 from vmware_nsx.db import nsxv_db
 from vmware_nsx.plugins.nsx_v.drivers import (
     shared_router_driver as router_driver)
@@ -287,3 +288,29 @@ class TestNSXvBgpPlugin(test_plugin.NsxVPluginV2TestCase,
                                       self.context,
                                       speaker['id'],
                                       {'bgp_peer_id': 'aaa'})
+
+    def test_get_routers_edge_info(self):
+        session = self.context.session
+        nsxv_db.add_nsxv_router_binding(session, 'shared-rtr', 'edge-1',
+                                        None, 'ACTIVE')
+        nsxv_db.add_nsxv_router_binding(
+            session, 'tlr', 'edge-2', 'lswitch-1', 'ACTIVE',
+            edge_type=nsxv_constants.VDR_EDGE)
+        nsxv_db.add_nsxv_router_binding(session, 'plr', 'edge-3',
+                                        None, 'ACTIVE')
+        nsxv_db.create_edge_vnic_binding(session, 'edge-3', 1, 'lswitch-1')
+        nsxv_db.add_nsxv_router_binding(
+            session, 'lonely-tlr', 'edge-4', 'lswitch-2', 'ACTIVE',
+            edge_type=nsxv_constants.VDR_EDGE)
+        router_ids = ['shared-rtr', 'tlr', 'lonely-tlr', 'no-edge-rtr']
+        self.assertEqual(
+            {'shared-rtr': ('edge-1', False), 'tlr': ('edge-3', True)},
+            self.nsxv_driver._get_routers_edge_info(self.context,
+                                                    router_ids))
+        # The result should match the per router resolution
+        for router_id in router_ids:
+            self.assertEqual(
+                self.nsxv_driver._get_router_edge_info(self.context,
+                                                       router_id),
+                self.nsxv_driver._get_routers_edge_info(
+                    self.context, [router_id]).get(router_id, (None, None)))
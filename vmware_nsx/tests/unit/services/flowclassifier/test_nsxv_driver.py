@@ -12,16 +12,22 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import xml.etree.ElementTree as et
+
+import eventlet
 import mock
 from oslo_config import cfg
 from oslo_utils import importutils
 
+from vmware_nsx.plugins.nsx_v.vshield.common import exceptions as vcns_exc
 from vmware_nsx.services.flowclassifier.nsx_v import driver as nsx_v_driver
+from vmware_nsx.services.flowclassifier.nsx_v import redirect_section
 from vmware_nsx.tests import unit as vmware
 from vmware_nsx.tests.unit.nsx_v.vshield import fake_vcns
 
 from neutron.api import extensions as api_ext
 from neutron.common import config
+from neutron.tests import base as n_base
 from neutron_lib.api.definitions import portbindings
 from neutron_lib import context
 from neutron_lib.plugins import directory
@@ -268,3 +274,105 @@ class TestNsxvFlowClassifierDriver(
                 section = mock_update_section.call_args[0][0]
                 # make sure the rule is not there
                 self.assertIsNone(section.find('rule'))
+
+    def test_update_flow_classifier_uses_local_section(self):
+        with self.flow_classifier(flow_classifier=self._fc) as fc:
+            fc_context = fc_ctx.FlowClassifierContext(
+                self.flowclassifier_plugin, self.ctx,
+                fc['flow_classifier']
+            )
+            self.driver.create_flow_classifier(fc_context)
+            with mock.patch.object(self.fc2, 'get_section') as mock_get:
+                self.driver.update_flow_classifier(fc_context)
+                self.driver.delete_flow_classifier(fc_context)
+                # The section is not read again from the backend
+                mock_get.assert_not_called()
+
+
+class TestRedirectSectionManager(n_base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRedirectSectionManager, self).setUp()
+        self.etag = 0
+        self.get_func = mock.Mock(side_effect=self._get_section)
+        self.update_func = mock.Mock(side_effect=self._update_section)
+        self.manager = redirect_section.RedirectSectionManager(
+            self.get_func, self.update_func, mock.MagicMock)
+
+    def _get_section(self):
+        return {'etag': 'Etag-%s' % self.etag}, '<section id="1"/>'
+
+    def _update_section(self, section, headers):
+        self.etag += 1
+        return {'etag': 'Etag-%s' % self.etag}, et.tostring(section)
+
+    def _add_rule(self, name):
+        def add_rule(section):
+            et.SubElement(section, 'rule').text = name
+            return True
+        return add_rule
+
+    def _get_rules(self, section):
+        return [rule.text for rule in section.iter('rule')]
+
+    def test_apply_batches_changes(self):
+        threads = [eventlet.spawn(self.manager.apply, self._add_rule(name))
+                   for name in ('rule1', 'rule2', 'rule3')]
+        for thread in threads:
+            thread.wait()
+        self.get_func.assert_called_once_with()
+        self.update_func.assert_called_once_with(mock.ANY,
+                                                 {'etag': 'Etag-0'})
+        section = self.update_func.call_args[0][0]
+        self.assertEqual(['rule1', 'rule2', 'rule3'],
+                         self._get_rules(section))
+
+        # The next change is applied to the local copy, with its ETag
+        self.manager.apply(self._add_rule('rule4'))
+        self.get_func.assert_called_once_with()
+        self.update_func.assert_called_with(mock.ANY, {'etag': 'Etag-1'})
+        section = self.update_func.call_args[0][0]
+        self.assertEqual(['rule1', 'rule2', 'rule3', 'rule4'],
+                         self._get_rules(section))
+
+    def test_apply_failed_change(self):
+        def bad_change(section):
+            raise vcns_exc.VcnsGeneralException('bad change')
+
+        bad = eventlet.spawn(self.manager.apply, bad_change)
+        good = eventlet.spawn(self.manager.apply, self._add_rule('rule1'))
+        self.assertRaises(vcns_exc.VcnsGeneralException, bad.wait)
+        good.wait()
+        self.update_func.assert_called_once_with(mock.ANY,
+                                                 {'etag': 'Etag-0'})
+
+    def test_apply_unmodified_section(self):
+        self.manager.apply(lambda section: False)
+        self.get_func.assert_called_once_with()
+        self.update_func.assert_not_called()
+
+    def test_apply_etag_mismatch(self):
+        self.manager.apply(self._add_rule('rule1'))
+        conflict = vcns_exc.VcnsApiException(
+            status=redirect_section.PRECONDITION_FAILED, header={},
+            uri='uri', response='')
+        self.update_func.side_effect = [conflict, (
+            {'etag': 'Etag-2'}, '<section id="1"><rule>rule2</rule>'
+                                '</section>')]
+        self.etag = 1
+        self.manager.apply(self._add_rule('rule2'))
+        # The section was read again and the change applied to it
+        self.assertEqual(2, self.get_func.call_count)
+        self.update_func.assert_called_with(mock.ANY, {'etag': 'Etag-1'})
+
+    def test_apply_update_failure(self):
+        self.manager.apply(self._add_rule('rule1'))
+        self.update_func.side_effect = vcns_exc.VcnsApiException(
+            status=500, header={}, uri='uri', response='')
+        self.assertRaises(vcns_exc.VcnsApiException, self.manager.apply,
+                          self._add_rule('rule2'))
+        self.assertEqual(1, self.get_func.call_count)
+        # The local copy is dropped, and the section read again
+        self.update_func.side_effect = self._update_section
+        self.manager.apply(self._add_rule('rule2'))
+        self.assertEqual(2, self.get_func.call_count)
@@ -0,0 +1,136 @@
+# Copyright 2018 VMware, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import netaddr
+
+from neutron.ipam import exceptions as ipam_exc
+from neutron.tests import base
+
+from vmware_nsx.services.ipam.common import reserve
+
+
+class IpPoolReserveTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IpPoolReserveTestCase, self).setUp()
+        self.free = [str(ip) for ip in netaddr.IPRange('10.0.0.2',
+                                                       '10.0.0.20')]
+        self.released = []
+        # Run the background refill synchronously
+        mock.patch.object(reserve.eventlet, 'spawn_n',
+                          side_effect=lambda func: func()).start()
+        self.spawn_after = mock.patch.object(
+            reserve.eventlet, 'spawn_after').start()
+        self.reserve = reserve.IpPoolReserve('pool-1', 4)
+
+    def _allocate(self):
+        if not self.free:
+            raise ipam_exc.IpAddressGenerationFailure(subnet_id='subnet-1')
+        return self.free.pop(0)
+
+    def _allocate_from_reserve(self):
+        return self.reserve.allocate(self._allocate, self.released.append)
+
+    def test_allocate_from_reserve(self):
+        self.assertEqual('10.0.0.2', self._allocate_from_reserve())
+        # The first allocation filled the reserve in the background
+        self.assertEqual(4, len(self.reserve))
+        self.assertEqual('10.0.0.3', self._allocate_from_reserve())
+        self.assertEqual(3, len(self.reserve))
+        self.assertEqual(14, len(self.free))
+        self.spawn_after.assert_called_once_with(
+            reserve.RESERVE_IDLE_TIMEOUT, self.reserve._release_idle)
+
+    def test_take_reserved_ip(self):
+        self._allocate_from_reserve()
+        self.assertTrue(self.reserve.take('10.0.0.4'))
+        self.assertFalse(self.reserve.take('10.0.0.4'))
+        self.assertFalse(self.reserve.take('10.0.0.1'))
+        self.assertFalse(self.reserve.take('10.0.0.10'))
+        self.assertEqual(3, len(self.reserve))
+
+    def test_exhausted_pool(self):
+        self.free = self.free[:3]
+        self.assertEqual('10.0.0.2', self._allocate_from_reserve())
+        self.assertEqual('10.0.0.3', self._allocate_from_reserve())
+        self.assertEqual('10.0.0.4', self._allocate_from_reserve())
+        self.assertRaises(ipam_exc.IpAddressGenerationFailure,
+                          self._allocate_from_reserve)
+
+    def test_close_releases_reserve(self):
+        self._allocate_from_reserve()
+        self.reserve.close(self.released.append)
+        self.assertEqual(['10.0.0.3', '10.0.0.4', '10.0.0.5', '10.0.0.6'],
+                         self.released)
+        self.assertEqual(0, len(self.reserve))
+        # No more addresses are reserved after closing
+        self.assertEqual('10.0.0.7', self._allocate_from_reserve())
+        self.assertEqual(0, len(self.reserve))
+
+    def test_release_idle(self):
+        self._allocate_from_reserve()
+        with mock.patch.object(reserve.time, 'time',
+                               return_value=self.reserve._last_used + 1):
+            self.reserve._release_idle()
+        self.assertEqual([], self.released)
+        with mock.patch.object(reserve.time, 'time',
+                               return_value=self.reserve._last_used +
+                               reserve.RESERVE_IDLE_TIMEOUT):
+            self.reserve._release_idle()
+        self.assertEqual(4, len(self.released))
+        self.assertEqual(0, len(self.reserve))
+
+    def test_refill_uses_last_allocate_func(self):
+        other_allocate = mock.Mock(side_effect=self._allocate)
+        self.reserve.allocate(other_allocate, self.released.append)
+        # The first allocation and the refill
+        self.assertEqual(5, other_allocate.call_count)
+
+    def test_distant_addresses(self):
+        self.free = ['2001:db8::2', '2001:db8::ffff:ffff:ffff:fff0',
+                     '2001:db8::1:0', '2001:db8::3', '2001:db8::4']
+        self.assertEqual('2001:db8::2', self._allocate_from_reserve())
+        self.assertEqual(4, len(self.reserve))
+        self.assertTrue(self.reserve.take('2001:db8::ffff:ffff:ffff:fff0'))
+        # The lowest reserved address is allocated first
+        self.assertEqual('2001:db8::3', self._allocate_from_reserve())
+
+    def test_reconcile(self):
+        self._allocate_from_reserve()
+        unused = ['10.0.0.3', '10.0.0.15', '10.0.0.16']
+        self.assertTrue(self.reserve.reconcile_needed())
+        self.assertFalse(self.reserve.reconcile_needed())
+        self.reserve.reconcile(lambda: unused, self.released.append)
+        # Unused addresses may be in the middle of an allocation
+        self.assertEqual([], self.released)
+        unused.remove('10.0.0.16')
+        self.reserve.reconcile(lambda: unused, self.released.append)
+        # Reserved addresses are not released
+        self.assertEqual(['10.0.0.15'], self.released)
+        self.assertEqual(4, len(self.reserve))
+        with mock.patch.object(reserve.time, 'time',
+                               return_value=self.reserve._last_reconcile +
+                               reserve.RESERVE_RECONCILE_INTERVAL):
+            self.assertTrue(self.reserve.reconcile_needed())
+
+    def test_close_pool_reserve(self):
+        pool_reserve = reserve.get_pool_reserve('pool-2', 2)
+        self.assertIs(pool_reserve, reserve.get_pool_reserve('pool-2', 2))
+        pool_reserve.allocate(self._allocate, self.released.append)
+        reserve.close_pool_reserve('pool-2', self.released.append)
+        self.assertEqual(2, len(self.released))
+        self.assertIsNot(pool_reserve, reserve.get_pool_reserve('pool-2', 2))
+        reserve.close_pool_reserve('pool-2', self.released.append)
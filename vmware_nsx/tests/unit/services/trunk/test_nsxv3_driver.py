@@ -15,6 +15,7 @@
 
 import mock
 
+from neutron.services.trunk import constants as trunk_consts
 from neutron.tests import base
 
 from neutron_lib import context
@@ -25,6 +26,7 @@ from vmware_nsx.common import nsx_constants
 from vmware_nsx.services.trunk.nsx_v3 import driver as trunk_driver
 from vmware_nsx.tests.unit.nsx_v3 import test_constants as test_consts
 from vmware_nsx.tests.unit.nsx_v3 import test_plugin as test_nsx_v3_plugin
+from vmware_nsxlib.v3 import exceptions as nsxlib_exc
 
 
 class TestNsxV3TrunkHandler(test_nsx_v3_plugin.NsxV3PluginTestCaseMixin,
@@ -34,7 +36,7 @@ class TestNsxV3TrunkHandler(test_nsx_v3_plugin.NsxV3PluginTestCaseMixin,
         self.context = context.get_admin_context()
         self.core_plugin = importutils.import_object(test_consts.PLUGIN_NAME)
         self.handler = trunk_driver.NsxV3TrunkHandler(self.core_plugin)
-        self.handler._update_port_at_backend = mock.Mock()
+        self.handler._update_ports_at_backend = mock.Mock()
         self.trunk_1 = mock.Mock()
         self.trunk_1.port_id = "parent_port_1"
 
@@ -60,113 +62,132 @@ class TestNsxV3TrunkHandler(test_nsx_v3_plugin.NsxV3PluginTestCaseMixin,
         # Create trunk with no subport
         self.trunk_1.sub_ports = []
         self.handler.trunk_created(self.context, self.trunk_1)
-        self.handler._update_port_at_backend.assert_not_called()
+        self.handler._update_ports_at_backend.assert_not_called()
 
         # Create trunk with 1 subport
         self.trunk_1.sub_ports = [self.sub_port_1]
         self.handler.trunk_created(self.context, self.trunk_1)
-        self.handler._update_port_at_backend.assert_called_with(
+        self.handler._update_ports_at_backend.assert_called_with(
             self.context,
             self.trunk_1.port_id,
-            self.sub_port_1)
+            [self.sub_port_1])
 
         # Create trunk with multiple subports
         self.trunk_2.sub_ports = [self.sub_port_2, self.sub_port_3]
         self.handler.trunk_created(self.context, self.trunk_2)
-        calls = [mock.call._update_port_at_backend(
-                     self.context,
-                     self.trunk_2.port_id,
-                     self.sub_port_2),
-                 mock.call._update_port_at_backend(
-                     self.context,
-                     self.trunk_2.port_id,
-                     self.sub_port_3)]
-        self.handler._update_port_at_backend.assert_has_calls(
-            calls, any_order=True)
+        self.handler._update_ports_at_backend.assert_called_with(
+            self.context,
+            self.trunk_2.port_id,
+            [self.sub_port_2, self.sub_port_3])
 
     def test_trunk_deleted(self):
         # Delete trunk with no subport
         self.trunk_1.sub_ports = []
         self.handler.trunk_deleted(self.context, self.trunk_1)
-        self.handler._update_port_at_backend.assert_not_called()
+        self.handler._update_ports_at_backend.assert_not_called()
 
         # Delete trunk with 1 subport
         self.trunk_1.sub_ports = [self.sub_port_1]
         self.handler.trunk_deleted(self.context, self.trunk_1)
-        self.handler._update_port_at_backend.assert_called_with(
-            context=self.context,
-            parent_port_id=None,
-            subport=self.sub_port_1)
+        self.handler._update_ports_at_backend.assert_called_with(
+            self.context, None, [self.sub_port_1])
 
         # Delete trunk with multiple subports
         self.trunk_2.sub_ports = [self.sub_port_2, self.sub_port_3]
         self.handler.trunk_deleted(self.context, self.trunk_2)
-        calls = [mock.call._update_port_at_backend(
-                     context=self.context,
-                     parent_port_id=None,
-                     subport=self.sub_port_2),
-                 mock.call._update_port_at_backend(
-                     context=self.context,
-                     parent_port_id=None,
-                     subport=self.sub_port_3)]
-        self.handler._update_port_at_backend.assert_has_calls(
-            calls, any_order=True)
+        self.handler._update_ports_at_backend.assert_called_with(
+            self.context, None, [self.sub_port_2, self.sub_port_3])
 
     def test_subports_added(self):
         # Update trunk with no subport
         sub_ports = []
         self.handler.subports_added(self.context, self.trunk_1, sub_ports)
-        self.handler._update_port_at_backend.assert_not_called()
+        self.handler._update_ports_at_backend.assert_not_called()
 
         # Update trunk with 1 subport
         sub_ports = [self.sub_port_1]
         self.handler.subports_added(self.context, self.trunk_1, sub_ports)
-        self.handler._update_port_at_backend.assert_called_with(
+        self.handler._update_ports_at_backend.assert_called_with(
             self.context,
             self.trunk_1.port_id,
-            self.sub_port_1)
+            [self.sub_port_1])
 
         # Update trunk with multiple subports
         sub_ports = [self.sub_port_2, self.sub_port_3]
         self.handler.subports_added(self.context, self.trunk_2, sub_ports)
-        calls = [mock.call._update_port_at_backend(
-                     self.context,
-                     self.trunk_2.port_id,
-                     self.sub_port_2),
-                 mock.call._update_port_at_backend(
-                     self.context,
-                     self.trunk_2.port_id,
-                     self.sub_port_3)]
-        self.handler._update_port_at_backend.assert_has_calls(
-            calls, any_order=True)
+        self.handler._update_ports_at_backend.assert_called_with(
+            self.context,
+            self.trunk_2.port_id,
+            [self.sub_port_2, self.sub_port_3])
 
     def test_subports_deleted(self):
         # Update trunk to remove no subport
         sub_ports = []
         self.handler.subports_deleted(self.context, self.trunk_1, sub_ports)
-        self.handler._update_port_at_backend.assert_not_called()
+        self.handler._update_ports_at_backend.assert_not_called()
 
         # Update trunk to remove 1 subport
         sub_ports = [self.sub_port_1]
         self.handler.subports_deleted(self.context, self.trunk_1, sub_ports)
-        self.handler._update_port_at_backend.assert_called_with(
-            context=self.context,
-            parent_port_id=None,
-            subport=self.sub_port_1)
+        self.handler._update_ports_at_backend.assert_called_with(
+            self.context, None, [self.sub_port_1])
 
         # Update trunk to remove multiple subports
         sub_ports = [self.sub_port_2, self.sub_port_3]
         self.handler.subports_deleted(self.context, self.trunk_2, sub_ports)
-        calls = [mock.call._update_port_at_backend(
-                     context=self.context,
-                     parent_port_id=None,
-                     subport=self.sub_port_2),
-                 mock.call._update_port_at_backend(
-                     context=self.context,
-                     parent_port_id=None,
-                     subport=self.sub_port_3)]
-        self.handler._update_port_at_backend.assert_has_calls(
-            calls, any_order=True)
+        self.handler._update_ports_at_backend.assert_called_with(
+            self.context, None, [self.sub_port_2, self.sub_port_3])
+
+    def test_update_ports_at_backend_partial_failure(self):
+        handler = trunk_driver.NsxV3TrunkHandler(self.core_plugin)
+        sub_ports = [self.sub_port_1, self.sub_port_2, self.sub_port_3]
+        ports = [{'id': sub_port.port_id} for sub_port in sub_ports]
+        nsx_ids = dict((sub_port.port_id, ('switch', 'nsx-%s' %
+                                           sub_port.port_id))
+                       for sub_port in sub_ports)
+        error = nsxlib_exc.ManagerError(manager='dummy', operation='update',
+                                        details='fail')
+
+        def _update_child_port(parent_port_id, subport, child_port,
+                               nsx_child_port_id):
+            if subport is self.sub_port_2:
+                raise error
+
+        with mock.patch.object(self.core_plugin, 'get_ports',
+                               return_value=ports) as get_ports,\
+            mock.patch.object(trunk_driver.nsx_db,
+                              'get_nsx_switch_and_port_ids',
+                              return_value=nsx_ids),\
+            mock.patch.object(handler, '_update_child_port_at_backend',
+                              side_effect=_update_child_port) as update:
+            self.assertRaises(nsxlib_exc.ManagerError,
+                              handler._update_ports_at_backend,
+                              self.context, 'parent_port_1', sub_ports)
+        get_ports.assert_called_once_with(
+            self.context,
+            filters={'id': ['sub_port_1', 'sub_port_2', 'sub_port_3']})
+        # All the subports were updated despite the failure
+        self.assertEqual(3, update.call_count)
+        update.assert_any_call('parent_port_1', self.sub_port_3, ports[2],
+                               'nsx-sub_port_3')
+
+    def test_subports_added_missing_port(self):
+        handler = trunk_driver.NsxV3TrunkHandler(self.core_plugin)
+        sub_ports = [self.sub_port_1, self.sub_port_2]
+        # The second child port does not exist anymore
+        ports = [{'id': self.sub_port_1.port_id}]
+        with mock.patch.object(self.core_plugin, 'get_ports',
+                               return_value=ports),\
+            mock.patch.object(trunk_driver.nsx_db,
+                              'get_nsx_switch_and_port_ids',
+                              return_value={}),\
+            mock.patch.object(handler,
+                              '_update_child_port_at_backend') as update:
+            handler.subports_added(self.context, self.trunk_1, sub_ports)
+        update.assert_called_once_with('parent_port_1', self.sub_port_1,
+                                       ports[0], None)
+        self.trunk_1.update.assert_called_once_with(
+            status=trunk_consts.ERROR_STATUS)
 
 
 class TestNsxV3TrunkDriver(base.BaseTestCase):
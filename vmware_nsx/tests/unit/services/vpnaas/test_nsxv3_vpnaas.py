@@ -28,8 +28,11 @@ from neutron_vpnaas.db.vpn import vpn_models  # noqa
 from neutron_vpnaas.tests import base
 
 from vmware_nsx.common import exceptions as nsx_exc
+from vmware_nsx.db import db
+from vmware_nsx.services.vpnaas.nsxv3 import cidr_index
 from vmware_nsx.services.vpnaas.nsxv3 import ipsec_driver
 from vmware_nsx.services.vpnaas.nsxv3 import ipsec_validator
+from vmware_nsx.services.vpnaas.nsxv3 import status_collector
 from vmware_nsx.tests.unit.nsx_v3 import test_plugin
 
 _uuid = uuidutils.generate_uuid
@@ -495,6 +498,68 @@ class TestDriverValidation(base.BaseTestCase):
                                    router_subnets=router_subnets)
 
 
+class TestCidrIndex(base.BaseTestCase):
+
+    def test_get_overlapping(self):
+        index = cidr_index.CidrIndex()
+        index.add('conn1', '10.0.0.0/16')
+        index.add('conn2', '10.1.1.0/24')
+        index.add('conn3', '10.1.1.0/24')
+        index.add('conn4', '2001:db8::/64')
+        self.assertEqual(set(['conn1']),
+                         index.get_overlapping('10.0.5.0/24'))
+        self.assertEqual(set(['conn2', 'conn3']),
+                         index.get_overlapping('10.1.0.0/16'))
+        self.assertEqual(set(['conn1', 'conn2', 'conn3']),
+                         index.get_overlapping('10.0.0.0/8'))
+        self.assertEqual(set(), index.get_overlapping('10.2.0.0/24'))
+        self.assertEqual(set(['conn4']),
+                         index.get_overlapping('2001:db8::/48'))
+        self.assertEqual(set(), index.get_overlapping('0.0.0.0/32'))
+
+        index.remove('conn2')
+        self.assertEqual(set(['conn3']),
+                         index.get_overlapping('10.1.1.128/25'))
+        index.remove('conn3')
+        self.assertEqual(set(), index.get_overlapping('10.1.1.128/25'))
+        self.assertEqual(2, len(index))
+
+
+class TestSessionStatusCollector(base.BaseTestCase):
+
+    def test_get_statuses(self):
+        statuses = {'session1': {'session_status': 'UP'},
+                    'session2': {'session_status': 'DOWN'}}
+        get_status = mock.Mock(side_effect=lambda id: statuses[id])
+        collector = status_collector.SessionStatusCollector(get_status, 10)
+        self.assertEqual(statuses, collector.get_statuses(
+            ['session1', 'session2']))
+        self.assertEqual(2, get_status.call_count)
+
+        # Cached statuses are not queried again
+        self.assertEqual(statuses, collector.get_statuses(
+            ['session1', 'session2']))
+        self.assertEqual(2, get_status.call_count)
+        collector.invalidate('session1')
+        self.assertEqual({'session1': statuses['session1']},
+                         collector.get_statuses(['session1']))
+        self.assertEqual(3, get_status.call_count)
+
+        stats = collector.stats()
+        self.assertEqual(3, stats['sweeps'])
+        self.assertEqual(1, stats['last_sweep_sessions'])
+        self.assertEqual(1, stats['last_sweep_queries'])
+
+    def test_get_statuses_failure(self):
+        get_status = mock.Mock(side_effect=Exception('fail'))
+        collector = status_collector.SessionStatusCollector(get_status, 10)
+        self.assertEqual({'session1': None},
+                         collector.get_statuses(['session1']))
+        # Failures are not cached
+        collector.get_statuses(['session1'])
+        self.assertEqual(2, get_status.call_count)
+
+
 class TestVpnaasDriver(test_plugin.NsxV3PluginTestCaseMixin):
 
     def setUp(self):
@@ -721,3 +786,74 @@ class TestVpnaasDriver(test_plugin.NsxV3PluginTestCaseMixin):
                     delete_service.assert_called_once()
 
         pass
+
+    def test_sync_conns_cidr_index(self):
+        index = self.driver._conns_cidr_index
+        index.add('conn1', '1.1.1.0/24')
+        index.add('conn2', '1.1.2.0/24')
+        with mock.patch.object(self.driver, '_get_indexed_conn_ids',
+                               return_value={'conn1', 'conn2'}) as get_ids,\
+            mock.patch.object(self.driver,
+                              '_add_conns_to_cidr_index') as add_conns:
+            self.driver._sync_conns_cidr_index(self.context)
+            add_conns.assert_not_called()
+            # conn2 was deleted and conn3 created: the count is unchanged
+            get_ids.return_value = {'conn1', 'conn3'}
+            self.driver._sync_conns_cidr_index(self.context)
+        add_conns.assert_called_once_with(self.context, ['conn3'])
+        self.assertIn('conn1', index)
+        self.assertNotIn('conn2', index)
+
+    def test_check_subnets_overlap_with_all_conns(self):
+        active_conn = {'id': 'conn1', 'vpnservice_id': FAKE_VPNSERVICE_ID}
+        with mock.patch.object(self.service_plugin,
+                               'get_ipsec_site_connections',
+                               return_value=[active_conn]),\
+            mock.patch.object(self.service_plugin, 'get_vpnservices',
+                              return_value=[FAKE_VPNSERVICE]),\
+            mock.patch.object(self.plugin, 'get_subnets',
+                              return_value=[FAKE_SUBNET]):
+            self.driver._add_conns_to_cidr_index(self.context, ['conn1'])
+        self.assertIn('conn1', self.driver._conns_cidr_index)
+
+        with mock.patch.object(self.driver, '_sync_conns_cidr_index'),\
+            mock.patch.object(self.service_plugin,
+                              'get_ipsec_site_connections',
+                              return_value=[active_conn]) as get_conns:
+            # No overlap: the connections are not fetched
+            self.assertTrue(self.driver._check_subnets_overlap_with_all_conns(
+                self.context, ['1.1.2.0/24']))
+            get_conns.assert_not_called()
+            self.assertFalse(
+                self.driver._check_subnets_overlap_with_all_conns(
+                    self.context, ['1.1.0.0/16']))
+            get_conns.assert_called_once_with(
+                self.context,
+                filters={'id': ['conn1'], 'status': ['ACTIVE']},
+                fields=['id'])
+            # The overlapping connection is not active
+            get_conns.return_value = []
+            self.assertTrue(self.driver._check_subnets_overlap_with_all_conns(
+                self.context, ['1.1.1.0/24']))
+
+    def test_get_ipsec_site_connections_status(self):
+        for conn_id, session_id in (('conn1', 'session1'),
+                                    ('conn2', 'session2'),
+                                    ('conn3', 'session3')):
+            db.add_nsx_vpn_connection_mapping(
+                self.context.session, conn_id, session_id, 'dpd', 'ike',
+                'ipsec', 'peer')
+        statuses = {'session1': {'session_status': 'UP'},
+                    'session2': {'session_status': 'DEGRADED'},
+                    'session3': {}}
+        with mock.patch.object(self.nsxlib_vpn.session, 'get_status',
+                               side_effect=lambda id: statuses[id]):
+            self.assertEqual(
+                {'conn1': 'ACTIVE', 'conn2': 'DOWN'},
+                self.driver.get_ipsec_site_connections_status(
+                    self.context, ['conn1', 'conn2', 'conn3', 'conn4']))
+            self.assertEqual(
+                'ACTIVE', self.driver.get_ipsec_site_connection_status(
+                    self.context, 'conn1'))
+            self.assertIsNone(self.driver.get_ipsec_site_connection_status(
+                self.context, 'conn4'))
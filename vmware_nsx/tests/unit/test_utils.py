@@ -13,7 +13,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
+from neutron_lib.db import api as db_api
 from oslo_config import cfg
+from sqlalchemy import event
+
+
+@contextlib.contextmanager
+def count_db_queries():
+    """Collect the SQL statements executed inside the block"""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_api.CONTEXT_WRITER.get_engine()
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
 
 
 def override_nsx_ini_test():